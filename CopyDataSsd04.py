@@ -8,7 +8,7 @@
 # Tóm tắ: 
 # -Tool dùng để copy file, dành cho các định dạng video
 # -có bộ lọc linh hoạt (bản cũ dùng danh sách, bản này dùng textbox cho nhập điều kiện thoải mái :v)
-# -đảm bảo không copy file trùng
+# -đảm bảo không copy file trùng (so nội dung: size + hash mẫu, file copy dở ở đích được copy lại)
 # -chấp nhận cả chữ hoa và chữ thường
 
 # Cách dùng: 
@@ -18,10 +18,13 @@
 import os
 import shutil
 import sys
+import logging
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QFileDialog, QVBoxLayout, QWidget, QLabel, QLineEdit
 )
 
+from video_dedup import DedupIndex, SKIP, REPAIR, CONFLICT
+
 class FileCopyApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -79,9 +82,11 @@ class FileCopyApp(QMainWindow):
         filter_criteria = self.filter_input.text().strip()
         filters = [filter.strip().lower() for filter in filter_criteria.split(",")] if filter_criteria else []
 
+        dedup = DedupIndex(self.dest_folder)
         try:
             copied_files = 0
             skipped_files = 0
+            repaired_files = 0
 
             for file_name in os.listdir(self.source_folder):
                 file_path = os.path.join(self.source_folder, file_name)
@@ -91,17 +96,28 @@ class FileCopyApp(QMainWindow):
                     if not filters or any(filter in file_name.lower() for filter in filters):
                         dest_file_path = os.path.join(self.dest_folder, file_name)
 
-                        # Skip copying if file already exists in destination folder
-                        if os.path.exists(dest_file_path):
+                        # Skip copying if the same content already exists in destination folder
+                        action, detail = dedup.check(file_path, file_name)
+                        if action in (SKIP, CONFLICT):
+                            if action == CONFLICT:
+                                logging.warning("Not overwriting '%s': %s", dest_file_path, detail)
                             skipped_files += 1
                             continue
+                        if action == REPAIR:
+                            logging.warning("Re-copying '%s': %s", dest_file_path, detail)
+                            repaired_files += 1
 
                         shutil.copy(file_path, self.dest_folder)
+                        dedup.add(file_name)
                         copied_files += 1
 
-            self.status_label.setText(f"Copied {copied_files} video file(s), skipped {skipped_files} duplicate(s).")
+            repaired = f" ({repaired_files} incomplete copies replaced)" if repaired_files else ""
+            self.status_label.setText(f"Copied {copied_files} video file(s){repaired}, "
+                                      f"skipped {skipped_files} duplicate(s).")
         except Exception as e:
             self.status_label.setText(f"Error: {str(e)}")
+        finally:
+            dedup.save()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
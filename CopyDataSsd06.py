@@ -13,19 +13,39 @@
 # -chấp nhận cả chữ hoa và chữ thường
 # -cho phép xóa video từ ngày x trở về trước
 
+# -copy/xóa chạy nền (có hàng chờ), hiện tốc độ MB/s và thời gian còn lại, cho phép tạm dừng/hủy
+# -copy nhiều video song song, số luồng tự chọn theo loại SSD/HDD đích
+# -so trùng theo nội dung (size + hash mẫu), file copy dở ở đích được copy lại
+# -quét cả folder con (theo ngày/theo xe), giữ nguyên cấu trúc folder ở đích; bộ lọc hỗ trợ VÀ (&) / KHÔNG (!)
+# -bộ lọc so với tên file như bản cũ; tick "Lọc theo cả đường dẫn" để so cả tên folder ngày/xe tính từ source
+
 # Cách dùng: 
 # -chọn thư mục nguồn (ssd trong) chứa các video cần sao chép, chọn thư mục đích (ssd ngoài)
 
 
 import os
-import shutil
 import sys
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QPushButton, QFileDialog, QVBoxLayout, QWidget, QLabel, QLineEdit, QDateEdit, QMessageBox
+    QApplication, QMainWindow, QPushButton, QFileDialog, QVBoxLayout, QHBoxLayout, QWidget, QLabel, QLineEdit,
+    QDateEdit, QMessageBox, QProgressBar, QCheckBox
 )
-from PyQt5.QtCore import QDate
+from PyQt5.QtCore import QDate, QObject, pyqtSignal
 from datetime import datetime
 
+from video_jobs import JobRunner, CopyVideosJob, DeleteVideosJob
+from video_scan import scan_videos, compile_filter
+from video_dates import open_date_index, file_date
+
+
+PROGRESS_STEPS = 1000  # thanh tiến độ tính theo phần nghìn (số byte vượt giới hạn int của QProgressBar)
+
+
+class JobSignals(QObject):
+    """Đưa tiến độ từ thread copy về GUI thread (signal phát từ thread khác được Qt xếp hàng)"""
+    progress = pyqtSignal(object)
+    finished = pyqtSignal(object, object, object)
+
+
 class FileCopyApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -36,10 +56,14 @@ class FileCopyApp(QMainWindow):
         self.selected_folder_label = QLabel("Source Folder: Chưa chọn")
         self.dest_label = QLabel("Destination Folder: Chưa chọn")
         self.status_label = QLabel("")
+        self.progress_label = QLabel("")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, PROGRESS_STEPS)
 
         self.filter_label = QLabel("Nhập điều kiện cần lọc (để trống nếu muốn copy all):")
         self.filter_input = QLineEdit()
-        self.filter_input.setPlaceholderText("vd: ID xe, VF8, VN, 01/12/2025")
+        self.filter_input.setPlaceholderText("vd: ID xe, VF8, VN, 01/12/2025, VF8 & !test")
+        self.filter_path_checkbox = QCheckBox("Lọc theo cả đường dẫn (folder ngày/xe)")
 
         self.date_filter_label = QLabel("Copy video từ ngày này tới hiện tại (tùy chọn):")
         self.date_input = QDateEdit()
@@ -56,12 +80,18 @@ class FileCopyApp(QMainWindow):
         self.copy_btn = QPushButton("Start Copy...")
         self.copy_by_date_btn = QPushButton("Copy")
         self.delete_btn = QPushButton("Delete")
+        self.pause_btn = QPushButton("Tạm dừng")
+        self.cancel_btn = QPushButton("Hủy")
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False)
 
         self.select_folder_btn.clicked.connect(self.select_source_folder)
         self.select_dest_btn.clicked.connect(self.select_dest)
         self.copy_btn.clicked.connect(self.start_copying)
         self.copy_by_date_btn.clicked.connect(self.copy_videos_by_date)
         self.delete_btn.clicked.connect(self.delete_videos_before_date)
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        self.cancel_btn.clicked.connect(self.cancel_jobs)
 
         # Layout
         layout = QVBoxLayout()
@@ -71,6 +101,7 @@ class FileCopyApp(QMainWindow):
         layout.addWidget(self.select_dest_btn)
         layout.addWidget(self.filter_label)
         layout.addWidget(self.filter_input)
+        layout.addWidget(self.filter_path_checkbox)
         layout.addWidget(self.copy_btn)
 
         layout.addWidget(self.date_filter_label)
@@ -81,6 +112,12 @@ class FileCopyApp(QMainWindow):
         layout.addWidget(self.delete_date_input)
         layout.addWidget(self.delete_btn)
 
+        job_buttons = QHBoxLayout()
+        job_buttons.addWidget(self.pause_btn)
+        job_buttons.addWidget(self.cancel_btn)
+        layout.addLayout(job_buttons)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_label)
         layout.addWidget(self.status_label)
 
         container = QWidget()
@@ -90,6 +127,17 @@ class FileCopyApp(QMainWindow):
         self.source_folder = None
         self.dest_folder = None
 
+        # Copy/xóa chạy trên thread nền, GUI chỉ nhận tiến độ qua signal
+        self.job_signals = JobSignals()
+        self.job_signals.progress.connect(self.on_job_progress)
+        self.job_signals.finished.connect(self.on_job_finished)
+        self.job_runner = JobRunner(on_progress=self.job_signals.progress.emit,
+                                    on_finished=self.job_signals.finished.emit)
+        self.done_messages = {}  # job -> câu báo kết quả khi job chạy xong
+        # Ngày của video được index theo folder (giữ qua các lần mở tool), chỉ dùng trên thread nền.
+        # Không mở được file index (quyền, disk đầy...) thì quét không cache như bản cũ
+        self.date_index = open_date_index()
+
     def select_source_folder(self):
         self.source_folder = QFileDialog.getExistingDirectory(self, "Chọn Source Folder")
         self.selected_folder_label.setText(f"Source Folder: {self.source_folder}")
@@ -103,111 +151,124 @@ class FileCopyApp(QMainWindow):
             self.status_label.setText("VUi lòng chọn đủ cả folder source và folder destination!")
             return
 
-        filter_criteria = self.filter_input.text().strip()
-        filters = [filter.strip().lower() for filter in filter_criteria.split(",")] if filter_criteria else []
+        # Dấu phẩy là HOẶC, '&' là VÀ, '!' là KHÔNG; so với tên file, hoặc với đường dẫn tính từ source
+        # (gồm cả folder ngày/xe) nếu tick "Lọc theo cả đường dẫn"
+        matches = compile_filter(self.filter_input.text())
+        source_folder = self.source_folder
+        match_path = self.filter_path_checkbox.isChecked()
 
-        try:
-            copied_files = 0
-            skipped_files = 0
-
-            for file_name in os.listdir(self.source_folder):
-                file_path = os.path.join(self.source_folder, file_name)
-
-                if os.path.isfile(file_path) and file_name.lower().endswith(('.mp4', '.avi', '.mkv', '.mov', '.flv')):
-                    if not filters or any(filter in file_name.lower() for filter in filters):
-                        dest_file_path = os.path.join(self.dest_folder, file_name)
-
-                        if os.path.exists(dest_file_path):
-                            skipped_files += 1
-                            continue
+        def select(file_path):
+            if matches is None:
+                return True
+            return matches(os.path.relpath(file_path, source_folder) if match_path else os.path.basename(file_path))
 
-                        shutil.copy(file_path, self.dest_folder)
-                        copied_files += 1
-
-            self.status_label.setText(f"Đã copy {copied_files} video, skip {skipped_files} video bị trùng lặp !")
-        except Exception as e:
-            self.status_label.setText(f"Có lỗi: {str(e)}")
+        job = CopyVideosJob("Copy", self.scan_source(), self.dest_folder, select, source_root=source_folder,
+                            dedup=True)
+        self.submit_job(job, "Đã copy {done} video, skip {skipped} video bị trùng lặp !")
 
     def copy_videos_by_date(self):
         if not self.source_folder or not self.dest_folder:
             self.status_label.setText("Vui lòng chọn đủ cả folder source và folder destination!")
             return
 
-        try:
-            start_date = self.date_input.date().toPyDate()
-            today = datetime.now().date()
-
-            copied_files = 0
-            skipped_files = 0
+        start_date = self.date_input.date().toPyDate()
+        today = datetime.now().date()
 
-            for file_name in os.listdir(self.source_folder):
-                file_path = os.path.join(self.source_folder, file_name)
-
-                if os.path.isfile(file_path) and file_name.lower().endswith(('.mp4', '.avi', '.mkv', '.mov', '.flv')):
-                    file_date = self.get_file_date(file_name, file_path)
-
-                    if file_date and start_date <= file_date <= today:
-                        dest_file_path = os.path.join(self.dest_folder, file_name)
-
-                        if os.path.exists(dest_file_path):
-                            skipped_files += 1
-                            continue
-
-                        shutil.copy(file_path, self.dest_folder)
-                        copied_files += 1
-
-            self.status_label.setText(f"Đã copy {copied_files} videos by date, skipped {skipped_files} video trùng.")
-        except Exception as e:
-            self.status_label.setText(f"Error: {str(e)}")
+        videos = self.date_index.between(self.source_folder, start_date, today, skip_dirs=[self.dest_folder])
+        job = CopyVideosJob("Copy by date", videos, self.dest_folder, source_root=self.source_folder, dedup=True)
+        self.submit_job(job, "Đã copy {done} videos by date, skipped {skipped} video trùng.")
 
     def delete_videos_before_date(self):
         if not self.source_folder:
             self.status_label.setText("Vui lòng chọn source folder!")
             return
 
-        try:
-            selected_date = self.delete_date_input.date().toPyDate()
-            deleted_files = 0
-            skipped_files = 0
-
-            reply = QMessageBox.question(
-                self, "Xác nhận xóa",
-                f"Bạn có muốn xóa tất cả các video trước ngày {selected_date} không ?",
-                QMessageBox.Yes | QMessageBox.No
-            )
-            if reply == QMessageBox.No:
-                self.status_label.setText("Hủy")
-                return
-
-            for file_name in os.listdir(self.source_folder):
-                file_path = os.path.join(self.source_folder, file_name)
-
-                if os.path.isfile(file_path) and file_name.lower().endswith(('.mp4', '.avi', '.mkv', '.mov', '.flv')):
-                    file_date = self.get_file_date(file_name, file_path)
-
-                    if file_date and file_date < selected_date:
-                        os.remove(file_path)
-                        deleted_files += 1
-                    else:
-                        skipped_files += 1
-
-            self.status_label.setText(f"Đã xóa {deleted_files} video, skip {skipped_files}.")
-        except Exception as e:
-            self.status_label.setText(f"Lỗi: {str(e)}")
+        selected_date = self.delete_date_input.date().toPyDate()
+        reply = QMessageBox.question(
+            self, "Xác nhận xóa",
+            f"Bạn có muốn xóa tất cả các video trước ngày {selected_date} không ?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply == QMessageBox.No:
+            self.status_label.setText("Hủy")
+            return
 
-    def get_file_date(self, file_name, file_path):
-        try:
-            for fmt in ["%d/%m/%Y", "%d-%m-%Y", "%d_%m_%Y", "%d%m%Y"]:
-                parts = file_name.split()
-                for part in parts:
-                    try:
-                        return datetime.strptime(part, fmt).date()
-                    except ValueError:
-                        continue
-        except Exception:
-            pass
+        skip_dirs = [self.dest_folder] if self.dest_folder else []
 
-        return datetime.fromtimestamp(os.path.getmtime(file_path)).date()
+        # Index tin folder có mtime không đổi, mà ghi đè 1 video tại chỗ không làm đổi mtime folder: ngày lấy từ
+        # mtime file (tên không có ngày) trong index có thể đã cũ. Xóa thì tính lại ngày từ tên/mtime hiện tại
+        def select(file_path):
+            try:
+                return self.get_file_date(os.path.basename(file_path), file_path) < selected_date
+            except FileNotFoundError:
+                return False  # đã bị xóa trong lúc quét
+
+        job = DeleteVideosJob("Delete", self.date_index.walk(self.source_folder, skip_dirs), select)
+        self.submit_job(job, "Đã xóa {done} video, skip {skipped}.")
+
+    # ----------------------------------------------------------------------------------------------
+    # Job nền
+    # ----------------------------------------------------------------------------------------------
+    def scan_source(self):
+        """Generator các video trong source (cả folder con), bỏ qua destination nếu nó nằm trong source"""
+        return scan_videos(self.source_folder, skip_dirs=[self.dest_folder] if self.dest_folder else [])
+
+    def submit_job(self, job, done_message):
+        self.done_messages[job] = done_message
+        self.job_runner.submit(job)
+        self.pause_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(True)
+        pending = self.job_runner.pending_count()
+        if pending > 1:
+            self.status_label.setText(f"Đã thêm '{job.title}' vào hàng chờ ({pending} job)")
+
+    def toggle_pause(self):
+        if self.job_runner.current is None:
+            return
+        if self.job_runner.current.paused:
+            self.job_runner.resume()
+        else:
+            self.job_runner.pause()
+
+    def cancel_jobs(self):
+        if self.job_runner.cancel_all():
+            self.status_label.setText("Đang hủy...")
+
+    def on_job_progress(self, progress):
+        self.progress_label.setText(progress.describe())
+        if progress.total_bytes:
+            self.progress_bar.setValue(progress.done_bytes * PROGRESS_STEPS // progress.total_bytes)
+        elif progress.total_files:
+            self.progress_bar.setValue(progress.done_files * PROGRESS_STEPS // progress.total_files)
+        else:
+            self.progress_bar.setValue(0)
+        self.pause_btn.setText("Tiếp tục" if progress.paused else "Tạm dừng")
+
+    def on_job_finished(self, job, progress, error):
+        message = self.done_messages.pop(job, "{done} file")
+        if progress.status == 'done':
+            text = message.format(done=progress.done_files, skipped=progress.skipped_files)
+            if progress.failed_files:
+                text += f" Lỗi {progress.failed_files} file (xem log)."
+        elif progress.status == 'cancelled':
+            text = f"Đã hủy {job.title}: xong {progress.done_files}/{progress.total_files} file"
+        else:
+            text = f"Có lỗi: {error}"
+        self.status_label.setText(text)
+        self.on_job_progress(progress)
+        if not self.job_runner.pending_count():
+            self.pause_btn.setText("Tạm dừng")
+            self.pause_btn.setEnabled(False)
+            self.cancel_btn.setEnabled(False)
+
+    def closeEvent(self, event):
+        # Hủy job đang chạy (file copy dở được xóa) trước khi đóng cửa sổ
+        self.job_runner.close()
+        self.date_index.close()
+        super().closeEvent(event)
+
+    def get_file_date(self, file_name, file_path):
+        return file_date(file_name, file_path)
     
     #commit -m "update backup daily video "
     def setup_daily_backup_video(self):
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Commit folder lên SSD ngoài an toàn khi mất điện/rút SSD: copy vào <đích>.partial, syncfs, rename atomic
+
+Folder mang tên thật luôn có marker hoàn tất (ghi trong staging trước khi rename), nên folder không có marker
+chắc chắn là copy dở (hoặc do bản cũ ghi thẳng vào đích) và lần chạy sau chỉ copy tiếp phần còn thiếu.
+"""
+import os
+import json
+import time
+import ctypes
+import shutil
+import logging
+
+STAGING_SUFFIX = '.partial'
+COMPLETE_MARKER_NAME = '.sync_complete'
+
+
+def staging_path(final_path):
+    return final_path.rstrip(os.sep) + STAGING_SUFFIX
+
+
+def syncfs(path):
+    """Flush dữ liệu và metadata của cả filesystem chứa path (1 lần cho cả folder thay vì fsync từng file)"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            if libc.syncfs(fd) == 0:
+                return
+            logging.debug("syncfs failed: %s", os.strerror(ctypes.get_errno()))
+        except (OSError, AttributeError) as e:
+            logging.debug("syncfs not available: %s", e)
+        os.sync()
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_marker(final_path):
+    """Nội dung marker hoàn tất (dict), None nếu folder chưa commit"""
+    try:
+        with open(os.path.join(final_path, COMPLETE_MARKER_NAME)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def is_committed(final_path, files=None, total_bytes=None):
+    """Folder đích đã commit; nếu có files/total_bytes của nguồn thì marker phải khớp (không cần hash lại)"""
+    marker = read_marker(final_path)
+    if marker is None:
+        return False
+    return (files is None or marker.get('files') == files) and \
+        (total_bytes is None or marker.get('bytes') == total_bytes)
+
+
+def prepare_staging(final_path):
+    """Trả về folder staging để copy vào
+
+    Staging dở của lần trước được dùng tiếp. Folder đích chưa commit (hoặc marker không còn khớp nguồn) được
+    chuyển về staging để chỉ copy phần còn thiếu thay vì copy lại từ đầu.
+    """
+    staging = staging_path(final_path)
+    if os.path.lexists(final_path):
+        if os.path.exists(staging):
+            # Không xảy ra khi chỉ dùng commit_folder; nguồn vẫn còn nên bỏ bản đích chưa commit
+            logging.warning("Both '%s' and its staging folder exist, discarding the uncommitted one", final_path)
+            shutil.rmtree(final_path)
+        else:
+            os.rename(final_path, staging)
+    os.makedirs(staging, exist_ok=True)
+    return staging
+
+
+def commit_folder(staging, final_path, info, check=None):
+    """Ghi marker (info + thời điểm commit) vào staging, syncfs rồi rename staging -> final_path
+
+    syncfs trước khi rename: nếu mất điện, folder mang tên thật chỉ xuất hiện khi mọi file đã nằm trên disk.
+    check(staging) (tùy chọn) chạy sau syncfs, trước rename: raise thì folder không được commit.
+    """
+    marker_path = os.path.join(staging, COMPLETE_MARKER_NAME)
+    tmp_marker_path = f"{marker_path}.tmp"
+    with open(tmp_marker_path, 'w') as file:
+        json.dump(dict(info, committed_at=time.time()), file)
+    os.replace(tmp_marker_path, marker_path)
+    syncfs(staging)
+    if check is not None:
+        check(staging)
+    os.rename(staging, final_path)
+    fsync_dir(os.path.dirname(final_path.rstrip(os.sep)))
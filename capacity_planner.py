@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Tính dung lượng backlog, chỉ nhận folder còn vừa SSD đích và dự báo thời gian tới khi SSD đầy"""
+import time
+import shutil
+import threading
+
+from tree_scanner import TreeScanner
+
+GIB = 1024 ** 3
+DEFAULT_RESERVE_GB = 100  # luôn chừa lại trên SSD ngoài
+RATE_SMOOTHING = 0.3  # hệ số EWMA cho tốc độ ghi quan sát được
+MIN_SAMPLE_INTERVAL = 1.0  # giây
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "--"
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m"
+
+
+class CapacityPlanner:
+    """Lập kế hoạch dung lượng cho các SSD đích
+
+    Kích thước folder nguồn lấy từ snapshot của TreeScanner (cache theo mtime từng folder),
+    tốc độ ghi của mỗi SSD đích được ước lượng từ lượng free space giảm đi giữa các lần sample.
+    """
+
+    def __init__(self, reserve_gb=DEFAULT_RESERVE_GB, scanner=None):
+        self.reserve_bytes = int(reserve_gb * GIB)
+        self.scanner = scanner if scanner is not None else TreeScanner()
+        self._lock = threading.Lock()
+        self._samples = {}  # dst_root -> (monotonic time, free bytes)
+        self._rates = {}  # dst_root -> byte/s
+        self._pending = {}  # dst_root -> byte còn chờ sync
+
+    # ----------------------------------------------------------------------------------------------
+    # Kích thước nguồn
+    # ----------------------------------------------------------------------------------------------
+    def folder_size(self, path):
+        """Kích thước folder nguồn (byte), chỉ quét lại các folder con có mtime thay đổi"""
+        return self.scanner.tree_size(path)
+
+    # ----------------------------------------------------------------------------------------------
+    # Admission
+    # ----------------------------------------------------------------------------------------------
+    def free_bytes(self, dst_root):
+        """Free space có thể dùng (đã trừ phần chừa lại), đồng thời cập nhật tốc độ ghi"""
+        free = shutil.disk_usage(dst_root).free
+        self._sample(dst_root, free)
+        return free - self.reserve_bytes
+
+    def fits(self, needed_bytes, dst_roots):
+        """True nếu needed_bytes vừa với mọi SSD trong dst_roots (mirror ghi lên tất cả)"""
+        return all(needed_bytes <= self.free_bytes(dst_root) for dst_root in dst_roots)
+
+    def plan(self, items, dst_roots):
+        """Chia items (đã theo thứ tự ưu tiên) thành (admitted, deferred) theo dung lượng còn lại
+
+        items: list (key, needed_bytes, roots), roots là tập con của dst_roots mà item sẽ ghi vào.
+        Item không vừa thì bị hoãn nhưng các item nhỏ hơn phía sau vẫn được xét tiếp.
+        """
+        budget = {dst_root: self.free_bytes(dst_root) for dst_root in dst_roots}
+        admitted, deferred = [], []
+        for key, needed_bytes, roots in items:
+            if all(needed_bytes <= budget[dst_root] for dst_root in roots):
+                for dst_root in roots:
+                    budget[dst_root] -= needed_bytes
+                admitted.append(key)
+            else:
+                deferred.append(key)
+        admitted_keys = set(admitted)
+        with self._lock:
+            self._pending = {dst_root: 0 for dst_root in dst_roots}
+            for key, needed_bytes, roots in items:
+                if key in admitted_keys:
+                    for dst_root in roots:
+                        self._pending[dst_root] += needed_bytes
+        return admitted, deferred
+
+    def consumed(self, needed_bytes, dst_roots):
+        """Báo 1 folder đã sync xong để cập nhật backlog còn lại"""
+        with self._lock:
+            for dst_root in dst_roots:
+                if dst_root in self._pending:
+                    self._pending[dst_root] = max(0, self._pending[dst_root] - needed_bytes)
+
+    # ----------------------------------------------------------------------------------------------
+    # Dự báo
+    # ----------------------------------------------------------------------------------------------
+    def _sample(self, dst_root, free):
+        now = time.monotonic()
+        with self._lock:
+            last = self._samples.get(dst_root)
+            if last is not None and now - last[0] < MIN_SAMPLE_INTERVAL:
+                return
+            self._samples[dst_root] = (now, free)
+            if last is None:
+                return
+            rate = max(0.0, (last[1] - free) / (now - last[0]))
+            previous = self._rates.get(dst_root)
+            self._rates[dst_root] = rate if previous is None else \
+                RATE_SMOOTHING * rate + (1 - RATE_SMOOTHING) * previous
+
+    def forecast(self, dst_root):
+        """dict: free, total, pending (byte), rate (byte/s), eta_full, eta_backlog (giây hoặc None)"""
+        total, used, free = shutil.disk_usage(dst_root)
+        self._sample(dst_root, free)
+        with self._lock:
+            rate = self._rates.get(dst_root, 0.0)
+            pending = self._pending.get(dst_root, 0)
+        usable = max(0, free - self.reserve_bytes)
+        return {
+            'free': free,
+            'total': total,
+            'pending': pending,
+            'rate': rate,
+            'eta_full': usable / rate if rate > 0 else None,
+            'eta_backlog': pending / rate if rate > 0 and pending else None,
+        }
+
+    def describe(self, dst_root):
+        """1 dòng trạng thái cho GUI"""
+        status = self.forecast(dst_root)
+        text = (f"{status['free'] / GIB:.1f} / {status['total'] / GIB:.1f} GiB free, "
+                f"backlog {status['pending'] / GIB:.1f} GiB")
+        if status['rate'] > 0:
+            text += (f", {status['rate'] / 1024 ** 2:.0f} MiB/s, full in {format_duration(status['eta_full'])}, "
+                     f"backlog done in {format_duration(status['eta_backlog'])}")
+        return text
+
@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""Copy engine đa luồng, dùng thay cho distutils copy_tree"""
+import os
+import time
+import mmap
+import errno
+import shutil
+import logging
+import threading
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+
+from integrity import new_hasher, hasher_state, hash_file
+from io_throttle import set_io_priority, drop_page_cache
+from tree_scanner import TreeScanner
+
+# ======================================================================================================
+# CONFIG
+# ======================================================================================================
+DEFAULT_COPY_WORKERS = 4
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024  # 16 MiB mỗi lần đọc/ghi
+DEFAULT_CHECKPOINT_BYTES = 256 * 1024 * 1024  # fdatasync + ghi offset đã verify sau mỗi 256 MiB
+COPY_METHODS = ('auto', 'copy_file_range', 'sendfile', 'buffered')
+# Lỗi cho biết kernel/filesystem không hỗ trợ phương thức copy, chuyển sang phương thức kế tiếp
+FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+FICLONE = 0x40049409  # _IOW(0x94, 9, int): reflink cả file trên btrfs/xfs
+CLONE_METHODS = ('reflink', 'hardlink', 'copy')
+PARTIAL_SUFFIX = '.part'  # resume=True: copy vào <đích>.part rồi rename, không ghi vào inode đích đang có
+
+
+class ChecksumMismatch(OSError):
+    """File đích đọc lại không khớp hash của nguồn"""
+
+
+# ======================================================================================================
+# ĐỌC/GHI THEO OFFSET
+# ======================================================================================================
+# os.pread/preadv/pwrite không có trên Windows (CopyDataSsd04/06 là tool GUI dùng được ngoài Linux):
+# thay bằng lseek + read/write, an toàn vì mỗi fd chỉ được 1 thread đọc/ghi tại 1 thời điểm.
+if hasattr(os, 'pread'):
+    pread = os.pread
+else:
+    def pread(fd, count, offset):
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, count)
+
+if hasattr(os, 'pwrite'):
+    pwrite = os.pwrite
+else:
+    def pwrite(fd, data, offset):
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.write(fd, data)
+
+if hasattr(os, 'preadv'):
+    def preadinto(fd, view, offset):
+        """Đọc vào view (memoryview) tại offset, trả về số byte đã đọc"""
+        return os.preadv(fd, [view], offset)
+else:
+    def preadinto(fd, view, offset):
+        """Đọc vào view (memoryview) tại offset, trả về số byte đã đọc"""
+        data = pread(fd, len(view), offset)
+        view[:len(data)] = data
+        return len(data)
+
+
+# ======================================================================================================
+# CLONE (dedup giữa 2 cây thư mục trên cùng 1 disk)
+# ======================================================================================================
+def reflink_file(src, dst):
+    """Tạo dst dùng chung block dữ liệu với src (FICLONE), raise OSError nếu filesystem không hỗ trợ"""
+    try:
+        import fcntl  # chỉ có trên Unix
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, "reflink is not supported on this platform")
+    # Ghi qua file tạm để không truncate inode mà dst cũ có thể đang hardlink tới
+    tmp_dst = f"{dst}.reflink-{os.getpid()}"
+    try:
+        with open(src, 'rb') as fsrc, open(tmp_dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, tmp_dst)
+        os.replace(tmp_dst, dst)
+    except OSError:
+        if os.path.exists(tmp_dst):
+            os.remove(tmp_dst)
+        raise
+
+
+def hardlink_file(src, dst):
+    """Hardlink src -> dst, thay thế dst cũ một cách atomic"""
+    tmp_dst = f"{dst}.link-{os.getpid()}"
+    os.link(src, tmp_dst)
+    os.replace(tmp_dst, dst)
+
+
+# ======================================================================================================
+# COPY ENGINE
+# ======================================================================================================
+class CopyEngine:
+    """Copy nhiều file song song bằng thread pool có giới hạn
+
+    Khi resume=True, file đích copy dở được nối tiếp từ offset đã checkpoint
+    (hoặc từ block đầu tiên khác nguồn) thay vì ghi lại từ byte 0. Dữ liệu được ghi vào <đích>.part rồi
+    rename, nên file đích cũ đã được hardlink (vd bản Critical@DATE) không bao giờ bị sửa.
+    """
+
+    def __init__(self, workers=DEFAULT_COPY_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE, method='auto',
+                 checksum=None, resume=False, checkpoint_bytes=DEFAULT_CHECKPOINT_BYTES, verify=False,
+                 throttle=None, io_priority=None, drop_cache=False, scanner=None, metrics=None):
+        if method not in COPY_METHODS:
+            raise ValueError(f"Unknown copy method '{method}', expected one of {COPY_METHODS}")
+        self.workers = max(1, int(workers))
+        # Làm tròn chunk theo page size để buffer luôn aligned
+        self.chunk_size = max(mmap.PAGESIZE, int(chunk_size) // mmap.PAGESIZE * mmap.PAGESIZE)
+        self.method = method
+        # Thuật toán hash (xxh3/blake2b/crc32) tính ngay trong lúc copy: với copy_file_range/sendfile,
+        # mỗi chunk vừa copy được đọc lại từ page cache của nguồn để hash (dữ liệu không đi qua userspace để ghi)
+        self.checksum = 'crc32' if checksum is True else (checksum or None)
+        if self.checksum is not None:
+            new_hasher(self.checksum)  # kiểm tra thuật toán dùng được ngay khi khởi tạo
+        self.resume = resume
+        self.checkpoint_bytes = max(self.chunk_size, int(checkpoint_bytes))
+        # Đọc lại file đích (đã bỏ page cache) và so hash với hash nguồn tính lúc copy
+        self.verify = verify and self.checksum is not None
+        # IOThrottle dùng chung (giới hạn MB/s), I/O class của worker ('idle' để nhường recorder)
+        # và bỏ page cache của dữ liệu đã copy
+        self.throttle = throttle
+        self.io_priority = io_priority
+        self.drop_cache = drop_cache
+        # TreeScanner dùng chung để walk cây nguồn (snapshot đã quét khi lập lịch được dùng lại)
+        self.scanner = scanner if scanner is not None else TreeScanner(max_dirs=0)
+        # SyncMetrics (tùy chọn): thời gian copy/verify và số byte đã ghi
+        self.metrics = metrics
+
+    # --------------------------------------------------------------------------------------------------
+    # Copy 1 file
+    # --------------------------------------------------------------------------------------------------
+    def copy_file(self, src, dst, resume_from=None, checkpoint=None):
+        """Copy 1 file, giữ mode và mtime, trả về (số byte đã ghi, hash hoặc None)
+
+        resume_from: (offset, hash state) đã checkpoint ở lần copy trước,
+        checkpoint(offset, hash state): được gọi sau mỗi checkpoint_bytes, khi dữ liệu đã fdatasync.
+        Khi verify=True, raise ChecksumMismatch nếu file đích đọc lại không khớp hash nguồn.
+        """
+        copy_started = time.perf_counter()
+        target, resuming = self._open_target(dst)
+        with open(src, 'rb') as fsrc:
+            src_fd = fsrc.fileno()
+            size = os.fstat(src_fd).st_size
+            with open(target, 'r+b' if resuming else 'wb') as fdst:
+                dst_fd = fdst.fileno()
+                if resuming:
+                    start, hasher = self._resume_point(src_fd, dst_fd, size, resume_from)
+                    if start:
+                        logging.info("Resuming '%s' at %d / %d bytes", dst, start, size)
+                else:
+                    start, hasher = 0, self._new_hasher()
+                if start == 0:
+                    self._preallocate(dst_fd, size)
+                end, hasher = self._copy_data(src_fd, dst_fd, start, size, hasher, checkpoint)
+                # File đích cũ có thể dài hơn nguồn
+                os.ftruncate(dst_fd, end)
+                if self.verify:
+                    os.fdatasync(dst_fd)  # verify từng file (tùy chọn) chỉ đọc lại được từ disk khi page đã sạch
+                if self.drop_cache:
+                    drop_page_cache(src_fd)
+                    drop_page_cache(dst_fd)  # chỉ bỏ được các page đã ghi xuống disk
+        shutil.copystat(src, target)
+        if target != dst:
+            os.replace(target, dst)
+        self._record('copy', copy_started, end - start)
+        digest = hasher.hexdigest() if hasher is not None else None
+        if self.verify:
+            verify_started = time.perf_counter()
+            dst_digest = hash_file(dst, self.checksum, drop_cache=True, chunk_size=self.chunk_size)
+            self._record('verify', verify_started)
+            if dst_digest != digest:
+                raise ChecksumMismatch(errno.EIO, f"checksum mismatch ({self.checksum} {digest} != {dst_digest})",
+                                       dst)
+        return end - start, digest
+
+    def _open_target(self, dst):
+        """(file sẽ ghi, có resume không) cho đích dst
+
+        resume=True: ghi vào <dst>.part. Part của lần trước được copy tiếp; dst copy dở chưa ai link tới
+        (st_nlink == 1) được đổi tên thành part để copy tiếp, dst đã có hardlink khác thì copy lại từ đầu.
+        resume=False: dst có hardlink khác được unlink trước để 'wb' không truncate bản đang được link tới.
+        """
+        if not self.resume:
+            try:
+                if os.stat(dst).st_nlink > 1:
+                    os.remove(dst)
+            except FileNotFoundError:
+                pass
+            return dst, False
+        part = dst + PARTIAL_SUFFIX
+        if not os.path.exists(part):
+            try:
+                if os.stat(dst).st_nlink == 1:
+                    os.rename(dst, part)
+            except FileNotFoundError:
+                pass
+        return part, os.path.exists(part)
+
+    def _record(self, stage, started, nbytes=None):
+        if self.metrics is None:
+            return
+        self.metrics.inc('stage_seconds_total', time.perf_counter() - started, stage=stage)
+        self.metrics.inc('stage_runs_total', 1, stage=stage)
+        if nbytes is not None:
+            self.metrics.inc('bytes_written_total', nbytes)
+
+    def _consume(self, nbytes):
+        if self.throttle is not None:
+            self.throttle.consume(nbytes)
+
+    def _init_worker(self):
+        if self.io_priority is not None:
+            set_io_priority(self.io_priority)
+
+    def _new_hasher(self, state=None):
+        return new_hasher(self.checksum, state) if self.checksum is not None else None
+
+    def _preallocate(self, fd, size):
+        # Cấp phát trước để giảm phân mảnh trên SSD ngoài, bỏ qua nếu filesystem không hỗ trợ
+        if size > 0 and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError:
+                pass
+
+    def _resume_point(self, src_fd, dst_fd, size, resume_from):
+        """Tìm offset an toàn để copy tiếp, trả về (offset, hasher đã cập nhật phần đã có)"""
+        limit = min(os.fstat(dst_fd).st_size, size)
+        if resume_from is not None:
+            offset, state = resume_from
+            # Kiểm tra lại block cuối trước offset cho chắc
+            block_start = max(0, offset - self.chunk_size)
+            if offset <= limit and (offset == 0 or pread(src_fd, offset - block_start, block_start)
+                                    == pread(dst_fd, offset - block_start, block_start)):
+                if self.checksum is None:
+                    return offset, None
+                if state is not None and self.checksum == 'crc32':
+                    return offset, self._new_hasher(state)
+                # Thuật toán không lưu được state (xxh3/blake2b): chỉ đọc lại phần đầu của nguồn
+                hasher = self._new_hasher()
+                position = 0
+                while position < offset:
+                    self._consume(min(self.chunk_size, offset - position))
+                    block = pread(src_fd, min(self.chunk_size, offset - position), position)
+                    if not block:
+                        break
+                    hasher.update(block)
+                    position += len(block)
+                return offset, hasher
+        # Không có checkpoint dùng được: so sánh từng block, dừng ở block đầu tiên khác nhau
+        offset = 0
+        hasher = self._new_hasher()
+        while offset < limit:
+            count = min(self.chunk_size, limit - offset)
+            self._consume(count)
+            src_block = pread(src_fd, count, offset)
+            if not src_block or src_block != pread(dst_fd, count, offset):
+                break
+            if hasher is not None:
+                hasher.update(src_block)
+            offset += len(src_block)
+        return offset, hasher
+
+    def _copy_data(self, src_fd, dst_fd, offset, size, hasher=None, checkpoint=None):
+        """Copy đoạn [offset, size) từ src sang dst, trả về (offset cuối, hasher)"""
+        if self.method == 'auto':
+            methods = [m for m in ('copy_file_range', 'sendfile') if hasattr(os, m)] + ['buffered']
+        else:
+            methods = [self.method]
+
+        for i, method in enumerate(methods):
+            last = i == len(methods) - 1
+            try:
+                # Phương thức có thể fallback nhận bản sao của hasher: phương thức sau copy lại từ offset ban đầu
+                attempt_hasher = hasher.copy() if hasher is not None and not last else hasher
+                return self._copy_with(method, src_fd, dst_fd, offset, size, attempt_hasher, checkpoint)
+            except OSError as e:
+                if last or e.errno not in FALLBACK_ERRNOS:
+                    raise
+                logging.debug("%s not usable (%s), falling back", method, e)
+
+    def _copy_with(self, method, src_fd, dst_fd, offset, size, hasher, checkpoint):
+        next_checkpoint = offset + self.checkpoint_bytes
+        buf = view = None
+        if method == 'buffered' or hasher is not None:
+            # mmap ẩn danh luôn aligned theo page
+            buf = mmap.mmap(-1, self.chunk_size)
+            view = memoryview(buf)
+        if method == 'sendfile':
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+        try:
+            while offset < size:
+                count = min(self.chunk_size, size - offset)
+                self._consume(count)
+                if method in ('copy_file_range', 'sendfile'):
+                    if method == 'copy_file_range':
+                        n = os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+                    else:
+                        n = os.sendfile(dst_fd, src_fd, offset, count)
+                    if hasher is not None and n > 0:
+                        # Chunk nguồn vừa được kernel đọc nên còn trong page cache
+                        hashed = 0
+                        while hashed < n:
+                            m = preadinto(src_fd, view[hashed:n], offset + hashed)
+                            if m == 0:
+                                raise OSError(errno.EIO, "source shrank while hashing")
+                            hashed += m
+                        hasher.update(view[:n])
+                else:
+                    n = preadinto(src_fd, view[:count], offset)
+                    written = 0
+                    while written < n:
+                        written += pwrite(dst_fd, view[written:n], offset + written)
+                    if hasher is not None:
+                        hasher.update(view[:n])
+                if n == 0:
+                    break
+                if self.drop_cache:
+                    drop_page_cache(src_fd, offset, n)
+                offset += n
+                if checkpoint is not None and offset >= next_checkpoint:
+                    os.fdatasync(dst_fd)
+                    checkpoint(offset, hasher_state(hasher) if hasher is not None else None)
+                    next_checkpoint = offset + self.checkpoint_bytes
+                    if self.drop_cache:
+                        drop_page_cache(dst_fd, 0, offset)
+        finally:
+            if view is not None:
+                view.release()
+                buf.close()
+        return offset, hasher
+
+    def clone_file(self, src, dst, methods=CLONE_METHODS):
+        """Tạo dst có nội dung giống src, ưu tiên reflink > hardlink > copy, trả về phương thức đã dùng"""
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            return 'hardlink'
+        for method in methods:
+            try:
+                if method == 'reflink':
+                    reflink_file(src, dst)
+                elif method == 'hardlink':
+                    hardlink_file(src, dst)
+                else:
+                    if os.path.lexists(dst):
+                        os.remove(dst)
+                    self.copy_file(src, dst)
+                return method
+            except OSError as e:
+                if method == methods[-1]:
+                    raise
+                logging.debug("%s '%s' -> '%s' not possible (%s), falling back", method, src, dst, e)
+        raise ValueError(f"No clone method given for '{src}'")
+
+    # --------------------------------------------------------------------------------------------------
+    # Fan-out: đọc 1 lần, ghi ra nhiều đích
+    # --------------------------------------------------------------------------------------------------
+    def copy_file_multi(self, src, dsts, resume_froms=None, checkpoints=None, writer_pool=None):
+        """Đọc src 1 lần và ghi đồng thời ra nhiều file đích (vd bản chính + bản backup trên SSD khác)
+
+        Mỗi đích có resume point/checkpoint riêng như copy_file. Trả về (số byte đã đọc, hash hoặc None).
+        """
+        count_dst = len(dsts)
+        resume_froms = resume_froms or [None] * count_dst
+        checkpoints = checkpoints or [None] * count_dst
+        own_pool = writer_pool is None
+        if own_pool:
+            writer_pool = ThreadPoolExecutor(max_workers=count_dst)
+        try:
+            copy_started = time.perf_counter()
+            with open(src, 'rb') as fsrc, ExitStack() as stack:
+                src_fd = fsrc.fileno()
+                size = os.fstat(src_fd).st_size
+                dst_fds, starts, hashers, targets = [], [], [], []
+                for dst, resume_from in zip(dsts, resume_froms):
+                    target, resuming = self._open_target(dst)
+                    targets.append(target)
+                    dst_fd = stack.enter_context(open(target, 'r+b' if resuming else 'wb')).fileno()
+                    if resuming:
+                        start, hasher = self._resume_point(src_fd, dst_fd, size, resume_from)
+                    else:
+                        start, hasher = 0, self._new_hasher()
+                    if start == 0:
+                        self._preallocate(dst_fd, size)
+                    dst_fds.append(dst_fd)
+                    starts.append(start)
+                    hashers.append(hasher)
+                # Đọc từ đích chậm nhất, các đích đã có sẵn phần đầu chỉ ghi phần còn thiếu
+                first = min(range(count_dst), key=lambda k: starts[k])
+                offset, hasher = starts[first], hashers[first]
+                start_offset = offset
+                end = self._copy_fan_out(src_fd, dst_fds, starts, offset, size, hasher, checkpoints, writer_pool)
+                for dst_fd in dst_fds:
+                    os.ftruncate(dst_fd, end)
+                    if self.verify:
+                        os.fdatasync(dst_fd)
+                    if self.drop_cache:
+                        drop_page_cache(dst_fd)
+                if self.drop_cache:
+                    drop_page_cache(src_fd)
+            for dst, target in zip(dsts, targets):
+                shutil.copystat(src, target)
+                if target != dst:
+                    os.replace(target, dst)
+            self._record('copy', copy_started, sum(end - start for start in starts))
+            digest = hasher.hexdigest() if hasher is not None else None
+            if self.verify:
+                verify_started = time.perf_counter()
+                verify_futures = [(dst, writer_pool.submit(hash_file, dst, self.checksum, True, self.chunk_size))
+                                  for dst in dsts]
+                dst_digests = [(dst, future.result()) for dst, future in verify_futures]
+                self._record('verify', verify_started)
+                for dst, dst_digest in dst_digests:
+                    if dst_digest != digest:
+                        raise ChecksumMismatch(errno.EIO, f"checksum mismatch ({self.checksum} {digest} != "
+                                                          f"{dst_digest})", dst)
+            return end - start_offset, digest
+        finally:
+            if own_pool:
+                writer_pool.shutdown()
+
+    def _copy_fan_out(self, src_fd, dst_fds, starts, offset, size, hasher, checkpoints, writer_pool):
+        # 2 buffer luân phiên: đọc chunk kế tiếp trong lúc chunk trước đang được ghi ra các đích
+        buffers = [mmap.mmap(-1, self.chunk_size) for _ in range(2)]
+        views = [memoryview(buf) for buf in buffers]
+        pending = []
+        next_checkpoint = offset + self.checkpoint_bytes
+        index = 0
+        try:
+            while offset < size:
+                count = min(self.chunk_size, size - offset)
+                self._consume(count)
+                view = views[index % 2]
+                n = preadinto(src_fd, view[:count], offset)
+                if n == 0:
+                    break
+                if hasher is not None:
+                    hasher.update(view[:n])
+                for future in pending:
+                    future.result()
+                pending = [writer_pool.submit(_pwrite_from, dst_fd, view, offset, n, start)
+                           for dst_fd, start in zip(dst_fds, starts) if offset + n > start]
+                if self.drop_cache:
+                    drop_page_cache(src_fd, offset, n)
+                offset += n
+                index += 1
+                if offset >= next_checkpoint:
+                    for future in pending:
+                        future.result()
+                    pending = []
+                    for dst_fd, checkpoint in zip(dst_fds, checkpoints):
+                        if checkpoint is not None:
+                            os.fdatasync(dst_fd)
+                            checkpoint(offset, hasher_state(hasher) if hasher is not None else None)
+                    next_checkpoint = offset + self.checkpoint_bytes
+            for future in pending:
+                future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            for view, buf in zip(views, buffers):
+                view.release()
+                buf.close()
+        return offset
+
+    def copy_tree_multi(self, src, dsts, journals=None):
+        """Copy folder src ra nhiều folder đích, mỗi file nguồn chỉ đọc 1 lần
+
+        journals: list journal tương ứng từng đích (hoặc None). Trả về list file đích đã ghi.
+        """
+        journals = journals or [None] * len(dsts)
+        if len(dsts) == 1:
+            return self.copy_tree(src, dsts[0], journals[0])
+
+        with ThreadPoolExecutor(max_workers=self.workers * len(dsts)) as writer_pool:
+            def run(src_file, dst_targets, rel_path, st):
+                _, checksum = self.copy_file_multi(
+                    src_file, [dst_file for dst_file, _ in dst_targets],
+                    resume_froms=[journal.resume_point(rel_path, st) if journal else None
+                                  for _, journal in dst_targets],
+                    checkpoints=[_journal_checkpoint(journal, rel_path, st) for _, journal in dst_targets],
+                    writer_pool=writer_pool)
+                for _, journal in dst_targets:
+                    if journal is not None:
+                        journal.file_copied(rel_path, st, checksum)
+
+            return self._run_tree(src, list(zip(dsts, journals)), run)
+
+    # --------------------------------------------------------------------------------------------------
+    # Copy cả cây thư mục
+    # --------------------------------------------------------------------------------------------------
+    def clone_tree(self, src, dst, journal=None, methods=CLONE_METHODS, exclude=()):
+        """Dựng cây dst từ cây src đã copy trên cùng disk mà không ghi lại dữ liệu
+
+        exclude: các rel_path không clone (vd marker/manifest hash của folder src).
+        Trả về dict số file theo phương thức (reflink/hardlink/copy).
+        """
+        counts = dict.fromkeys(CLONE_METHODS, 0)
+        lock = threading.Lock()
+
+        def clone(src_file, dst_targets, rel_path, st):
+            (dst_file, _), = dst_targets
+            method = self.clone_file(src_file, dst_file, methods)
+            with lock:
+                counts[method] += 1
+            if journal is not None:
+                journal.file_copied(rel_path, st, None)
+
+        self._run_tree(src, [(dst, journal)], clone, exclude)
+        return counts
+
+    def copy_tree(self, src, dst, journal=None):
+        """Copy folder src sang dst (kể cả khi dst đã tồn tại), trả về list file đích như copy_tree
+
+        journal (tùy chọn, vd SyncManifest.journal()) cung cấp:
+        skip_file(rel_path, stat), resume_point(rel_path, stat),
+        checkpoint(rel_path, stat, offset, hash_state) và file_copied(rel_path, stat, checksum).
+        Các hàm này được gọi từ worker thread.
+        """
+        def run(src_file, dst_targets, rel_path, st):
+            (dst_file, _), = dst_targets
+            if journal is None:
+                self.copy_file(src_file, dst_file)
+                return
+            _, checksum = self.copy_file(
+                src_file, dst_file,
+                resume_from=journal.resume_point(rel_path, st),
+                checkpoint=_journal_checkpoint(journal, rel_path, st))
+            journal.file_copied(rel_path, st, checksum)
+
+        return self._run_tree(src, [(dst, journal)], run)
+
+    def _run_tree(self, src, targets, run, exclude=()):
+        """Duyệt cây src, tạo folder ở mọi đích và chạy run(src_file, dst_targets, rel_path, stat)
+        trên thread pool; targets/dst_targets là list (đường dẫn đích, journal), bỏ qua rel_path trong exclude"""
+        if not os.path.isdir(src):
+            raise OSError(f"cannot copy tree '{src}': not a directory")
+
+        jobs = []
+        for dir_path, dir_names, files in self.scanner.walk(src):
+            rel_dir = os.path.relpath(dir_path, src)
+            dst_dirs = []
+            for dst, journal in targets:
+                dst_dir = os.path.normpath(os.path.join(dst, rel_dir))
+                os.makedirs(dst_dir, exist_ok=True)
+                dst_dirs.append((dst_dir, journal))
+            for file_name, st in files.items():
+                src_file = os.path.join(dir_path, file_name)
+                rel_path = os.path.normpath(os.path.join(rel_dir, file_name))
+                if rel_path in exclude:
+                    continue
+                dst_targets = [(os.path.join(dst_dir, file_name), journal) for dst_dir, journal in dst_dirs
+                               if journal is None or not journal.skip_file(rel_path, st)]
+                if dst_targets:
+                    jobs.append((src_file, dst_targets, rel_path, st))
+
+        # File lớn chạy trước để các worker kết thúc gần cùng lúc
+        jobs.sort(key=lambda job: job[3].st_size, reverse=True)
+
+        outputs = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.workers, initializer=self._init_worker) as pool:
+            futures = [(pool.submit(run, *job), job[0], [dst_file for dst_file, _ in job[1]]) for job in jobs]
+            for future, src_file, dst_files in futures:
+                try:
+                    future.result()
+                    outputs.extend(dst_files)
+                except OSError as e:
+                    logging.error(f"Failed to copy '{src_file}' -> {dst_files}: {e}")
+                    errors.append((src_file, e))
+
+        if errors:
+            src_file, error = errors[0]
+            raise OSError(f"{len(errors)} file(s) failed to copy, first: '{src_file}': {error}")
+        return outputs
+
+
+def _journal_checkpoint(journal, rel_path, st):
+    if journal is None:
+        return None
+    return lambda offset, state: journal.checkpoint(rel_path, st, offset, state)
+
+
+def _pwrite_from(dst_fd, view, offset, n, start):
+    """Ghi view[:n] (dữ liệu tại offset của nguồn) vào dst, bỏ phần trước start mà đích đã có"""
+    written = max(0, start - offset)
+    while written < n:
+        written += pwrite(dst_fd, view[written:n], offset + written)
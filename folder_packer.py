@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""Đóng gói raw folder thành vài archive tar lớn, nén theo frame (zstd/lz4/gzip), có index để đọc ngẫu nhiên
+
+Mỗi chunk là 1 luồng tar được cắt thành các frame FRAME_SIZE byte (chưa nén), mỗi frame nén độc lập rồi ghi
+nối tiếp: `zstd -dc part-0000.tar.zst | tar x` vẫn giải nén được cả chunk, còn index.json ghi vị trí từng frame
+và vị trí dữ liệu của từng file nên đọc 1 file chỉ phải giải nén vài frame.
+
+    python3 folder_packer.py pack SRC_FOLDER PACK_DIR [--codec zstd] [--workers 8]
+    python3 folder_packer.py list PACK_DIR
+    python3 folder_packer.py cat PACK_DIR REL_PATH > file
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import bisect
+import shutil
+import logging
+import tarfile
+import argparse
+import threading
+import multiprocessing
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from io_throttle import set_io_priority
+from tree_scanner import TreeScanner
+
+try:
+    import zstandard  # tùy chọn
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame as lz4_frame  # tùy chọn
+except ImportError:
+    lz4_frame = None
+
+# ======================================================================================================
+# CONFIG
+# ======================================================================================================
+CODECS = ('zstd', 'lz4', 'gzip', 'none')
+DEFAULT_CODEC = 'zstd' if zstandard is not None else 'lz4' if lz4_frame is not None else 'gzip'
+CODEC_EXTENSIONS = {'zstd': '.tar.zst', 'lz4': '.tar.lz4', 'gzip': '.tar.gz', 'none': '.tar'}
+COMPRESSION_LEVELS = {'zstd': 3, 'lz4': 0, 'gzip': 1, 'none': 0}
+DEFAULT_CHUNK_SIZE = 512 * 1024 * 1024  # dữ liệu chưa nén mỗi archive, file lớn hơn thì nằm riêng 1 archive
+FRAME_SIZE = 4 * 1024 * 1024  # đơn vị truy cập ngẫu nhiên
+READ_CHUNK_SIZE = 1024 * 1024
+PACK_INDEX_NAME = 'index.json'
+PARTIAL_SUFFIX = '.partial'  # pack chưa xong nằm trong <pack_dir>.partial, rename khi đã ghi index
+WORKER_NICE = 10  # process nén nhường CPU cho recorder và vòng copy
+DEFAULT_PACK_RATIO = 1.0  # size archive / size dữ liệu khi chưa đóng gói folder nào (dữ liệu sensor nén được ít)
+
+_preforked_pool = None  # pool fork bởi prefork_workers() lúc process chưa có thread
+
+
+def resolve_codec(codec):
+    """Codec dùng được trên máy này: zstd/lz4 thiếu package thì lùi về gzip (stdlib)"""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown pack codec '{codec}', expected one of {CODECS}")
+    if (codec == 'zstd' and zstandard is None) or (codec == 'lz4' and lz4_frame is None):
+        logging.warning(f"Pack codec '{codec}' needs an extra package, falling back to gzip")
+        return 'gzip'
+    return codec
+
+
+def compress_frame(codec, data, level):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    if codec == 'lz4':
+        return lz4_frame.compress(data, compression_level=level)
+    if codec == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return bytes(data)
+
+
+def decompress_frame(codec, data):
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'lz4':
+        return lz4_frame.decompress(data)
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    return data
+
+
+# ======================================================================================================
+# WORKER (chạy trong process của pool)
+# ======================================================================================================
+class FrameWriter:
+    """File object cho tarfile: gom luồng tar thành frame, nén từng frame rồi ghi ra mọi file đích"""
+
+    def __init__(self, outputs, codec, level, frame_size):
+        self.outputs = outputs
+        self.codec = codec
+        self.level = level
+        self.frame_size = frame_size
+        self.position = 0  # số byte tar (chưa nén) đã nhận
+        self.compressed_size = 0
+        self.frames = []  # [offset chưa nén, offset đã nén, kích thước đã nén]
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        self.position += len(data)
+        while len(self._buffer) >= self.frame_size:
+            self._emit(self.frame_size)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush_frames(self):
+        if self._buffer:
+            self._emit(len(self._buffer))
+
+    def _emit(self, size):
+        frame = compress_frame(self.codec, bytes(self._buffer[:size]), self.level)
+        for output in self.outputs:
+            output.write(frame)
+        self.frames.append([self.position - len(self._buffer), self.compressed_size, len(frame)])
+        self.compressed_size += len(frame)
+        del self._buffer[:size]
+
+
+def _init_worker():
+    # nice/I/O class trên Linux áp dụng cho thread gọi, nên dùng được cho cả pool thread dự phòng
+    try:
+        os.nice(WORKER_NICE)
+    except OSError:
+        pass
+    set_io_priority('idle')
+
+
+def pack_chunk(src_folder, rel_paths, output_paths, codec, level, frame_size):
+    """Ghi 1 chunk (cùng nội dung) ra mọi output_paths, trả về frame index và vị trí của từng file"""
+    started = time.perf_counter()
+    members = {}
+    with ExitStack() as stack:
+        outputs = [stack.enter_context(open(path, 'wb')) for path in output_paths]
+        writer = FrameWriter(outputs, codec, level, frame_size)
+        with tarfile.open(fileobj=writer, mode='w', format=tarfile.PAX_FORMAT,
+                          copybufsize=READ_CHUNK_SIZE) as tar:
+            for rel_path in rel_paths:
+                path = os.path.join(src_folder, rel_path)
+                tarinfo = tar.gettarinfo(path, arcname=rel_path)
+                with open(path, 'rb') as file:
+                    tar.addfile(tarinfo, file)
+                # Sau addfile, tar.offset là cuối phần dữ liệu (đã pad lên bội số BLOCKSIZE)
+                padded_size = -(-tarinfo.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                members[rel_path] = (tar.offset - padded_size, tarinfo.size, tarinfo.mtime)
+        writer.flush_frames()
+        for output in outputs:
+            output.flush()
+            os.fsync(output.fileno())
+    return {
+        'frames': writer.frames,
+        'tar_size': writer.position,
+        'size': writer.compressed_size,
+        'members': members,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+# ======================================================================================================
+# PACKER
+# ======================================================================================================
+def _fork_pool(workers):
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'), initializer=_init_worker)
+    pool.submit(os.getpid)  # với fork, pool tạo đủ process ngay ở lần submit đầu tiên
+    return pool
+
+
+def prefork_workers(workers=0):
+    """Fork sẵn process nén, gọi ở đầu entry point trước khi process có thread nào (vd QueueListener của logging)
+
+    Fork 1 process đang có thread có thể làm process con kẹt ở lock (logging...) mà thread khác giữ lúc fork.
+    FolderPacker tạo sau đó dùng lại pool này.
+    """
+    global _preforked_pool
+    if _preforked_pool is None:
+        _preforked_pool = _fork_pool(workers or os.cpu_count() or 1)
+    return _preforked_pool
+
+
+def plan_chunks(files, chunk_size):
+    """Chia dict rel_path -> stat thành các nhóm ~chunk_size byte theo thứ tự rel_path"""
+    chunks, current, current_size = [], [], 0
+    for rel_path in sorted(files):
+        size = files[rel_path].st_size
+        if current and current_size + size > chunk_size:
+            chunks.append(current)
+            current, current_size = [], 0
+        current.append(rel_path)
+        current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class PackJob:
+    """Trạng thái đóng gói của 1 raw folder, done được set khi xong (kể cả lỗi)"""
+
+    def __init__(self, raw_name, src_folder, pack_dirs, chunk_files, checksums, hash_algorithm):
+        self.raw_name = raw_name
+        self.src_folder = src_folder
+        self.pack_dirs = pack_dirs
+        self.chunk_files = chunk_files
+        self.checksums = checksums or {}
+        self.hash_algorithm = hash_algorithm
+        self.results = [None] * len(chunk_files)
+        self.remaining = len(chunk_files)
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def partial_dirs(self):
+        return [pack_dir + PARTIAL_SUFFIX for pack_dir in self.pack_dirs]
+
+
+class FolderPacker:
+    """Đóng gói raw folder trên process pool, submit() trả về ngay nên chạy song song với vòng copy
+
+    Process nén dùng fork (spawn/forkserver sẽ chạy lại script GUI, không có `if __name__ == '__main__'`,
+    trong mỗi process con) và chỉ được fork khi process chưa có thread: lấy pool của prefork_workers(), hoặc
+    tự fork nếu chỉ có main thread (CLI). Không thì, và khi pool bị hỏng (process nén bị kill), nén trên
+    pool thread thay vì fork giữa chừng. Process/thread nén chạy với nice và I/O class idle.
+    Kết quả: <pack_dir>/part-NNNN.tar.zst + index.json, mỗi pack_dir nhận cùng 1 nội dung.
+    """
+
+    def __init__(self, workers=0, codec=DEFAULT_CODEC, chunk_size=DEFAULT_CHUNK_SIZE, frame_size=FRAME_SIZE,
+                 level=None, scanner=None, metrics=None, on_message=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.codec = resolve_codec(codec)
+        self.level = COMPRESSION_LEVELS[self.codec] if level is None else level
+        self.chunk_size = chunk_size
+        self.frame_size = frame_size
+        self.scanner = scanner if scanner is not None else TreeScanner(max_dirs=0)
+        self.metrics = metrics
+        self.on_message = on_message
+        self._lock = threading.Lock()
+        self._pool = None
+        self._jobs = set()
+        self._futures = set()  # chunk chưa xong, close() hủy chunk chưa chạy
+        self._input_bytes = self._output_bytes = 0  # tổng của các folder đã đóng gói, để ước lượng size archive
+        self._get_pool()
+
+    def _get_pool(self):
+        global _preforked_pool
+        with self._lock:
+            if self._pool is None:
+                if _preforked_pool is not None:
+                    self._pool, _preforked_pool = _preforked_pool, None
+                elif threading.active_count() == 1:
+                    self._pool = _fork_pool(self.workers)
+                else:
+                    logging.warning("Process already has threads, packing on a thread pool instead of forking")
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='pack',
+                                                    initializer=_init_worker)
+            return self._pool
+
+    def is_packed(self, pack_dir):
+        return os.path.exists(os.path.join(pack_dir, PACK_INDEX_NAME))
+
+    def estimate_size(self, input_bytes):
+        """Size archive ước lượng cho input_bytes dữ liệu, theo tỉ lệ nén của các folder đã đóng gói"""
+        with self._lock:
+            ratio = self._output_bytes / self._input_bytes if self._input_bytes else DEFAULT_PACK_RATIO
+        return int(input_bytes * ratio)
+
+    def pending(self):
+        """Số raw folder đang chờ/đang đóng gói"""
+        with self._lock:
+            return len(self._jobs)
+
+    def submit(self, raw_name, src_folder, pack_dirs, checksums=None, hash_algorithm=None, exclude=()):
+        """Bắt đầu đóng gói src_folder vào mỗi folder trong pack_dirs, None nếu tất cả đã đóng gói rồi
+
+        exclude: rel_path không đóng gói (vd marker/manifest do sync ghi vào folder đích).
+        """
+        pack_dirs = [pack_dir for pack_dir in pack_dirs if not self.is_packed(pack_dir)]
+        if not pack_dirs:
+            return None
+        files = {rel_path: st for rel_path, st in self.scanner.files(src_folder).items() if rel_path not in exclude}
+        chunks = plan_chunks(files, self.chunk_size)
+        chunk_files = [f"part-{index:04d}{CODEC_EXTENSIONS[self.codec]}" for index in range(len(chunks))]
+        job = PackJob(raw_name, src_folder, pack_dirs, chunk_files, checksums, hash_algorithm)
+        for partial_dir in job.partial_dirs:
+            shutil.rmtree(partial_dir, ignore_errors=True)  # lần đóng gói trước bị ngắt
+            os.makedirs(partial_dir)
+        with self._lock:
+            self._jobs.add(job)
+        if not chunks:
+            self._finish(job)
+            return job
+        pool = self._get_pool()
+        for index, (rel_paths, chunk_file) in enumerate(zip(chunks, chunk_files)):
+            future = pool.submit(pack_chunk, src_folder, rel_paths,
+                                 [os.path.join(partial_dir, chunk_file) for partial_dir in job.partial_dirs],
+                                 self.codec, self.level, self.frame_size)
+            with self._lock:
+                self._futures.add(future)
+            future.add_done_callback(lambda future, index=index: self._chunk_done(job, index, future))
+        return job
+
+    def _chunk_done(self, job, index, future):
+        """Callback của pool (thread quản lý pool), chunk cuối cùng ghi index và commit pack"""
+        if future.cancelled():
+            error = RuntimeError("packing cancelled")
+        else:
+            error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            # Process nén bị kill (vd OOM): shutdown pool hỏng, lần submit sau nén trên pool thread. Không chờ vì
+            # callback chạy trên thread quản lý của chính pool đó; chunk khác của pool hỏng không thay pool thread
+            with self._lock:
+                broken = self._pool if isinstance(self._pool, ProcessPoolExecutor) else None
+                if broken is not None:
+                    self._pool = None
+            if broken is not None:
+                broken.shutdown(wait=False)
+        with self._lock:
+            self._futures.discard(future)
+            if error is not None:
+                job.error = job.error or error
+            else:
+                job.results[index] = future.result()
+            job.remaining -= 1
+            finished = job.remaining == 0
+        if finished:
+            self._finish(job)
+
+    def _finish(self, job):
+        try:
+            if job.error is not None:
+                raise job.error
+            index = self.build_index(job)
+            for partial_dir, pack_dir in zip(job.partial_dirs, job.pack_dirs):
+                with open(os.path.join(partial_dir, PACK_INDEX_NAME), 'w') as file:
+                    json.dump(index, file)
+                    file.flush()
+                    os.fsync(file.fileno())
+                if os.path.exists(pack_dir):
+                    shutil.rmtree(pack_dir)
+                os.rename(partial_dir, pack_dir)
+            self._report(job, index)
+        except Exception as e:
+            logging.error(f"Packing '{job.raw_name}' failed: {e}", exc_info=True)
+            for partial_dir in job.partial_dirs:
+                shutil.rmtree(partial_dir, ignore_errors=True)
+            if self.metrics is not None:
+                self.metrics.inc('folders_pack_failed_total')
+            if self.on_message is not None:
+                self.on_message(f"ERROR: Packing '{job.raw_name}' failed. {e}")
+        finally:
+            with self._lock:
+                self._jobs.discard(job)
+            job.done.set()
+
+    def build_index(self, job):
+        chunks, files = [], {}
+        for chunk_index, (chunk_file, result) in enumerate(zip(job.chunk_files, job.results)):
+            chunks.append({'file': chunk_file, 'size': result['size'], 'tar_size': result['tar_size'],
+                           'frames': result['frames']})
+            for rel_path, (offset, size, mtime) in result['members'].items():
+                files[rel_path] = {'chunk': chunk_index, 'offset': offset, 'size': size, 'mtime': mtime}
+                if rel_path in job.checksums:
+                    files[rel_path]['checksum'] = job.checksums[rel_path]
+        return {
+            'version': 1,
+            'raw_name': job.raw_name,
+            'codec': self.codec,
+            'frame_size': self.frame_size,
+            'hash_algorithm': job.hash_algorithm,
+            'created': time.time(),
+            'chunks': chunks,
+            'files': files,
+        }
+
+    def _report(self, job, index):
+        input_bytes = sum(entry['size'] for entry in index['files'].values())
+        output_bytes = sum(chunk['size'] for chunk in index['chunks'])
+        seconds = sum(result['seconds'] for result in job.results)
+        if self.metrics is not None:
+            self.metrics.inc('stage_seconds_total', seconds, stage='pack')
+            self.metrics.inc('stage_runs_total', 1, stage='pack')
+            self.metrics.inc('pack_input_bytes_total', input_bytes)
+            self.metrics.inc('pack_output_bytes_total', output_bytes)
+            self.metrics.inc('folders_packed_total')
+        with self._lock:
+            self._input_bytes += input_bytes
+            self._output_bytes += output_bytes
+        ratio = output_bytes / input_bytes if input_bytes else 1.0
+        message = (f"Packed {job.raw_name}: {len(index['files'])} file(s) into {len(index['chunks'])} "
+                   f"{self.codec} archive(s), {output_bytes / 1024 ** 2:.0f} MiB ({ratio:.0%})")
+        logging.info(message)
+        if self.on_message is not None:
+            self.on_message(message)
+
+    def close(self, wait=True):
+        """Hủy chunk chưa chạy, chờ chunk đang nén (pack dở được dọn ở lần đóng gói sau)"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()  # shutdown(cancel_futures=True) cần Python 3.9
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+# ======================================================================================================
+# ĐỌC
+# ======================================================================================================
+class PackReader:
+    """Đọc ngẫu nhiên 1 file trong pack, chỉ giải nén các frame chứa file đó"""
+
+    def __init__(self, pack_dir):
+        self.pack_dir = pack_dir
+        with open(os.path.join(pack_dir, PACK_INDEX_NAME)) as file:
+            self.index = json.load(file)
+        self.codec = self.index['codec']
+
+    def names(self):
+        return sorted(self.index['files'])
+
+    def read(self, rel_path):
+        entry = self.index['files'][rel_path]
+        chunk = self.index['chunks'][entry['chunk']]
+        frames = chunk['frames']
+        first = bisect.bisect_right([frame[0] for frame in frames], entry['offset']) - 1
+        end = entry['offset'] + entry['size']
+        data = bytearray()
+        with open(os.path.join(self.pack_dir, chunk['file']), 'rb') as file:
+            for uncompressed_offset, compressed_offset, compressed_size in frames[first:]:
+                if uncompressed_offset >= end and data:
+                    break
+                file.seek(compressed_offset)
+                data += decompress_frame(self.codec, file.read(compressed_size))
+        start = entry['offset'] - frames[first][0]
+        return bytes(data[start:start + entry['size']])
+
+
+# ======================================================================================================
+# CLI
+# ======================================================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack a raw folder into chunked, seekable tar archives")
+    commands = parser.add_subparsers(dest='command', required=True)
+    pack_parser = commands.add_parser('pack')
+    pack_parser.add_argument('src_folder')
+    pack_parser.add_argument('pack_dir')
+    pack_parser.add_argument('--codec', choices=CODECS, default=DEFAULT_CODEC)
+    pack_parser.add_argument('--workers', type=int, default=0)
+    pack_parser.add_argument('--chunk-mb', type=int, default=DEFAULT_CHUNK_SIZE // 1024 ** 2)
+    list_parser = commands.add_parser('list')
+    list_parser.add_argument('pack_dir')
+    cat_parser = commands.add_parser('cat')
+    cat_parser.add_argument('pack_dir')
+    cat_parser.add_argument('rel_path')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+
+    if args.command == 'pack':
+        packer = FolderPacker(args.workers, args.codec, args.chunk_mb * 1024 ** 2)
+        job = packer.submit(os.path.basename(os.path.normpath(args.src_folder)), args.src_folder, [args.pack_dir])
+        if job is not None:
+            job.done.wait()
+        packer.close()
+        return 1 if job is not None and job.error is not None else 0
+    reader = PackReader(args.pack_dir)
+    if args.command == 'list':
+        for rel_path in reader.names():
+            entry = reader.index['files'][rel_path]
+            print(f"{entry['size']:>14} {reader.index['chunks'][entry['chunk']]['file']} {rel_path}")
+    else:
+        sys.stdout.buffer.write(reader.read(args.rel_path))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Theo dõi car folder bằng Linux inotify (ctypes), thay cho vòng polling 60 giây"""
+import os
+import time
+import heapq
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+
+# ======================================================================================================
+# INOTIFY CONSTANTS (linux/inotify.h)
+# ======================================================================================================
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+CAR_FOLDER_MASK = IN_CREATE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+RAW_FOLDER_MASK = IN_CLOSE_WRITE | IN_MOVED_TO
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+READ_BUFFER_SIZE = 64 * 1024
+COMPLETION_SLACK_SECONDS = 1  # chờ thêm chút để is_completed() chắc chắn trả về True
+
+
+class InotifyUnavailable(OSError):
+    """Kernel/libc không hỗ trợ inotify"""
+
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise InotifyUnavailable("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise InotifyUnavailable("inotify is not supported by this libc")
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        _libc = libc
+    return _libc
+
+
+# ======================================================================================================
+# WATCHER
+# ======================================================================================================
+class RawFolderWatcher:
+    """Xếp hàng các raw folder mới và file tag .txt khi chúng xuất hiện trong car folder
+
+    completion_time(raw_name) trả về thời điểm (datetime) folder được coi là completed,
+    hoặc None nếu tên không hợp lệ. wait_ready() trả về các folder vừa tới hạn.
+    """
+
+    def __init__(self, car_folder, completion_time):
+        self.car_folder = car_folder
+        self.completion_time = completion_time
+        self.needs_rescan = False  # True khi queue inotify bị tràn hoặc car folder bị xóa/di chuyển
+        self._pending = []  # heap (deadline timestamp, raw_name)
+        self._queued = set()
+        self._raw_by_wd = {}
+        libc = _get_libc()
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise InotifyUnavailable(err, os.strerror(err))
+        self._car_wd = self._add_watch(car_folder, CAR_FOLDER_MASK)
+        # Các raw folder đã có sẵn cũng được theo dõi file tag
+        with os.scandir(car_folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False) and '@' in entry.name:
+                    self._watch_raw_folder(entry.name)
+
+    def fileno(self):
+        return self._fd
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _add_watch(self, path, mask):
+        wd = _get_libc().inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def _watch_raw_folder(self, raw_name):
+        try:
+            wd = self._add_watch(os.path.join(self.car_folder, raw_name), RAW_FOLDER_MASK)
+            self._raw_by_wd[wd] = raw_name
+        except OSError as e:
+            logging.warning(f"Cannot watch raw folder '{raw_name}': {e}")
+
+    def _enqueue(self, raw_name):
+        completed_at = self.completion_time(raw_name)
+        if completed_at is None or raw_name in self._queued:
+            return
+        self._queued.add(raw_name)
+        heapq.heappush(self._pending, (completed_at.timestamp() + COMPLETION_SLACK_SECONDS, raw_name))
+        logging.info("Watcher queued '%s', due at %s", raw_name, completed_at)
+
+    # --------------------------------------------------------------------------------------------------
+    # Đọc event
+    # --------------------------------------------------------------------------------------------------
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, READ_BUFFER_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+            self._handle_event(wd, mask, name)
+
+    def _handle_event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            logging.warning("inotify queue overflow, a full rescan is needed")
+            self.needs_rescan = True
+        elif wd == self._car_wd:
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                logging.warning(f"Car folder '{self.car_folder}' was removed or moved")
+                self.needs_rescan = True
+            elif mask & IN_ISDIR and '@' in name:
+                self._watch_raw_folder(name)
+                self._enqueue(name)
+        elif mask & IN_IGNORED:
+            self._raw_by_wd.pop(wd, None)
+        elif wd in self._raw_by_wd and name.endswith('.txt'):
+            # File tag vừa được ghi xong: folder cần được (xét lại) sync
+            self._enqueue(self._raw_by_wd[wd])
+
+    def wait_ready(self, timeout):
+        """Chờ tối đa timeout giây, trả về list raw folder đã qua thời gian completed"""
+        end = time.monotonic() + timeout
+        while True:
+            now = time.time()
+            ready = []
+            while self._pending and self._pending[0][0] <= now:
+                _, raw_name = heapq.heappop(self._pending)
+                self._queued.discard(raw_name)
+                ready.append(raw_name)
+            if ready or self.needs_rescan:
+                return ready
+            remaining = max(0.0, end - time.monotonic())
+            if self._pending:
+                remaining = min(remaining, max(0.0, self._pending[0][0] - now))
+            # timeout=0 vẫn đọc các event đang chờ (non-blocking)
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if readable:
+                self._read_events()
+            elif time.monotonic() >= end:
+                return []
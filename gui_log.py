@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Đưa log từ thread sync lên GUI Tk theo batch, widget log giới hạn số dòng (ring buffer)"""
+from queue import SimpleQueue, Empty
+
+DRAIN_INTERVAL_MS = 200  # chu kỳ GUI lấy log từ queue
+MAX_BATCH_LINES = 500  # số dòng tối đa chèn vào widget mỗi lần, phần còn lại để lần sau
+MAX_VIEW_LINES = 2000  # số dòng tối đa giữ trong widget log
+
+
+class LogPipeline:
+    """Queue giữa thread sync và GUI: put() không chặn, GUI lấy ra theo batch trên main thread"""
+
+    def __init__(self):
+        self._queue = SimpleQueue()
+
+    def put(self, line):
+        self._queue.put_nowait(line)
+
+    def drain(self, max_lines=MAX_BATCH_LINES):
+        """Lấy tối đa max_lines dòng đang chờ"""
+        lines = []
+        try:
+            while len(lines) < max_lines:
+                lines.append(self._queue.get_nowait())
+        except Empty:
+            pass
+        return lines
+
+
+class LogView:
+    """Text widget chỉ giữ max_lines dòng cuối
+
+    Mỗi batch chỉ có 1 lần insert (và 1 lần delete phần đầu nếu vượt giới hạn), chỉ tự cuộn xuống cuối
+    khi người dùng đang ở cuối log, để kéo lên xem log cũ không bị giật về.
+    """
+
+    def __init__(self, text_widget, max_lines=MAX_VIEW_LINES):
+        self.text = text_widget
+        self.max_lines = max_lines
+        self.line_count = 0
+
+    def append(self, lines):
+        if not lines:
+            return
+        follow = self.text.yview()[1] >= 1.0
+        text = "\n".join(lines) + "\n"
+        self.text.insert('end', text)
+        self.line_count += text.count("\n")  # 1 message có thể nhiều dòng (vd traceback)
+        excess = self.line_count - self.max_lines
+        if excess > 0:
+            self.text.delete('1.0', f'{excess + 1}.0')
+            self.line_count -= excess
+        if follow:
+            self.text.see('end')
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Hash file (xxh3 / BLAKE2 / CRC32) và manifest hash theo folder trên SSD đích"""
+import os
+import json
+import zlib
+import time
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from atomic_commit import syncfs
+
+try:
+    import xxhash  # tùy chọn, nhanh nhất
+except ImportError:
+    xxhash = None
+
+# ======================================================================================================
+# CONFIG
+# ======================================================================================================
+HASH_ALGORITHMS = ('xxh3', 'blake2b', 'crc32')
+DEFAULT_HASH_ALGORITHM = 'xxh3' if xxhash is not None else 'blake2b'
+FOLDER_MANIFEST_NAME = '.sync_hashes.json'
+READ_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class Crc32Hasher:
+    """CRC32 của zlib với giao diện giống hashlib, state (int) lưu được để resume"""
+    name = 'crc32'
+
+    def __init__(self, state=0):
+        self.state = state
+
+    def update(self, data):
+        self.state = zlib.crc32(data, self.state)
+
+    def hexdigest(self):
+        return f"{self.state:08x}"
+
+    def copy(self):
+        return Crc32Hasher(self.state)
+
+
+def new_hasher(algorithm, state=None):
+    """Tạo hasher; state chỉ dùng được với crc32 (các thuật toán khác không xuất được state)"""
+    if algorithm == 'crc32':
+        return Crc32Hasher(state or 0)
+    if algorithm == 'xxh3':
+        if xxhash is None:
+            raise ValueError("xxh3 requires the 'xxhash' package, use 'blake2b' or 'crc32' instead")
+        return xxhash.xxh3_64()
+    if algorithm == 'blake2b':
+        return hashlib.blake2b(digest_size=16)
+    raise ValueError(f"Unknown hash algorithm '{algorithm}', expected one of {HASH_ALGORITHMS}")
+
+
+def hasher_state(hasher):
+    """State lưu được vào checkpoint để resume mà không phải đọc lại phần đầu file"""
+    return hasher.state if isinstance(hasher, Crc32Hasher) else None
+
+
+def hash_file(path, algorithm, drop_cache=False, chunk_size=READ_CHUNK_SIZE):
+    """Hash cả file; drop_cache=True bỏ page cache trước để đọc thật từ disk
+
+    DONTNEED không bỏ page bẩn: file phải đã được flush (vd syncfs 1 lần cho cả folder) trước khi gọi.
+    """
+    hasher = new_hasher(algorithm)
+    with open(path, 'rb') as file:
+        fd = file.fileno()
+        if drop_cache and hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+# ======================================================================================================
+# MANIFEST THEO FOLDER (nằm trên SSD đích)
+# ======================================================================================================
+def write_folder_manifest(folder, algorithm, entries):
+    """Ghi manifest hash vào folder đích (atomic), entries: dict rel_path -> (size, hash)"""
+    manifest = {
+        'algorithm': algorithm,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'files': {rel_path: {'size': size, 'hash': digest}
+                  for rel_path, (size, digest) in sorted(entries.items())},
+    }
+    manifest_path = os.path.join(folder, FOLDER_MANIFEST_NAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=1)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def read_folder_manifest(folder):
+    """Đọc manifest hash của folder, None nếu chưa có"""
+    try:
+        with open(os.path.join(folder, FOLDER_MANIFEST_NAME)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def verify_tree(src, dst, algorithm=DEFAULT_HASH_ALGORITHM, workers=4):
+    """So sánh hash từng file của src và dst (đọc 2 bên song song), ghi manifest vào dst
+
+    Dùng cho các đường copy không tự tính hash (vd rsync). Trả về list rel_path không khớp/thiếu.
+    """
+    if os.path.isdir(dst):
+        syncfs(dst)  # 1 lần cho cả folder, để đọc lại bỏ được page cache của dữ liệu vừa ghi
+    pairs = []
+    for dir_path, dir_names, file_names in os.walk(src):
+        for file_name in file_names:
+            src_file = os.path.join(dir_path, file_name)
+            pairs.append(os.path.relpath(src_file, src))
+
+    def check(rel_path):
+        src_file = os.path.join(src, rel_path)
+        dst_file = os.path.join(dst, rel_path)
+        try:
+            size = os.path.getsize(src_file)
+            if os.path.getsize(dst_file) != size:
+                return rel_path, size, None, False
+            src_hash = hash_file(src_file, algorithm)
+            return rel_path, size, src_hash, src_hash == hash_file(dst_file, algorithm, drop_cache=True)
+        except OSError as e:
+            logging.error(f"Cannot verify '{rel_path}' in '{dst}': {e}")
+            return rel_path, 0, None, False
+
+    entries = {}
+    mismatches = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for rel_path, size, digest, ok in pool.map(check, pairs):
+            if ok:
+                entries[rel_path] = (size, digest)
+            else:
+                mismatches.append(rel_path)
+    if not mismatches and os.path.isdir(dst):
+        write_folder_manifest(dst, algorithm, entries)
+    return mismatches
+
+
+def verify_folder(folder, algorithm, entries, workers=4):
+    """Đọc lại (bỏ page cache) các file trong folder và so với hash đã tính lúc copy
+
+    entries: dict rel_path -> hash. Gọi sau syncfs của folder. Trả về list rel_path không khớp/không đọc được.
+    """
+    def check(item):
+        rel_path, digest = item
+        try:
+            return rel_path, hash_file(os.path.join(folder, rel_path), algorithm, drop_cache=True) == digest
+        except OSError as e:
+            logging.error(f"Cannot verify '{rel_path}' in '{folder}': {e}")
+            return rel_path, False
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return [rel_path for rel_path, ok in pool.map(check, sorted(entries.items())) if not ok]
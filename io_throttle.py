@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Giới hạn băng thông đọc/ghi và hạ độ ưu tiên I/O để sync không tranh disk với recorder"""
+import os
+import sys
+import time
+import ctypes
+import logging
+import platform
+import threading
+
+# ======================================================================================================
+# IO PRIORITY (ioprio_set, linux/ioprio.h)
+# ======================================================================================================
+SYS_IOPRIO_SET = {'x86_64': 251, 'i386': 289, 'i686': 289, 'aarch64': 30, 'armv7l': 314, 'armv8l': 314}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_CLASSES = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+
+MIB = 1024 * 1024
+RECORDER_SAMPLE_INTERVAL = 1.0  # giây giữa 2 lần đọc thống kê disk của recorder
+
+
+def set_io_priority(io_class='idle', level=0):
+    """Đặt I/O class cho thread hiện tại (ioprio là theo thread), trả về True nếu thành công"""
+    # Số syscall chỉ đúng trên Linux (vd macOS cũng có machine 'x86_64')
+    syscall_nr = SYS_IOPRIO_SET.get(platform.machine()) if sys.platform.startswith('linux') else None
+    if syscall_nr is None or io_class not in IOPRIO_CLASSES:
+        return False
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        value = (IOPRIO_CLASSES[io_class] << IOPRIO_CLASS_SHIFT) | level
+        if libc.syscall(syscall_nr, IOPRIO_WHO_PROCESS, 0, value) != 0:
+            err = ctypes.get_errno()
+            logging.debug("ioprio_set failed: %s", os.strerror(err))
+            return False
+        return True
+    except (OSError, AttributeError) as e:
+        logging.debug("ioprio_set not available: %s", e)
+        return False
+
+
+def drop_page_cache(fd, offset=0, length=0):
+    """posix_fadvise(DONTNEED) để dữ liệu sync không đẩy dữ liệu của recorder ra khỏi page cache"""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, offset, length, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+# ======================================================================================================
+# RECORDER ACTIVITY
+# ======================================================================================================
+class DiskWriteMonitor:
+    """Đo tốc độ ghi (byte/s) của block device chứa path, dựa trên /sys/dev/block/<maj>:<min>/stat"""
+
+    def __init__(self, path):
+        st_dev = os.stat(path).st_dev
+        self.stat_path = f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}/stat"
+        self._last = None  # (monotonic time, sectors written)
+        self.write_rate = 0.0
+
+    def _sectors_written(self):
+        with open(self.stat_path) as file:
+            return int(file.read().split()[6])  # field 7: sectors written (512 byte)
+
+    def sample(self):
+        """Cập nhật và trả về tốc độ ghi hiện tại"""
+        try:
+            sectors = self._sectors_written()
+        except (OSError, IndexError, ValueError):
+            return self.write_rate
+        now = time.monotonic()
+        if self._last is not None and now > self._last[0]:
+            self.write_rate = (sectors - self._last[1]) * 512 / (now - self._last[0])
+        self._last = (now, sectors)
+        return self.write_rate
+
+
+# ======================================================================================================
+# TOKEN BUCKET
+# ======================================================================================================
+class IOThrottle:
+    """Token bucket giới hạn MB/s dùng chung cho mọi worker copy
+
+    rate_mb = 0 là không giới hạn. Nếu có monitor (DiskWriteMonitor của SSD recorder) thì khi
+    recorder ghi nhanh hơn busy_write_mb, tốc độ sync lùi xuống busy_rate_mb.
+    """
+
+    def __init__(self, rate_mb=0, burst_seconds=1.0, monitor=None, busy_write_mb=50, busy_rate_mb=20):
+        self._lock = threading.Lock()
+        self.burst_seconds = burst_seconds
+        self.monitor = monitor
+        self.busy_write_mb = busy_write_mb
+        self.busy_rate_mb = busy_rate_mb
+        self.recorder_busy = False
+        self._tokens = 0.0
+        self._last_refill = time.monotonic()
+        self._last_sample = 0.0
+        self.set_rate(rate_mb)
+
+    def set_rate(self, rate_mb):
+        """Đổi giới hạn (MB/s) khi đang chạy, vd từ GUI"""
+        with self._lock:
+            self.rate_mb = max(0.0, float(rate_mb))
+
+    def effective_rate(self):
+        """Giới hạn hiện hành (byte/s), 0 = không giới hạn"""
+        rate = self.rate_mb * MIB
+        if self.recorder_busy:
+            busy_rate = self.busy_rate_mb * MIB
+            rate = min(rate, busy_rate) if rate else busy_rate
+        return rate
+
+    def _update_recorder_state(self, now):
+        if self.monitor is None or now - self._last_sample < RECORDER_SAMPLE_INTERVAL:
+            return
+        self._last_sample = now
+        busy = self.monitor.sample() > self.busy_write_mb * MIB
+        if busy != self.recorder_busy:
+            self.recorder_busy = busy
+            logging.info("Recorder write activity %s, sync rate limit now %.0f MB/s (0 = unlimited)",
+                         "high" if busy else "normal", self.effective_rate() / MIB)
+
+    def consume(self, nbytes):
+        """Chặn thread gọi cho tới khi được phép đọc/ghi nbytes"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._update_recorder_state(now)
+                rate = self.effective_rate()
+                if rate <= 0:
+                    self._last_refill = now
+                    return
+                capacity = max(rate * self.burst_seconds, nbytes)
+                self._tokens = min(capacity, self._tokens + (now - self._last_refill) * rate)
+                self._last_refill = now
+                if self._tokens >= nbytes:
+                    self._tokens -= nbytes
+                    return
+                wait = (nbytes - self._tokens) / rate
+            time.sleep(min(wait, RECORDER_SAMPLE_INTERVAL))
+
+
+# ======================================================================================================
+# DESTINATION DEVICE
+# ======================================================================================================
+# Số luồng copy song song nên dùng theo loại disk đích: NVMe cần nhiều request song song mới đạt tốc độ,
+# HDD/USB2 ghi nhiều luồng cùng lúc chỉ làm đầu đọc nhảy qua lại/nghẽn bus
+COPY_STREAMS_BY_DEVICE = {'nvme': 8, 'ssd': 4, 'usb3': 2, 'usb2': 1, 'rotational': 1, 'unknown': 2}
+USB3_SPEED_MBPS = 5000  # file speed trong sysfs của thiết bị USB (Mbit/s), USB2 là 480
+
+
+def _read_sysfs(path):
+    try:
+        with open(path) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def block_device_kind(path):
+    """Loại disk chứa path: nvme/ssd/usb3/usb2/rotational, 'unknown' nếu không phải block device (tmpfs, NFS...)"""
+    if not hasattr(os, 'major'):
+        return 'unknown'  # Windows: không có sysfs
+    st_dev = os.stat(path).st_dev
+    sys_path = os.path.realpath(f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}")
+    if not os.path.isdir(sys_path):
+        return 'unknown'
+    if os.path.exists(os.path.join(sys_path, 'partition')):
+        sys_path = os.path.dirname(sys_path)  # thông tin queue nằm ở disk cha
+    if '/usb' in sys_path:
+        # Đi ngược lên cây thiết bị tới node USB có tốc độ bus
+        parent = sys_path
+        while parent != '/sys' and _read_sysfs(os.path.join(parent, 'speed')) is None:
+            parent = os.path.dirname(parent)
+        speed = _read_sysfs(os.path.join(parent, 'speed'))
+        if speed is not None and float(speed) < USB3_SPEED_MBPS:
+            return 'usb2'
+    if _read_sysfs(os.path.join(sys_path, 'queue', 'rotational')) == '1':
+        return 'rotational'
+    if '/usb' in sys_path:
+        return 'usb3'
+    return 'nvme' if os.path.basename(sys_path).startswith('nvme') else 'ssd'
+
+
+def copy_streams_for(path):
+    """(số luồng copy song song cho disk chứa path, loại disk)"""
+    try:
+        kind = block_device_kind(path)
+    except OSError:
+        kind = 'unknown'
+    return COPY_STREAMS_BY_DEVICE[kind], kind
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Backend rsync chạy bằng subprocess.Popen, song song nhiều tiến trình và đọc tiến độ --info=progress2"""
+import os
+import re
+import time
+import logging
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# ======================================================================================================
+# CONFIG
+# ======================================================================================================
+# Copy disk-to-disk trên cùng máy: không nén, không delta (--whole-file), không giữ owner/group/perms
+RSYNC_LOCAL_FLAGS = ['-a', '--whole-file', '--no-compress', '--no-o', '--no-g', '--no-perms',
+                     '--info=progress2', '--no-inc-recursive']
+DEFAULT_RSYNC_WORKERS = 2
+PROGRESS_INTERVAL = 2.0  # giây giữa 2 lần báo tiến độ của cùng 1 worker
+ERROR_TAIL_LINES = 20
+
+# vd: "  1,234,567,890  45%  120.50MB/s    0:01:23 (xfr#5, to-chk=10/20)"
+PROGRESS_RE = re.compile(rb'^\s*([\d,.]+)\s+(\d+)%\s+([\d.]+)([kKMGT]?)B/s\s+(\d+):(\d\d):(\d\d)')
+RATE_UNITS = {b'': 1, b'k': 1024, b'K': 1024, b'M': 1024 ** 2, b'G': 1024 ** 3, b'T': 1024 ** 4}
+
+
+class RsyncError(Exception):
+    """rsync trả về exit code khác 0"""
+
+    def __init__(self, source, returncode, output_tail):
+        self.source = source
+        self.returncode = returncode
+        self.output_tail = output_tail
+        super().__init__(f"rsync failed for '{source}' with exit code {returncode}: "
+                         f"{output_tail[-1] if output_tail else 'no output'}")
+
+
+class RsyncProgress:
+    """1 dòng tiến độ của --info=progress2"""
+
+    def __init__(self, source, bytes_done, percent, rate, eta_seconds):
+        self.source = source
+        self.bytes_done = bytes_done
+        self.percent = percent
+        self.rate = rate  # byte/s
+        self.eta_seconds = eta_seconds
+
+    def __str__(self):
+        eta_min, eta_sec = divmod(self.eta_seconds, 60)
+        return (f"{os.path.basename(self.source.rstrip('/'))}: {self.percent}% "
+                f"{self.bytes_done / 1024 ** 3:.2f} GiB, {self.rate / 1024 ** 2:.1f} MiB/s, "
+                f"ETA {eta_min // 60}:{eta_min % 60:02d}:{eta_sec:02d}")
+
+
+def parse_progress2(source, line):
+    """Parse 1 dòng progress2, trả về RsyncProgress hoặc None nếu không phải dòng tiến độ"""
+    match = PROGRESS_RE.match(line)
+    if match is None:
+        return None
+    bytes_done = int(match.group(1).replace(b',', b'').replace(b'.', b''))
+    rate = float(match.group(3)) * RATE_UNITS[match.group(4)]
+    hours, minutes, seconds = (int(match.group(i)) for i in (5, 6, 7))
+    return RsyncProgress(source, bytes_done, int(match.group(2)), rate, hours * 3600 + minutes * 60 + seconds)
+
+
+class RsyncBackend:
+    """Chạy nhiều rsync song song, mỗi worker xử lý folder riêng, lỗi được raise thành RsyncError"""
+
+    def __init__(self, workers=DEFAULT_RSYNC_WORKERS, flags=None, rsync_path='rsync',
+                 progress_interval=PROGRESS_INTERVAL):
+        self.workers = max(1, int(workers))
+        self.flags = list(RSYNC_LOCAL_FLAGS if flags is None else flags)
+        self.rsync_path = rsync_path
+        self.progress_interval = progress_interval
+
+    def sync(self, source, destination, on_progress=None):
+        """rsync source vào destination, on_progress(RsyncProgress) được gọi định kỳ"""
+        cmd = [self.rsync_path, *self.flags, source, destination]
+        logging.info("Running: %s", subprocess.list2cmdline(cmd))
+        output_tail = deque(maxlen=ERROR_TAIL_LINES)
+        last_report = 0.0
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              stdin=subprocess.DEVNULL) as proc:
+            pending = b''
+            while True:
+                data = proc.stdout.read1(65536)
+                if not data:
+                    break
+                # progress2 ghi đè dòng bằng '\r', thông báo/lỗi kết thúc bằng '\n'
+                lines = re.split(rb'[\r\n]', pending + data)
+                pending = lines.pop()
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    progress = parse_progress2(source, line)
+                    if progress is None:
+                        output_tail.append(line.decode(errors='replace').strip())
+                    elif on_progress is not None and time.monotonic() - last_report >= self.progress_interval:
+                        last_report = time.monotonic()
+                        on_progress(progress)
+            if pending.strip() and parse_progress2(source, pending) is None:
+                output_tail.append(pending.decode(errors='replace').strip())
+            returncode = proc.wait()
+        if returncode != 0:
+            raise RsyncError(source, returncode, list(output_tail))
+
+    def sync_many(self, sources, destination, on_progress=None):
+        """rsync nhiều folder song song, trả về dict source -> None (thành công) hoặc exception"""
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {source: pool.submit(self.sync, source, destination, on_progress) for source in sources}
+            for source, future in futures.items():
+                try:
+                    future.result()
+                    results[source] = None
+                except (RsyncError, OSError) as e:
+                    results[source] = e
+        return results
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""Benchmark các đường copy/sync với dataset giả lập giống Autera (MB/s, syscall, CPU/GB)
+
+    python3 sync_benchmark.py                                     # nguồn và đích trên tmpfs (/dev/shm)
+    python3 sync_benchmark.py --target t7=/media/autera-admin/T7 --loopback-gb 8 --repeat 3
+    python3 sync_benchmark.py --json bench.json --baseline bench_prev.json   # exit 1 nếu chậm hơn baseline
+
+Dữ liệu được sinh lại trước mỗi lần chạy (không tính vào thời gian đo). Syscall lấy từ /proc/self/io
+(syscr/syscw: số syscall loại read/write của cả process), CPU gồm cả tiến trình con (rsync).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import resource
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+
+import sync_core
+from tag_scanner import CRITICAL_TAG
+
+# ======================================================================================================
+# CONFIG
+# ======================================================================================================
+MIB = 1024 ** 2
+BENCH_VEHICLE_ID = 'VF8BENCH'
+BENCH_DATE = '20250101'
+# Mỗi raw folder: (mẫu tên file, số file, kích thước ở scale 1.0), gần với 1 lần ghi của recorder
+RAW_FOLDER_PROFILE = [
+    ('camera_front_{:02d}.mp4', 2, 256 * MIB),
+    ('lidar_{:02d}.pcap', 4, 64 * MIB),
+    ('can_{:03d}.blf', 20, 2 * MIB),
+    ('meta/frame_{:04d}.json', 200, 16 * 1024),
+]
+TAG_LINES = 2000  # số dòng trong file tag .txt
+CRITICAL_EVERY = 2  # cứ 2 raw folder thì 1 folder có tag Critical
+# Folder video phẳng cho CopyDataSsd06: (mẫu tên file, số file, kích thước ở scale 1.0)
+VIDEO_FOLDER_PROFILE = [
+    ('VF8 cam_front {:02d} 01-12-2025.mp4', 8, 128 * MIB),
+    ('VF8 cam_rear {:02d} 02-12-2025.avi', 8, 32 * MIB),
+    ('VN dashcam {:03d} 03_12_2025.mkv', 40, 4 * MIB),
+    ('notes {:02d}.txt', 10, 4 * 1024),
+]
+RANDOM_BLOCK_SIZE = 4 * MIB
+BENCHMARKS = ('realtime_sync', 'critical_move', 'copydata06', 'copydata06_by_date')
+DEFAULT_TOLERANCE = 0.10  # chậm hơn baseline > 10% thì coi là regression
+
+
+class BenchmarkSkipped(Exception):
+    """Benchmark không chạy được trên máy này (thiếu rsync, PyQt5, quyền root...)"""
+
+
+# ======================================================================================================
+# DATASET
+# ======================================================================================================
+class DataWriter:
+    """Ghi file dữ liệu giả: nội dung ngẫu nhiên (không nén được), mỗi file khác nhau"""
+
+    def __init__(self):
+        self.block = os.urandom(RANDOM_BLOCK_SIZE)
+        self.counter = 0
+
+    def write(self, path, size):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.counter += 1
+        offset = (self.counter * 4099) % RANDOM_BLOCK_SIZE
+        view = memoryview(self.block)
+        with open(path, 'wb') as file:
+            header = f"{self.counter}:{path}\n".encode()[:size]
+            file.write(header)
+            remaining = size - len(header)
+            while remaining > 0:
+                piece = view[offset:offset + remaining]
+                file.write(piece)
+                remaining -= len(piece)
+                offset = 0
+
+
+def write_profile(writer, folder, profile, scale):
+    for pattern, count, size in profile:
+        for index in range(count):
+            writer.write(os.path.join(folder, pattern.format(index)), max(1, int(size * scale)))
+
+
+def generate_car_folder(root, folders, scale, writer):
+    """Car folder có `folders` raw folder dạng <name>@YYYYMMDD_HHMMSSffffff kèm file tag .txt"""
+    car_folder = os.path.join(root, f"{BENCH_VEHICLE_ID}_data")
+    started = datetime.strptime(BENCH_DATE, "%Y%m%d") + timedelta(hours=8)
+    for index in range(folders):
+        raw_time = started + timedelta(minutes=5 * index, microseconds=index * 1237)
+        raw_folder = os.path.join(car_folder, f"rec{index:03d}@{raw_time.strftime('%Y%m%d_%H%M%S%f')}")
+        write_profile(writer, raw_folder, RAW_FOLDER_PROFILE, scale)
+        lines = [f"[TAG],lane_change.Auto,{i},false" for i in range(TAG_LINES)]
+        if index % CRITICAL_EVERY == 0:
+            lines.insert(TAG_LINES // 2, CRITICAL_TAG)
+        with open(os.path.join(raw_folder, f"tags_{index:03d}.txt"), 'w') as file:
+            file.write("\n".join(lines) + "\n")
+    return car_folder
+
+
+def generate_video_folder(root, scale, writer):
+    video_folder = os.path.join(root, 'videos')
+    write_profile(writer, video_folder, VIDEO_FOLDER_PROFILE, scale)
+    return video_folder
+
+
+def tree_totals(top):
+    """(số file, tổng byte) của cây top"""
+    files = total = 0
+    for dir_path, _, file_names in os.walk(top):
+        for file_name in file_names:
+            files += 1
+            total += os.path.getsize(os.path.join(dir_path, file_name))
+    return files, total
+
+
+# ======================================================================================================
+# ĐO
+# ======================================================================================================
+def _usage_snapshot():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    io_counters = {}
+    try:
+        with open('/proc/self/io') as file:
+            for line in file:
+                key, _, value = line.partition(':')
+                io_counters[key] = int(value)
+    except OSError:
+        pass
+    return {
+        'time': time.perf_counter(),
+        'cpu': own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        'ctx_switches': own.ru_nvcsw + own.ru_nivcsw,
+        'syscr': io_counters.get('syscr', 0),
+        'syscw': io_counters.get('syscw', 0),
+    }
+
+
+def measure(run):
+    """Chạy run() và trả về chênh lệch thời gian, CPU, syscall, context switch"""
+    before = _usage_snapshot()
+    run()
+    after = _usage_snapshot()
+    return {
+        'seconds': after['time'] - before['time'],
+        'cpu_seconds': after['cpu'] - before['cpu'],
+        'read_syscalls': after['syscr'] - before['syscr'],
+        'write_syscalls': after['syscw'] - before['syscw'],
+        'ctx_switches': after['ctx_switches'] - before['ctx_switches'],
+    }
+
+
+def drop_page_cache():
+    """Xóa page cache để đo đọc từ disk thật (cần root), False nếu không làm được"""
+    os.sync()
+    try:
+        with open('/proc/sys/vm/drop_caches', 'w') as file:
+            file.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+class LoopbackDisk:
+    """File image ext4 mount qua loop device, dùng làm đích giống SSD thật hơn tmpfs (cần root)"""
+
+    def __init__(self, work_dir, size_gb):
+        self.image = os.path.join(work_dir, 'loopback.img')
+        self.mount_point = os.path.join(work_dir, 'loopback')
+        self.size_gb = size_gb
+
+    def __enter__(self):
+        if os.geteuid() != 0:
+            raise BenchmarkSkipped("loopback target needs root (mount -o loop)")
+        if shutil.which('mkfs.ext4') is None:
+            raise BenchmarkSkipped("mkfs.ext4 not installed")
+        with open(self.image, 'wb') as file:
+            file.truncate(int(self.size_gb * 1024 ** 3))
+        os.makedirs(self.mount_point, exist_ok=True)
+        try:
+            subprocess.run(['mkfs.ext4', '-q', '-F', self.image], check=True, capture_output=True)
+            subprocess.run(['mount', '-o', 'loop', self.image, self.mount_point], check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            os.unlink(self.image)
+            raise BenchmarkSkipped(f"cannot create loopback disk: {e.stderr.decode(errors='replace').strip()}")
+        return self.mount_point
+
+    def __exit__(self, *exc_info):
+        subprocess.run(['umount', self.mount_point], check=False, capture_output=True)
+        if os.path.exists(self.image):
+            os.unlink(self.image)
+
+
+# ======================================================================================================
+# BENCHMARKS
+# ======================================================================================================
+# Mỗi hàm prepare_* sinh dataset trong source_dir và trả về (folder dataset, run, cleanup): chỉ run() được đo
+def create_sync_service(work_dir):
+    """SyncService với cấu hình production, trừ các đường dẫn trạng thái (vào work_dir) và throttle"""
+    sync_core.SYNC_MANIFEST_DB = os.path.join(work_dir, 'sync_manifest.db')
+    sync_core.LOCK_FILE = os.path.join(work_dir, 'sync.lock')
+    sync_core.LEASE_DIR = os.path.join(work_dir, 'leases')
+    sync_core.METRICS_TEXTFILE = None
+    sync_core.TRACE_FILE = None
+    sync_core.ADAPTIVE_THROTTLE = False  # không có recorder đang ghi
+    sync_core.SYNC_RATE_LIMIT_MB = 0
+    sync_core.SSD_RESERVE_GB = 0
+    return sync_core.SyncService(BENCH_VEHICLE_ID, BENCH_DATE)
+
+
+def prepare_realtime_sync(source_dir, target_dir, options, writer):
+    car_folder = generate_car_folder(source_dir, options.folders, options.scale, writer)
+    service = create_sync_service(source_dir)
+    dst_root = os.path.join(target_dir, 'BlockBlob')
+    os.makedirs(dst_root, exist_ok=True)
+    return car_folder, (lambda: service.real_time_synchronize_folder(car_folder, [dst_root])), service.close
+
+
+def prepare_critical_move(source_dir, target_dir, options, writer):
+    if shutil.which('rsync') is None:
+        raise BenchmarkSkipped("rsync not installed")
+    car_folder = generate_car_folder(source_dir, options.folders, options.scale, writer)
+    service = create_sync_service(source_dir)
+    critical_folder = os.path.join(source_dir, 'criticalData')
+    dst_root = os.path.join(target_dir, 'BlockBlob')
+    os.makedirs(dst_root, exist_ok=True)
+    return car_folder, (lambda: service.move_parent_folder_of_txt_to_critical(car_folder, critical_folder, dst_root)), \
+        service.close
+
+
+_qt_app = None
+
+
+def create_copydata06_window(work_dir):
+    """FileCopyApp của CopyDataSsd06 chạy với Qt offscreen (không cần màn hình), index ngày video nằm trong work_dir"""
+    global _qt_app
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt5.QtWidgets import QApplication
+        import CopyDataSsd06
+        import video_dates
+    except ImportError as e:
+        raise BenchmarkSkipped(f"PyQt5 not available ({e})")
+    _qt_app = QApplication.instance() or QApplication(sys.argv[:1])
+    video_dates.VIDEO_DATE_DB = os.path.join(work_dir, 'video_dates.db')
+    return CopyDataSsd06.FileCopyApp()
+
+
+def run_copydata06_job(window, start):
+    """Bấm nút copy rồi chờ job nền chạy xong"""
+    def run():
+        start()
+        window.job_runner.wait()
+    return run
+
+
+def prepare_copydata06(source_dir, target_dir, options, writer):
+    window = create_copydata06_window(source_dir)
+    window.source_folder = generate_video_folder(source_dir, options.scale, writer)
+    window.dest_folder = target_dir
+    return window.source_folder, run_copydata06_job(window, window.start_copying), window.close
+
+
+def prepare_copydata06_by_date(source_dir, target_dir, options, writer):
+    window = create_copydata06_window(source_dir)
+    from PyQt5.QtCore import QDate
+    window.source_folder = generate_video_folder(source_dir, options.scale, writer)
+    window.dest_folder = target_dir
+    window.date_input.setDate(QDate(2000, 1, 1))
+    return window.source_folder, run_copydata06_job(window, window.copy_videos_by_date), window.close
+
+
+PREPARE = {
+    'realtime_sync': prepare_realtime_sync,
+    'critical_move': prepare_critical_move,
+    'copydata06': prepare_copydata06,
+    'copydata06_by_date': prepare_copydata06_by_date,
+}
+
+
+def run_benchmark(bench, target_name, target_path, options, writer):
+    """Chạy 1 benchmark options.repeat lần trên 1 đích, trả về list kết quả (dict)"""
+    results = []
+    for run_index in range(options.repeat):
+        source_dir = tempfile.mkdtemp(prefix='sync_bench_src_', dir=options.source_dir)
+        target_dir = tempfile.mkdtemp(prefix='sync_bench_dst_', dir=target_path)
+        result = {'bench': bench, 'target': target_name, 'run': run_index + 1}
+        try:
+            dataset, run, cleanup = PREPARE[bench](source_dir, target_dir, options, writer)
+            files, total = tree_totals(dataset)  # đo trước khi chạy: critical_move xóa nguồn
+            try:
+                if options.drop_caches and not drop_page_cache():
+                    logging.warning("Cannot drop page cache (needs root), measuring with warm cache")
+                    options.drop_caches = False
+                result.update(measure(run))
+            finally:
+                cleanup()
+            gigabytes = total / 1024 ** 3
+            result.update(status='ok', files=files, bytes=total,
+                          mb_per_second=total / MIB / result['seconds'] if result['seconds'] > 0 else 0.0,
+                          cpu_seconds_per_gb=result['cpu_seconds'] / gigabytes if gigabytes else 0.0,
+                          syscalls_per_gb=(result['read_syscalls'] + result['write_syscalls']) / gigabytes
+                          if gigabytes else 0.0)
+        except BenchmarkSkipped as e:
+            result.update(status=f'skipped: {e}')
+            results.append(result)
+            break
+        finally:
+            shutil.rmtree(source_dir, ignore_errors=True)
+            shutil.rmtree(target_dir, ignore_errors=True)
+        results.append(result)
+    return results
+
+
+# ======================================================================================================
+# BÁO CÁO
+# ======================================================================================================
+def summarize(results):
+    """Gộp các lần chạy: median của mỗi (bench, target)"""
+    groups = {}
+    for result in results:
+        groups.setdefault((result['bench'], result['target']), []).append(result)
+    summary = []
+    for (bench, target), runs in groups.items():
+        ok_runs = [run for run in runs if run['status'] == 'ok']
+        if not ok_runs:
+            summary.append({'bench': bench, 'target': target, 'status': runs[0]['status']})
+            continue
+        row = {'bench': bench, 'target': target, 'status': 'ok', 'runs': len(ok_runs),
+               'files': ok_runs[0]['files'], 'bytes': ok_runs[0]['bytes']}
+        for key in ('seconds', 'mb_per_second', 'cpu_seconds_per_gb', 'syscalls_per_gb',
+                    'read_syscalls', 'write_syscalls', 'ctx_switches'):
+            row[key] = statistics.median(run[key] for run in ok_runs)
+        summary.append(row)
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'benchmark':<20} {'target':<14} {'files':>6} {'MiB':>8} {'sec':>8} {'MiB/s':>8} "
+          f"{'CPU s/GB':>9} {'syscall/GB':>11} {'ctxsw':>8}")
+    for row in summary:
+        if row['status'] != 'ok':
+            print(f"{row['bench']:<20} {row['target']:<14} {row['status']}")
+            continue
+        print(f"{row['bench']:<20} {row['target']:<14} {row['files']:>6} {row['bytes'] / MIB:>8.0f} "
+              f"{row['seconds']:>8.2f} {row['mb_per_second']:>8.1f} {row['cpu_seconds_per_gb']:>9.2f} "
+              f"{row['syscalls_per_gb']:>11.0f} {row['ctx_switches']:>8.0f}")
+
+
+def compare_with_baseline(summary, baseline_path, tolerance):
+    """List mô tả các regression so với file JSON của lần chạy trước"""
+    with open(baseline_path) as file:
+        baseline = {(row['bench'], row['target']): row for row in json.load(file)['summary']}
+    regressions = []
+    for row in summary:
+        previous = baseline.get((row['bench'], row['target']))
+        if row['status'] != 'ok' or previous is None or previous.get('status') != 'ok':
+            continue
+        if row['mb_per_second'] < previous['mb_per_second'] * (1 - tolerance):
+            regressions.append(f"{row['bench']} on {row['target']}: {row['mb_per_second']:.1f} MiB/s "
+                               f"(baseline {previous['mb_per_second']:.1f})")
+        if row['cpu_seconds_per_gb'] > previous['cpu_seconds_per_gb'] * (1 + tolerance):
+            regressions.append(f"{row['bench']} on {row['target']}: {row['cpu_seconds_per_gb']:.2f} CPU s/GB "
+                               f"(baseline {previous['cpu_seconds_per_gb']:.2f})")
+    return regressions
+
+
+# ======================================================================================================
+# CLI
+# ======================================================================================================
+def default_tmp_dir():
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def parse_target(value):
+    name, sep, path = value.partition('=')
+    if not sep or not name or not path:
+        raise argparse.ArgumentTypeError(f"expected NAME=PATH, got '{value}'")
+    return name, path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark sync/copy paths on synthetic Autera data")
+    parser.add_argument('--bench', action='append', choices=BENCHMARKS,
+                        help="benchmark to run (repeatable, default: all)")
+    parser.add_argument('--target', action='append', type=parse_target, default=[],
+                        help="destination as NAME=PATH (repeatable, default: tmpfs)")
+    parser.add_argument('--loopback-gb', type=float, default=0,
+                        help="also benchmark an ext4 loopback disk of this size (needs root)")
+    parser.add_argument('--source-dir', default=default_tmp_dir(), help="where synthetic source data is generated")
+    parser.add_argument('--folders', type=int, default=4, help="raw folders per car folder")
+    parser.add_argument('--scale', type=float, default=0.25, help="file size multiplier (1.0 ~ 400 MiB/folder)")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--drop-caches', action='store_true', help="drop page cache before each run (root)")
+    parser.add_argument('--json', help="write results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file of a previous run to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    options = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+
+    benches = options.bench or list(BENCHMARKS)
+    targets = list(options.target) or [('tmpfs', default_tmp_dir())]
+    writer = DataWriter()
+    results = []
+    with tempfile.TemporaryDirectory(prefix='sync_bench_', dir=options.source_dir) as work_dir:
+        for target_name, target_path in targets:
+            for bench in benches:
+                results.extend(run_benchmark(bench, target_name, target_path, options, writer))
+        if options.loopback_gb:
+            try:
+                with LoopbackDisk(work_dir, options.loopback_gb) as mount_point:
+                    for bench in benches:
+                        results.extend(run_benchmark(bench, 'loopback-ext4', mount_point, options, writer))
+            except BenchmarkSkipped as e:
+                results.append({'bench': '*', 'target': 'loopback-ext4', 'run': 1, 'status': f'skipped: {e}'})
+
+    summary = summarize(results)
+    print_summary(summary)
+    if options.json:
+        with open(options.json, 'w') as file:
+            json.dump({'created': datetime.now().isoformat(timespec='seconds'), 'scale': options.scale,
+                       'folders': options.folders, 'summary': summary, 'runs': results}, file, indent=1)
+    if options.baseline:
+        regressions = compare_with_baseline(summary, options.baseline, options.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1015 @@
+#!/usr/bin/env python3
+"""Lõi sync dữ liệu Autera -> SSD ngoài, không phụ thuộc GUI
+
+Dùng chung cho GUI Tk (Real_time_data_sync_2exSSD.py) và chế độ daemon không màn hình (sync_daemon.py).
+"""
+import os
+import time
+import errno
+import atexit
+import shutil
+import logging
+import threading
+import itertools
+import logging.handlers
+from queue import SimpleQueue
+from pathlib import Path
+from collections import deque
+from datetime import datetime, timedelta
+from copy_engine import CopyEngine, ChecksumMismatch
+from sync_manifest import SyncManifest
+from folder_watcher import RawFolderWatcher, InotifyUnavailable
+from tag_scanner import TagScanner, CRITICAL_TAG, PRIORITY_CRITICAL, PRIORITY_NORMAL
+from sync_scheduler import SyncScheduler
+from rsync_backend import RsyncBackend
+from integrity import DEFAULT_HASH_ALGORITHM, FOLDER_MANIFEST_NAME, write_folder_manifest, verify_tree, verify_folder
+from io_throttle import IOThrottle, DiskWriteMonitor, set_io_priority
+from capacity_planner import CapacityPlanner, GIB
+from tree_scanner import TreeScanner
+from sync_metrics import SyncMetrics
+from atomic_commit import prepare_staging, commit_folder, is_committed, staging_path, COMPLETE_MARKER_NAME
+from sync_lock import FileLease, LeaseManager, DEFAULT_DESTINATION_SLOTS
+from folder_packer import FolderPacker, prefork_workers, DEFAULT_CODEC as DEFAULT_PACK_CODEC
+
+# ======================================================================================================
+# GLOBAL CONFIG
+# ======================================================================================================
+TODAY_STRING = datetime.today().strftime("%Y%m%d")
+VEHICLE_ID = os.getenv("VEHICLE_ID")
+SSD_MOUNT_PATH = '/mnt/dsu0/'
+SSD_FREE = 0
+LOCK_FILE = '/home/autera-admin/python/sync.lock'  # flock: 1 instance mỗi worker, worker có tên dùng sync.<tên>.lock
+LEASE_DIR = '/home/autera-admin/python/leases'  # lease theo raw folder / SSD đích, dùng chung giữa các worker
+LOCK_RETRY_INTERVAL = 5  # giây chờ trước khi thử lại khi instance khác đang chạy
+# Chạy nhiều worker cùng lúc (vd `sync_daemon.py run --worker-name critical --priorities Critical` và 1 worker bulk):
+# mỗi worker có instance lock riêng, các worker không sync trùng folder nhờ lease theo folder
+SYNC_WORKER_NAME = None
+SYNC_PRIORITIES = None  # None = mọi priority class, vd ('Critical',) cho worker chỉ offload folder Critical
+DESTINATION_WRITERS = DEFAULT_DESTINATION_SLOTS  # số worker được ghi cùng lúc vào 1 SSD đích
+SYNC_MANIFEST_DB = '/home/autera-admin/python/sync_manifest.db'
+DEFAULT_SSD_MOUNT_POINT = '/media/autera-admin/'
+Syn_TIME_CYCLE = 5
+COMPLETION_DELAY = timedelta(minutes=7)  # folder không đổi sau 7 phút thì coi là completed
+SYNC_WATCH_MODE = 'inotify'  # 'inotify' (chờ event) hoặc 'poll' (quét mỗi 60 giây)
+WATCH_RESCAN_INTERVAL = 600  # chế độ inotify vẫn quét lại toàn bộ mỗi 10 phút cho chắc
+WATCH_RETRY_INTERVAL = 60  # folder lỗi/bị hoãn/đang bận ở chu kỳ trước được thử lại sau 1 phút (chế độ inotify)
+# Pattern tag -> priority class (Critical / Review / Normal), folder không khớp pattern nào là Normal
+TAG_PATTERNS = {
+    CRITICAL_TAG: PRIORITY_CRITICAL,
+    # "[TAG],manual_annotation.Review,0,true": 'Review',  # tag_scanner.PRIORITY_REVIEW
+}
+COPY_WORKERS = 4  # số file copy song song
+COPY_CHUNK_SIZE_MB = 16  # kích thước chunk mỗi file
+HASH_ALGORITHM = DEFAULT_HASH_ALGORITHM  # 'xxh3' (cần package xxhash), 'blake2b' hoặc 'crc32'
+# Hash tính trong lúc copy là hash lưu vào manifest. True = đọc lại thêm 1 lượt file trên SSD ngoài
+# (gấp đôi I/O đích) để so với hash đó: 1 lượt cho cả folder sau syncfs, trước khi commit
+VERIFY_COPIES = False
+SYNC_RATE_LIMIT_MB = 0  # giới hạn tốc độ sync (MB/s), 0 = không giới hạn, đổi được trên GUI
+SYNC_IO_PRIORITY = 'idle'  # I/O class của thread sync: chỉ dùng disk khi recorder rảnh
+ADAPTIVE_THROTTLE = True  # tự giảm tốc khi recorder đang ghi nhiều vào SSD_MOUNT_PATH
+RECORDER_BUSY_WRITE_MB = 50  # recorder ghi > 50 MB/s thì coi là bận
+RECORDER_BUSY_RATE_MB = 20  # tốc độ sync khi recorder bận
+RSYNC_WORKERS = 2  # số tiến trình rsync chạy song song (move_parent_folder_of_txt_to_critical)
+# Nhiều SSD ngoài dưới DEFAULT_SSD_MOUNT_POINT: 'single' (chỉ SSD đầu tiên), 'mirror' (đọc nguồn 1 lần,
+# ghi đồng thời ra mọi SSD) hoặc 'stripe' (mỗi raw folder vào 1 SSD, SSD còn trống nhiều nhất)
+FANOUT_MODE = 'single'
+SSD_RESERVE_GB = 100  # dung lượng luôn chừa lại trên mỗi SSD ngoài, folder không vừa thì hoãn sync
+LOG_DIR = '/home/autera-admin/python/logs'
+RECENT_EVENTS = 500  # số thông báo gần nhất giữ lại cho status / client
+METRICS_TEXTFILE = '/home/autera-admin/python/sync_metrics.prom'  # metrics dạng Prometheus, None = không ghi
+TRACE_FILE = None  # vd '/home/autera-admin/python/logs/sync_trace.jsonl': mỗi folder sync là 1 span JSON
+# Đóng gói mỗi raw folder đã sync thành vài archive lớn (<SSD>/Packed/<raw folder>/part-NNNN.tar.zst + index.json)
+# để upload lên blob storage nhanh hơn. Chạy trên process pool song song với vòng copy, tốn thêm dung lượng SSD.
+PACK_ARCHIVES = False
+PACK_CODEC = DEFAULT_PACK_CODEC  # 'zstd' (cần package zstandard), 'lz4' (package lz4), 'gzip' hoặc 'none'
+PACK_CHUNK_MB = 512  # dữ liệu chưa nén mỗi archive
+PACK_WORKERS = 0  # số process nén, 0 = số core
+PACK_FOLDER_NAME = 'Packed'
+# File do sync ghi vào folder đích (marker hoàn tất, manifest hash), không phải dữ liệu: không clone/đóng gói
+SIDECAR_FILES = frozenset((COMPLETE_MARKER_NAME, FOLDER_MANIFEST_NAME))
+
+
+def start_pack_workers():
+    """Fork process nén (nếu bật PACK_ARCHIVES), gọi trước setup_logging và trước khi tạo SyncService"""
+    if PACK_ARCHIVES:
+        prefork_workers(PACK_WORKERS)
+
+
+def setup_logging(log_dir=LOG_DIR):
+    """Cấu hình logging ra file (1 file mỗi lần chạy) và stderr
+
+    Thread gọi logging chỉ đẩy record vào queue, việc format/ghi file do 1 thread riêng (QueueListener)
+    làm, nên ghi log không bao giờ chặn vòng copy. Trả về listener (đã start, tự stop khi thoát).
+    """
+    log_file_name = datetime.now().strftime('sync_data_ssd_%s_%H_%M_%d_%m_%Y.log')
+    formatter = logging.Formatter('%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s',
+                                  datefmt='%y-%m-%d %H:%M:%S')
+    handlers = [
+        logging.FileHandler(os.path.join(log_dir, log_file_name), mode='w+'),
+        logging.StreamHandler()
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))  # format đầy đủ do handler của listener làm
+    logging.basicConfig(level=logging.DEBUG, handlers=[queue_handler])
+    listener.start()
+    atexit.register(listener.stop)  # flush các record còn trong queue trước khi thoát
+    return listener
+
+# ======================================================================================================
+# HELPER FUNCTIONS
+# ======================================================================================================
+def get_completion_time(raw_name: str):
+    """Thời điểm folder được coi là completed (thời gian trong tên + 7 phút), None nếu tên không hợp lệ"""
+    # Xử lý trường hợp raw_name không chứa '@'
+    if '@' not in raw_name:
+        logging.warning(f"Raw folder name '{raw_name}' does not contain '@'. Skipping completion check.")
+        return None
+
+    str_raw_time = raw_name.split('@')[1]
+    try:
+        return datetime.strptime(str_raw_time, '%Y%m%d_%H%M%S%f') + COMPLETION_DELAY
+    except ValueError:
+        logging.error(f"Could not parse datetime from '{str_raw_time}' in '{raw_name}'. Skipping completion check.")
+        return None
+
+
+def is_completed(raw_name: str) -> bool:
+    """Kiểm tra folder đã >7 phút thì coi là completed"""
+    completion_time = get_completion_time(raw_name)
+    return completion_time is not None and datetime.now() > completion_time
+
+
+def instance_lock_path(worker_name=None):
+    """File lock của 1 worker: LOCK_FILE cho worker mặc định, sync.<tên>.lock cho worker có tên"""
+    if not worker_name:
+        return LOCK_FILE
+    root, ext = os.path.splitext(LOCK_FILE)
+    return f"{root}.{worker_name}{ext}"
+
+
+def create_metrics():
+    """SyncMetrics kèm mô tả các metric chính"""
+    metrics = SyncMetrics(TRACE_FILE)
+    metrics.describe('stage_seconds_total', "Time spent per sync stage (scan, schedule, copy, verify, manifest, link)")
+    metrics.describe('stage_runs_total', "Number of times each stage ran (copy: per file, verify: per folder)")
+    metrics.describe('bytes_written_total', "Bytes written to external SSDs")
+    metrics.describe('folders_synced_total', "Raw folders synced successfully")
+    metrics.describe('folders_failed_total', "Raw folders whose sync failed")
+    metrics.describe('folders_deferred_total', "Raw folders deferred because the SSD was too full")
+    metrics.describe('queue_depth', "Raw folders waiting in the sync queue")
+    metrics.describe('last_folder_wait_seconds', "Time between folder completion and the start of its sync")
+    metrics.describe('last_folder_bytes_per_second', "Throughput of the last synced folder")
+    metrics.describe('pack_input_bytes_total', "Bytes packed into archives")
+    metrics.describe('pack_output_bytes_total', "Compressed archive bytes written")
+    return metrics
+
+# ======================================================================================================
+# SYNC SERVICE
+# ======================================================================================================
+class SyncService:
+    """Toàn bộ trạng thái và vòng sync, điều khiển bằng start/pause/resume/stop
+
+    Thông báo cho người dùng đi qua add_log: được giữ lại RECENT_EVENTS dòng gần nhất (cho status/client)
+    và chuyển cho các listener đã đăng ký (GUI, logging của daemon...).
+    """
+
+    def __init__(self, vehicle_id=VEHICLE_ID, today_string=TODAY_STRING, worker_name=SYNC_WORKER_NAME,
+                 priorities=SYNC_PRIORITIES):
+        self.vehicle_id = vehicle_id
+        self.today_string = today_string
+        self.worker_name = worker_name
+        self.priorities = tuple(priorities) if priorities else None
+        owner = {'worker': worker_name or 'main'}
+        self.instance_lease = FileLease(instance_lock_path(worker_name), owner)
+        self.lease_manager = LeaseManager(LEASE_DIR, owner, DESTINATION_WRITERS)
+        self.sync_manifest = SyncManifest(SYNC_MANIFEST_DB)  # danh sách folder/file đã sync, lưu trên disk
+        self.metrics = create_metrics()
+        self.tree_scanner = TreeScanner()  # snapshot car folder/raw folder dùng chung cho mọi bước sync
+        self.io_throttle = IOThrottle(SYNC_RATE_LIMIT_MB, monitor=self.create_recorder_monitor(),
+                                      busy_write_mb=RECORDER_BUSY_WRITE_MB, busy_rate_mb=RECORDER_BUSY_RATE_MB)
+        self.copy_engine = CopyEngine(workers=COPY_WORKERS, chunk_size=COPY_CHUNK_SIZE_MB * 1024 * 1024,
+                                      checksum=HASH_ALGORITHM, resume=True,
+                                      throttle=self.io_throttle, io_priority=SYNC_IO_PRIORITY, drop_cache=True,
+                                      scanner=self.tree_scanner, metrics=self.metrics)
+        self.tag_scanner = TagScanner(TAG_PATTERNS, scanner=self.tree_scanner)
+        self.rsync_backend = RsyncBackend(workers=RSYNC_WORKERS)
+        self.capacity_planner = CapacityPlanner(SSD_RESERVE_GB, scanner=self.tree_scanner)
+        self.folder_packer = FolderPacker(PACK_WORKERS, PACK_CODEC, PACK_CHUNK_MB * 1024 * 1024,
+                                          metrics=self.metrics, on_message=self.add_log) if PACK_ARCHIVES else None
+        self.current_dst_roots = []  # các SSD đích của chu kỳ sync gần nhất
+        self.current_folder = None
+        self.queue_counts = {}
+
+        self.sync_thread = None
+        self.stop_event = threading.Event()
+        self.pause_event = threading.Event()  # set = đang chạy, clear = tạm dừng
+        # deque.append/next(count) là atomic trong CPython: thread sync không phải chờ lock nào để log
+        self._events = deque(maxlen=RECENT_EVENTS)  # (seq, "[HH:MM:SS] msg")
+        self._event_seq = itertools.count(1)
+        self._listeners = []
+
+    # --------------------------------------------------------------------------------------------------
+    # Thông báo
+    # --------------------------------------------------------------------------------------------------
+    def add_listener(self, listener):
+        """listener(line) được gọi (từ thread sync) với mỗi thông báo mới, phải trả về ngay (vd queue.put)"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def add_log(self, msg):
+        now = datetime.now().strftime("%H:%M:%S")
+        line = f"[{now}] {msg}"
+        self._events.append((next(self._event_seq), line))
+        for listener in list(self._listeners):
+            try:
+                listener(line)
+            except Exception:
+                logging.debug("Log listener failed", exc_info=True)
+
+    def events_since(self, seq=0):
+        """(seq mới nhất, list dòng log có seq > seq)"""
+        events = list(self._events)  # copy trong C, không bị thread sync chen vào giữa
+        latest = max((event_seq for event_seq, _ in events), default=seq)
+        return latest, [line for event_seq, line in events if event_seq > seq]
+
+    # --------------------------------------------------------------------------------------------------
+    # Cấu hình khi đang chạy
+    # --------------------------------------------------------------------------------------------------
+    def set_date(self, value):
+        """Đổi ngày sync (YYYYMMDD), trả về False nếu sai định dạng"""
+        if len(value) == 8 and value.isdigit():
+            self.today_string = value
+            self.add_log(f"Date set to: {value}")
+            logging.info(f"Date input: {value}")
+            return True
+        self.add_log(f"Invalid date format: {value}. Please use YYYYMMDD.")
+        return False
+
+    def set_vehicle_id(self, value):
+        if value:
+            self.vehicle_id = value
+            self.add_log(f"VEHICLE_ID set to: {value}")
+            logging.info("VEHICLE_ID:%s", value)
+            return True
+        self.add_log(f"VEHICLE_ID cannot be empty.")
+        return False
+
+    def set_rate_limit(self, rate_mb):
+        self.io_throttle.set_rate(rate_mb)
+        self.add_log(f"Sync speed limit set to: {f'{rate_mb:g} MB/s' if rate_mb else 'unlimited'}")
+        logging.info("Sync rate limit: %s MB/s", rate_mb)
+
+    def set_adaptive_throttle(self, enabled):
+        """Bật/tắt giảm tốc khi recorder ghi nhiều, trả về trạng thái thực tế"""
+        if enabled:
+            self.io_throttle.monitor = self.create_recorder_monitor()
+            if self.io_throttle.monitor is None:
+                self.add_log("Recorder activity monitor unavailable, adaptive throttle disabled.")
+                return False
+            self.add_log("Adaptive throttle ON: slowing down while the recorder is writing.")
+            return True
+        self.io_throttle.monitor = None
+        self.io_throttle.recorder_busy = False
+        self.add_log("Adaptive throttle OFF.")
+        return False
+
+    def create_recorder_monitor(self):
+        """Monitor tốc độ ghi của recorder vào SSD Autera, None nếu không đọc được"""
+        if not ADAPTIVE_THROTTLE:
+            return None
+        try:
+            return DiskWriteMonitor(SSD_MOUNT_PATH)
+        except OSError as e:
+            logging.warning(f"Recorder activity monitor unavailable: {e}")
+            return None
+
+    # --------------------------------------------------------------------------------------------------
+    # Điều khiển thread sync
+    # --------------------------------------------------------------------------------------------------
+    def is_running(self):
+        return self.sync_thread is not None and self.sync_thread.is_alive()
+
+    def is_paused(self):
+        return self.is_running() and not self.pause_event.is_set()
+
+    def start(self):
+        """Chạy thread sync (hoặc resume nếu đang tạm dừng), trả về False nếu đã chạy sẵn"""
+        if self.is_paused():
+            return self.resume()
+        if self.is_running():
+            self.add_log("Sync process is already running.")
+            return False
+        self.stop_event.clear() # Đảm bảo không có lệnh dừng trước đó
+        self.pause_event.set()  # Đảm bảo bắt đầu trong trạng thái chạy
+        self.sync_thread = threading.Thread(target=self.main_sync_process, daemon=True)
+        self.sync_thread.start()
+        self.add_log("Sync process STARTED.")
+        return True
+
+    def pause(self):
+        if self.is_running():
+            self.pause_event.clear() # Đặt sự kiện tạm dừng
+            self.add_log("Sync process PAUSED.")
+            return True
+        self.add_log("No active sync process to pause.")
+        return False
+
+    def resume(self):
+        if self.is_running():
+            self.pause_event.set() # Tiếp tục sự kiện
+            self.add_log("Sync process RESUMED.")
+            return True
+        self.add_log("No active sync process to resume.")
+        return False
+
+    def stop(self, timeout=10):
+        if not self.is_running():
+            self.add_log("No active sync process to end.")
+            return False
+        self.stop_event.set() # Đặt sự kiện dừng
+        self.pause_event.set() # Đảm bảo thoát khỏi trạng thái tạm dừng nếu có
+        self.sync_thread.join(timeout=timeout) # Chờ luồng kết thúc (có timeout)
+        if self.sync_thread.is_alive():
+            self.add_log("WARNING: Sync thread did not terminate gracefully.")
+        self.sync_thread = None
+        self.add_log("Sync process ENDED.")
+        self.release_instance_lock() # Đảm bảo nhả lock khi kết thúc
+        return True
+
+    def close(self):
+        """Dừng thread sync và đóng manifest, gọi 1 lần khi thoát chương trình"""
+        self.stop_event.set()
+        self.pause_event.set() # Đảm bảo luồng thoát khỏi wait nếu bị tạm dừng
+        if self.sync_thread and self.sync_thread.is_alive():
+            self.sync_thread.join(timeout=5)
+            if self.sync_thread.is_alive():
+                logging.warning("Sync thread did not terminate before exit.")
+        self.release_instance_lock() # Đảm bảo lock được nhả khi chương trình kết thúc
+        if self.folder_packer is not None:
+            self.folder_packer.close()
+        self.sync_manifest.close()
+
+    # --------------------------------------------------------------------------------------------------
+    # Trạng thái
+    # --------------------------------------------------------------------------------------------------
+    def capacity_lines(self):
+        """Dung lượng, backlog và thời gian dự kiến tới khi đầy của từng SSD đích"""
+        dst_roots = list(self.current_dst_roots)
+        if not dst_roots:
+            if not os.path.exists(DEFAULT_SSD_MOUNT_POINT) or not os.listdir(DEFAULT_SSD_MOUNT_POINT):
+                return []
+            dst_roots = [path if os.path.isdir(path) else os.path.dirname(path)
+                         for path in self.get_external_ssd_roots()]
+        return [f"{os.path.relpath(dst_root, DEFAULT_SSD_MOUNT_POINT).split(os.sep)[0]}: "
+                f"{self.capacity_planner.describe(dst_root)}" for dst_root in dst_roots]
+
+    def status(self):
+        """Trạng thái hiện tại dạng dict (trả về qua control API)"""
+        return {
+            'state': 'paused' if self.is_paused() else 'running' if self.is_running() else 'stopped',
+            'worker': self.worker_name or 'main',
+            'priorities': list(self.priorities) if self.priorities else None,
+            'vehicle_id': self.vehicle_id,
+            'date': self.today_string,
+            'rate_limit_mb': self.io_throttle.rate_mb,
+            'adaptive_throttle': self.io_throttle.monitor is not None,
+            'recorder_busy': self.io_throttle.recorder_busy,
+            'current_folder': self.current_folder,
+            'queue': dict(self.queue_counts),
+            'destinations': list(self.current_dst_roots),
+            'capacity': self.capacity_lines(),
+            'packing': self.folder_packer.pending() if self.folder_packer is not None else 0,
+            'last_event': self.events_since(0)[0],
+        }
+
+    def get_list_completed_raw(self, car_folder: str, raw_names=None):
+        """Lấy danh sách folder đã hoàn thành (trong raw_names nếu có, không thì quét cả car folder)"""
+        if not os.path.exists(car_folder):
+            logging.warning(f"Car folder '{car_folder}' does not exist.")
+            return []
+
+        # Danh sách folder lấy từ snapshot dùng chung, chỉ quét lại khi car folder có thay đổi
+        car_folder_names = self.tree_scanner.names(car_folder)
+        if raw_names is None:
+            list_raw_names = car_folder_names
+        else:
+            existing_names = set(car_folder_names)
+            list_raw_names = [raw_name for raw_name in raw_names if raw_name in existing_names]
+        list_completed_raw = []
+
+        for raw_name in list_raw_names:
+            if '@' in raw_name and is_completed(raw_name) and self.today_string in raw_name:
+                list_completed_raw.append(raw_name)
+        return list_completed_raw
+
+    def acquire_instance_lock(self):
+        """Lấy lock của worker (flock, tự nhả khi process chết), False nếu process khác đang giữ"""
+        try:
+            if self.instance_lease.acquire():
+                self.add_log("Lock acquired.")
+                return True
+        except OSError as e:
+            logging.error(f"Error acquiring lock file: {e}", exc_info=True)
+            self.add_log(f"ERROR: Cannot open lock file '{self.instance_lease.path}'. {e}")
+            return False
+        self.add_log(f"Another sync process is already running: {self.instance_lease.describe_holder()}. Waiting...")
+        return False
+
+    def release_instance_lock(self):
+        if self.instance_lease.held:
+            self.instance_lease.release()
+            self.add_log("Lock released.")
+
+    def get_car_data_folder(self):
+        """Tìm folder data theo vehicle_id"""
+        try:
+            if not os.path.exists(SSD_MOUNT_PATH):
+                logging.error(f"SSD_MOUNT_PATH '{SSD_MOUNT_PATH}' does not exist.")
+                return None
+
+            for folder_name in os.listdir(SSD_MOUNT_PATH):
+                if self.vehicle_id in folder_name:
+                    return folder_name
+        except FileNotFoundError:
+            logging.error(f"SSD_MOUNT_PATH '{SSD_MOUNT_PATH}' not found.", exc_info=True)
+            return None
+        except Exception as e:
+            logging.error(f"Error getting car data folder: {e}", exc_info=True)
+            return None
+        return None
+
+    def check_external_SSD_space(self, path, min_free_space=10):
+        """Check dung lượng SSD ngoài, nếu < min_free_space GB thì return True"""
+        try:
+            total, used, free = shutil.disk_usage(path)
+            free_GB = free / (1024 ** 3)
+            total_GB = total / (1024 ** 3)
+            logging.info("Checking Disk at %s : Free %.1f GiB / Total %.1f GiB",
+                         path, free_GB, total_GB)
+            self.add_log(f"SSD free space: {free_GB:.1f} GiB (required > {min_free_space} GiB)")
+            return free_GB < min_free_space
+        except FileNotFoundError:
+            logging.info("SSD checking fault: Path not found %s", path, exc_info=True)
+            self.add_log(f"ERROR: SSD path '{path}' not found.")
+            return True # Coi như không đủ không gian nếu không tìm thấy
+        except Exception as e:
+            logging.error(f"Error checking SSD space: {e}", exc_info=True)
+            self.add_log(f"ERROR: Failed to check SSD space. {e}")
+            return True # Coi như không đủ không gian nếu có lỗi
+
+    # ======================================================================================================
+    # SYNC FUNCTIONS
+    # ======================================================================================================
+    def get_external_ssd_roots(self):
+        """List folder BlockBlob trên các SSD ngoài dùng cho chu kỳ này, theo FANOUT_MODE"""
+        ssd_names = sorted(os.listdir(DEFAULT_SSD_MOUNT_POINT))
+        ssd_paths = [os.path.join(DEFAULT_SSD_MOUNT_POINT, name) for name in ssd_names]
+        if FANOUT_MODE == 'single':
+            ssd_paths = ssd_paths[:1]
+        else:
+            # Chỉ lấy các SSD đang mount, nếu không có mount point nào (vd test trên folder thường) thì lấy hết
+            ssd_paths = [path for path in ssd_paths if os.path.ismount(path)] or ssd_paths
+        return [os.path.join(path, 'BlockBlob') for path in ssd_paths]
+
+    def choose_destination_roots(self, raw_folder_name, dst_roots):
+        """Các SSD sẽ nhận raw folder: tất cả (mirror) hoặc 1 SSD (single/stripe)"""
+        if FANOUT_MODE != 'stripe' or len(dst_roots) <= 1:
+            return dst_roots
+        # Folder đã có (đã sync hoặc copy dở) trên SSD nào thì tiếp tục trên SSD đó
+        for dst_root in dst_roots:
+            destination_path = os.path.join(dst_root, raw_folder_name)
+            if os.path.exists(destination_path) or os.path.exists(staging_path(destination_path)):
+                return [dst_root]
+        return [max(dst_roots, key=lambda dst_root: shutil.disk_usage(dst_root).free)]
+
+    def sync_raw_folder(self, raw_folder_name, raw_folder_path, destination_paths, priority=PRIORITY_NORMAL):
+        """Copy 1 raw folder ra 1 hoặc nhiều SSD, chỉ copy file mới/thay đổi theo manifest,
+        file copy dở được copy tiếp. Mỗi file nguồn chỉ đọc 1 lần dù có nhiều đích.
+
+        Dữ liệu được ghi vào <đích>.partial, chỉ khi đã syncfs mới rename thành folder đích (kèm marker
+        hoàn tất), nên folder đích không bao giờ là bản copy dở. Folder Critical/Review được link sang
+        {priority}@{ngày sync} trước khi commit: link lỗi thì folder không được commit và được sync lại."""
+        staging_paths = [prepare_staging(destination_path) for destination_path in destination_paths]
+        copied_files = self.copy_engine.copy_tree_multi(
+            raw_folder_path, staging_paths,
+            journals=[self.sync_manifest.journal(raw_folder_name, destination_path, staging)
+                      for destination_path, staging in zip(destination_paths, staging_paths)])
+        marker_info = self.source_summary(raw_folder_name, raw_folder_path)
+        if priority != PRIORITY_NORMAL:
+            # Folder Critical/Review có thêm 1 bản trong {priority}@{ngày sync}: dựng bằng reflink/hardlink
+            # từ bản vừa copy thay vì ghi dữ liệu lên SSD ngoài lần 2
+            logging.info("%s is a %s folder, handling...", raw_folder_path, priority)
+            self.add_log(f"{priority.upper()}: '{raw_folder_name}' is {priority.lower()}. Moving...")
+            for destination_path, staging in zip(destination_paths, staging_paths):
+                with self.metrics.stage('link'):
+                    self.link_priority_copy(raw_folder_name, priority, marker_info, destination_path, staging)
+        for destination_path, staging in zip(destination_paths, staging_paths):
+            # Hash đã được tính trong lúc copy, chỉ cần ghi ra manifest của folder trên SSD ngoài
+            with self.metrics.stage('manifest'):
+                known_files = self.sync_manifest.known_files(raw_folder_name, destination_path)
+                write_folder_manifest(staging, HASH_ALGORITHM,
+                                      {rel_path: (size, checksum) for rel_path, (size, _, checksum) in known_files.items()})
+            with self.metrics.stage('commit'):
+                commit_folder(staging, destination_path, marker_info,
+                              check=(lambda staging, known_files=known_files: self.verify_staging(staging, known_files))
+                              if VERIFY_COPIES else None)
+            self.sync_manifest.mark_synced(raw_folder_name, destination_path)
+        return copied_files
+
+    def verify_staging(self, staging, known_files):
+        """Đọc lại cả folder staging (đã syncfs) và so với hash tính lúc copy, raise nếu có file không khớp
+
+        File không khớp bị xóa khỏi staging nên lần sync sau copy lại đúng các file đó.
+        """
+        with self.metrics.stage('verify'):
+            mismatches = verify_folder(staging, HASH_ALGORITHM,
+                                       {rel_path: checksum for rel_path, (_, _, checksum) in known_files.items()
+                                        if checksum is not None}, workers=COPY_WORKERS)
+        if not mismatches:
+            return
+        logging.error("Verify failed for %s: %s", staging, mismatches[:10])
+        for rel_path in mismatches:
+            try:
+                os.remove(os.path.join(staging, rel_path))
+            except OSError:
+                pass
+        raise ChecksumMismatch(errno.EIO, f"{len(mismatches)} file(s) do not match their copy hash", staging)
+
+    def source_summary(self, raw_folder_name, raw_folder_path):
+        """Số file/tổng byte của folder nguồn, ghi vào marker hoàn tất để lần sau so khớp không cần hash"""
+        source_files = self.tree_scanner.files(raw_folder_path)
+        return {
+            'raw_name': raw_folder_name,
+            'files': len(source_files),
+            'bytes': sum(st.st_size for st in source_files.values()),
+            'hash_algorithm': HASH_ALGORITHM,
+        }
+
+    def already_committed(self, raw_folder_name, raw_folder_path, destination_paths):
+        """Mọi đích đã có marker hoàn tất khớp với nguồn (vd manifest bị mất/đổi máy): ghi lại vào manifest"""
+        if not all(os.path.isdir(path) for path in destination_paths):
+            return False
+        summary = self.source_summary(raw_folder_name, raw_folder_path)
+        if not all(is_committed(path, summary['files'], summary['bytes']) for path in destination_paths):
+            return False
+        for destination_path in destination_paths:
+            self.sync_manifest.mark_synced(raw_folder_name, destination_path)
+        return True
+
+    def schedule_raw_folders(self, scheduler, source_folder, dst_roots, list_completed_raw):
+        """Phân loại các raw folder chưa sync theo file tag và đưa vào hàng đợi ưu tiên"""
+        for raw_folder_name in list_completed_raw:
+            raw_folder_path = os.path.join(source_folder, raw_folder_name)
+            if raw_folder_name in scheduler:
+                continue
+            destination_paths = [os.path.join(dst_root, os.path.basename(raw_folder_path))
+                                 for dst_root in self.choose_destination_roots(raw_folder_name, dst_roots)]
+            if all(self.sync_manifest.is_synced(raw_folder_name, path) for path in destination_paths):
+                self.add_log(f"Skipping already synced: {raw_folder_name}")
+                continue
+
+            # Kiểm tra xem thư mục nguồn có tồn tại không trước khi cố gắng sao chép
+            if not os.path.exists(raw_folder_path):
+                logging.warning(f"Source folder '{raw_folder_path}' does not exist. Skipping.")
+                continue
+            if self.already_committed(raw_folder_name, raw_folder_path, destination_paths):
+                self.add_log(f"Skipping already synced (complete on SSD): {raw_folder_name}")
+                continue
+
+            priority, tag_file_names = self.tag_scanner.classify_folder(raw_folder_path)
+            if self.priorities is not None and priority not in self.priorities:
+                logging.debug("Leaving %s folder '%s' to other workers", priority, raw_folder_name)
+                continue
+            for tag_file_name in tag_file_names:
+                self.add_log(f"Tag txt file name: {os.path.join(raw_folder_path, tag_file_name)} detechted")
+            raw_time = get_completion_time(raw_folder_name)
+            needed_bytes = self.remaining_bytes(raw_folder_name, raw_folder_path, destination_paths) + \
+                self.pack_bytes(raw_folder_name, raw_folder_path, destination_paths)
+            scheduler.push(raw_folder_name, priority, raw_time.timestamp() if raw_time else 0,
+                           (raw_folder_path, destination_paths, needed_bytes))
+
+    def remaining_bytes(self, raw_folder_name, raw_folder_path, destination_paths):
+        """Số byte còn phải ghi lên mỗi SSD: kích thước folder trừ phần đã copy theo manifest"""
+        total = self.capacity_planner.folder_size(raw_folder_path)
+        copied = min(sum(size for size, _, _ in self.sync_manifest.known_files(raw_folder_name, path).values())
+                     for path in destination_paths)
+        return max(0, total - copied)
+
+    def pack_bytes(self, raw_folder_name, raw_folder_path, destination_paths):
+        """Size ước lượng của archive sẽ ghi thêm lên mỗi SSD (Packed nằm trên cùng SSD với bản sync)"""
+        if self.folder_packer is None:
+            return 0
+        pack_dirs = self.pack_dirs(raw_folder_name, destination_paths)
+        if all(self.folder_packer.is_packed(pack_dir) for pack_dir in pack_dirs):
+            return 0
+        return self.folder_packer.estimate_size(self.capacity_planner.folder_size(raw_folder_path))
+
+    def plan_capacity(self, scheduler, dst_roots):
+        """Kiểm tra backlog theo thứ tự ưu tiên, báo các folder sẽ bị hoãn vì không đủ chỗ trên SSD"""
+        items = [(raw_folder_name, needed_bytes, [os.path.dirname(path) for path in destination_paths])
+                 for raw_folder_name, _, (_, destination_paths, needed_bytes) in scheduler.ordered()]
+        admitted, deferred = self.capacity_planner.plan(items, dst_roots)
+        backlog_GB = sum(needed_bytes for _, needed_bytes, _ in items) / GIB
+        self.add_log(f"Sync backlog: {backlog_GB:.1f} GiB in {len(items)} folder(s), {len(deferred)} deferred (not enough space)")
+        for raw_folder_name in deferred:
+            logging.warning("Deferring '%s': not enough space on destination SSD", raw_folder_name)
+
+    def sync_scheduled_folder(self, raw_folder_name, priority, raw_folder_path, destination_paths):
+        """Sync 1 folder đã lấy ra từ hàng đợi, trả về False nếu copy lỗi"""
+        self.add_log(f"Syncing: {raw_folder_name} to {', '.join(destination_paths)}")
+        try:
+            # copy folder kể cả khi đích đã tồn tại, chỉ copy file mới/thay đổi
+            copied_files = self.sync_raw_folder(raw_folder_name, raw_folder_path, destination_paths, priority)
+            logging.info(f"Synced: {raw_folder_name} ({len(copied_files)} file(s) copied)")
+            self.add_log(f"Successfully synced: {raw_folder_name}")
+        except Exception as e:
+            logging.error(f"Failed to sync '{raw_folder_name}': {e}", exc_info=True)
+            self.add_log(f"ERROR: Failed to sync '{raw_folder_name}'. {e}")
+            return False
+
+        if self.folder_packer is not None:
+            self.pack_folder(raw_folder_name, destination_paths)
+        return True
+
+    def link_priority_copy(self, raw_folder_name, priority, marker_info, destination_path, source_path):
+        """Dựng bản {priority}@{ngày sync} của destination_path từ source_path (staging của nó, cùng SSD)
+
+        Raise nếu lỗi, để folder BlockBlob không được commit và cả folder được sync lại ở chu kỳ sau.
+        """
+        priority_path = os.path.join(os.path.dirname(destination_path), f"{priority}@{self.today_string}",
+                                     os.path.basename(destination_path))
+        staging = prepare_staging(priority_path)
+        counts = self.copy_engine.clone_tree(source_path, staging,
+                                             journal=self.sync_manifest.journal(raw_folder_name, priority_path,
+                                                                                staging),
+                                             exclude=SIDECAR_FILES)
+        commit_folder(staging, priority_path, marker_info)
+        self.sync_manifest.mark_synced(raw_folder_name, priority_path)
+        logging.info(f"Linked {raw_folder_name} into {priority}@{self.today_string}: {counts}")
+        self.add_log(f"Successfully synced: {raw_folder_name} to {priority.lower()}@{self.today_string} "
+                     f"(reflink {counts['reflink']}, hardlink {counts['hardlink']}, copy {counts['copy']})")
+
+    def pack_folder(self, raw_folder_name, destination_paths):
+        """Đưa folder vừa sync vào hàng đợi đóng gói (đọc từ bản trên SSD đích đầu tiên, trừ SIDECAR_FILES),
+        không chờ nén xong
+        """
+        pack_dirs = self.pack_dirs(raw_folder_name, destination_paths)
+        checksums = {rel_path: checksum for rel_path, (_, _, checksum)
+                     in self.sync_manifest.known_files(raw_folder_name, destination_paths[0]).items()}
+        try:
+            if self.folder_packer.submit(raw_folder_name, destination_paths[0], pack_dirs, checksums, HASH_ALGORITHM,
+                                         exclude=SIDECAR_FILES):
+                self.add_log(f"Packing {raw_folder_name} in background...")
+        except Exception as e:
+            logging.error(f"Cannot start packing '{raw_folder_name}': {e}", exc_info=True)
+            self.add_log(f"ERROR: Cannot start packing '{raw_folder_name}'. {e}")
+
+    def pack_dirs(self, raw_folder_name, destination_paths):
+        return [os.path.join(os.path.dirname(os.path.dirname(path)), PACK_FOLDER_NAME, raw_folder_name)
+                for path in destination_paths]
+
+    def real_time_synchronize_folder(self, source_folder, dst_roots, raw_names=None, poll_new_raw_names=None):
+        """Sync các raw folder đã completed theo thứ tự ưu tiên ra các folder BlockBlob trong dst_roots
+
+        poll_new_raw_names (tùy chọn) được gọi sau mỗi folder để lấy thêm folder vừa completed,
+        nhờ đó folder Critical mới không phải chờ hết dữ liệu bulk đang xếp hàng.
+        Trả về list raw folder chưa sync xong (lỗi, bị hoãn vì thiếu chỗ, worker khác đang giữ, hoặc bị dừng).
+        """
+        with self.metrics.stage('scan'):
+            list_completed_raw = self.get_list_completed_raw(source_folder, raw_names)
+        logging.info("list_completed_raw %s", list_completed_raw)
+        self.add_log(f"Found {len(list_completed_raw)} completed raw folders to sync.")
+        for dst_root in dst_roots:
+            destination_critical_path = os.path.join(dst_root, f"Critical@{self.today_string}")
+            if not os.path.exists(destination_critical_path):
+                os.makedirs(destination_critical_path)
+                self.add_log(f"created folder{destination_critical_path}")
+
+        scheduler = SyncScheduler()
+        with self.metrics.stage('schedule'):
+            self.schedule_raw_folders(scheduler, source_folder, dst_roots, list_completed_raw)
+        self.update_queue_metrics(scheduler)
+        self.add_log("Sync queue: " + ", ".join(f"{k} {v}" for k, v in scheduler.counts().items()))
+        self.plan_capacity(scheduler, dst_roots)
+        unfinished = []
+        while scheduler and not self.stop_event.is_set():
+            raw_folder_name, priority, (raw_folder_path, destination_paths, needed_bytes) = scheduler.pop()
+            self.update_queue_metrics(scheduler)
+            folder_roots = [os.path.dirname(path) for path in destination_paths]
+            # Kiểm tra lại với free space thực tế ngay trước khi copy
+            if not self.capacity_planner.fits(needed_bytes, folder_roots):
+                self.add_log(f"Deferred: {raw_folder_name} needs {needed_bytes / GIB:.1f} GiB, not enough space on SSD")
+                self.metrics.inc('folders_deferred_total', priority=priority)
+                unfinished.append(raw_folder_name)
+                continue
+            with self.lease_manager.folder_sync(raw_folder_name, folder_roots) as busy:
+                if busy:
+                    self.add_log(f"Skipping {raw_folder_name} for now: {busy}")
+                    unfinished.append(raw_folder_name)
+                    continue
+                # Worker khác có thể vừa sync xong folder này trước khi nhả lease
+                if self.already_committed(raw_folder_name, raw_folder_path, destination_paths):
+                    self.add_log(f"Skipping already synced (complete on SSD): {raw_folder_name}")
+                    continue
+                self.current_folder = raw_folder_name
+                if not self.sync_folder_traced(raw_folder_name, priority, raw_folder_path, destination_paths,
+                                               needed_bytes):
+                    unfinished.append(raw_folder_name)
+                self.current_folder = None
+            self.capacity_planner.consumed(needed_bytes, folder_roots)
+            if poll_new_raw_names is not None:
+                new_raw_names = poll_new_raw_names()
+                if new_raw_names:
+                    with self.metrics.stage('schedule'):
+                        self.schedule_raw_folders(scheduler, source_folder, dst_roots,
+                                                  self.get_list_completed_raw(source_folder, new_raw_names))
+                    self.plan_capacity(scheduler, dst_roots)
+        unfinished.extend(raw_folder_name for raw_folder_name, _, _ in scheduler.ordered())
+        self.update_queue_metrics(scheduler)
+        return unfinished
+
+    def sync_folder_traced(self, raw_folder_name, priority, raw_folder_path, destination_paths, needed_bytes):
+        """sync_scheduled_folder kèm metrics: MB/s, thời gian chờ từ khi recorder đóng folder, span trace"""
+        completion_time = get_completion_time(raw_folder_name)
+        wait_seconds = (datetime.now() - completion_time).total_seconds() if completion_time else 0
+        started = time.perf_counter()
+        with self.metrics.span('folder_sync', raw_name=raw_folder_name, priority=priority, bytes=needed_bytes,
+                               destinations=len(destination_paths), wait_seconds=round(wait_seconds, 3)) as span:
+            ok = self.sync_scheduled_folder(raw_folder_name, priority, raw_folder_path, destination_paths)
+            duration = time.perf_counter() - started
+            span['ok'] = ok
+            span['mb_per_second'] = round(needed_bytes / duration / 1024 ** 2, 3) if duration > 0 else None
+        self.metrics.inc('folders_synced_total' if ok else 'folders_failed_total', priority=priority)
+        self.metrics.inc('folder_sync_seconds_total', duration, priority=priority)
+        self.metrics.set('last_folder_wait_seconds', wait_seconds)
+        if ok and duration > 0:
+            self.metrics.set('last_folder_bytes_per_second', needed_bytes / duration)
+        self.write_metrics()
+        return ok
+
+    def update_queue_metrics(self, scheduler):
+        self.queue_counts = scheduler.counts()
+        for priority, count in self.queue_counts.items():
+            self.metrics.set('queue_depth', count, priority=priority)
+
+    def write_metrics(self):
+        """Cập nhật gauge throttle và ghi file metrics (nếu có cấu hình METRICS_TEXTFILE)"""
+        self.metrics.set('rate_limit_bytes_per_second', self.io_throttle.effective_rate())
+        self.metrics.set('recorder_busy', 1 if self.io_throttle.recorder_busy else 0)
+        if METRICS_TEXTFILE:
+            self.metrics.write_textfile(METRICS_TEXTFILE)
+
+    def move_parent_folder_of_txt_to_critical(self, source_folder, critical_folder_on_ssd_autera, dst_external_ssd_folder_name):
+        """Xử lý critical folder và đồng bộ ra SSD ngoài"""
+        if not os.path.exists(critical_folder_on_ssd_autera):
+            os.makedirs(critical_folder_on_ssd_autera)
+            self.add_log(f'Created folder "{critical_folder_on_ssd_autera}"')
+        else:
+            self.add_log(f'Folder "{critical_folder_on_ssd_autera}" already exists.')
+
+        list_completed_raw = self.get_list_completed_raw(source_folder)
+        logging.info("list_completed_raw %s", list_completed_raw)
+        self.add_log(f"Found {len(list_completed_raw)} completed raw folders for critical check.")
+
+        critical_folders_moved = []
+
+        # Lọc critical
+        for raw_folder_name in list_completed_raw:
+            raw_folder_path = os.path.join(source_folder, raw_folder_name)
+
+            if not os.path.exists(raw_folder_path):
+                logging.warning(f"Source folder '{raw_folder_path}' does not exist. Skipping critical check.")
+                continue
+
+            priority, tag_file_names = self.tag_scanner.classify_folder(raw_folder_path)
+
+            if not tag_file_names:
+                self.add_log(f"No tag file found in: {raw_folder_name}")
+            elif priority == PRIORITY_CRITICAL:
+                logging.info("%s is a critical folder, handling...", raw_folder_path)
+                self.add_log(f"CRITICAL: '{raw_folder_name}' is critical. Moving...")
+                try:
+                    destination_path = os.path.join(critical_folder_on_ssd_autera,
+                                                    os.path.basename(raw_folder_path))
+                    shutil.move(raw_folder_path, destination_path)
+                    self.add_log(f"Moved '{raw_folder_name}' to 'criticalData'")
+                    critical_folders_moved.append(raw_folder_name)
+                except Exception as e:
+                    logging.error(f"Error moving critical folder '{raw_folder_path}': {e}", exc_info=True)
+                    self.add_log(f"ERROR: Could not move critical folder '{raw_folder_name}'. {e}")
+            else:
+                self.add_log(f"Folder is not critical: {raw_folder_name}")
+            # print("------") # Xóa dòng này để không in ra quá nhiều
+
+        # Đồng bộ criticalData ra SSD ngoài
+        folders_to_sync_with_rsync = [os.path.join(critical_folder_on_ssd_autera)] + [os.path.join(source_folder, f) for f in list_completed_raw if f not in critical_folders_moved]
+
+        self.add_log(f"Starting rsync for critical data and remaining completed folders...")
+        existing_sync_paths = []
+        for source_sync_path in folders_to_sync_with_rsync:
+            if not os.path.exists(source_sync_path):
+                logging.warning(f"Source path for rsync '{source_sync_path}' does not exist. Skipping.")
+                continue
+            logging.info("sync data from %s to %s", source_sync_path, dst_external_ssd_folder_name)
+            self.add_log(f"rsyncing: {os.path.basename(source_sync_path)}")
+            existing_sync_paths.append(source_sync_path)
+
+        rsync_results = self.rsync_backend.sync_many(existing_sync_paths, dst_external_ssd_folder_name,
+                                                     on_progress=lambda progress: self.add_log(f"rsync {progress}"))
+        rsync_failed = set()
+        for source_sync_path, error in rsync_results.items():
+            if error is None:
+                self.add_log(f"rsync successful for {os.path.basename(source_sync_path)}")
+            else:
+                rsync_failed.add(os.path.basename(source_sync_path))
+                logging.error(f"Error during rsync for '{source_sync_path}': {error}")
+                self.add_log(f"ERROR: rsync failed for '{os.path.basename(source_sync_path)}'. {error}")
+
+
+        # Xóa folder gốc sau khi sync (chỉ những folder đã được xử lý và verify khớp hash)
+        for raw_folder_name in list_completed_raw:
+            raw_folder_path = os.path.join(source_folder, raw_folder_name)
+            if raw_folder_name in rsync_failed:
+                self.add_log(f"Keeping source folder '{raw_folder_name}' because rsync failed.")
+                continue
+            if os.path.exists(raw_folder_path) and raw_folder_name not in critical_folders_moved:
+                mismatches = verify_tree(raw_folder_path, os.path.join(dst_external_ssd_folder_name, raw_folder_name),
+                                         HASH_ALGORITHM, workers=COPY_WORKERS)
+                if mismatches:
+                    logging.error("Verify failed for %s: %s", raw_folder_path, mismatches[:10])
+                    self.add_log(f"ERROR: {len(mismatches)} file(s) of '{raw_folder_name}' do not match on external SSD. "
+                            f"Keeping source folder.")
+                    continue
+                self.add_log(f"Verified {raw_folder_name} ({HASH_ALGORITHM}).")
+                try:
+                    self.tree_scanner.remove_tree(raw_folder_path)
+                    logging.info("Deleted source folder: %s", raw_folder_path)
+                    self.add_log(f"Deleted source folder: {raw_folder_name}")
+                except Exception as e:
+                    logging.error(f"Error deleting source folder '{raw_folder_path}': {e}", exc_info=True)
+                    self.add_log(f"ERROR: Could not delete source folder '{raw_folder_path}'. {e}")
+
+    def start_folder_watcher(self, source_folder):
+        """Tạo inotify watcher cho car folder, None nếu không dùng được (quay về polling)"""
+        try:
+            watcher = RawFolderWatcher(source_folder, get_completion_time)
+            self.add_log(f"Watching {source_folder} with inotify.")
+            return watcher
+        except (InotifyUnavailable, OSError) as e:
+            logging.warning(f"inotify watcher unavailable, falling back to polling: {e}")
+            self.add_log(f"inotify unavailable ({e}), polling every 1 minute.")
+            return None
+
+    def wait_for_ready_raw_folders(self, watcher, last_full_scan, rescan=False, retry_raw_names=()):
+        """Chờ event inotify, trả về list raw folder vừa completed, None nếu cần quét lại toàn bộ
+
+        rescan=True (chu kỳ trước lỗi): trả về None ngay. retry_raw_names (chưa sync xong ở chu kỳ trước)
+        được trả về cùng folder mới, hoặc một mình sau WATCH_RETRY_INTERVAL nếu không có folder mới.
+        """
+        if rescan:
+            return None
+        self.add_log("Waiting for new completed raw folders...")
+        retry_raw_names = list(retry_raw_names)
+        wait_started = time.time()
+        while not self.stop_event.is_set():
+            ready_raw_names = watcher.wait_ready(timeout=1.0)
+            if watcher.needs_rescan or time.time() - last_full_scan > WATCH_RESCAN_INTERVAL:
+                return None
+            if ready_raw_names:
+                logging.info("Raw folders ready: %s", ready_raw_names)
+                return list(dict.fromkeys(list(ready_raw_names) + retry_raw_names))
+            if retry_raw_names and time.time() - wait_started > WATCH_RETRY_INTERVAL:
+                logging.info("Retrying raw folders: %s", retry_raw_names)
+                return retry_raw_names
+        return []
+
+    def main_sync_process(self):
+        """Hàm chính chạy trong luồng
+
+        Lock của worker được giữ suốt thời gian thread sync chạy (instance khác không chen vào giữa 2 chu kỳ),
+        còn lease theo raw folder và theo SSD đích chỉ giữ trong từng chu kỳ.
+        """
+        # Thread sync (và các worker/rsync tạo ra từ nó) chỉ dùng disk khi recorder rảnh
+        if SYNC_IO_PRIORITY is not None and not set_io_priority(SYNC_IO_PRIORITY):
+            logging.warning("Could not set I/O priority '%s' for sync thread", SYNC_IO_PRIORITY)
+        while not self.acquire_instance_lock():
+            logging.info('waiting because other process is running')
+            if self.stop_event.wait(LOCK_RETRY_INTERVAL): # Chờ một lúc trước khi kiểm tra lại
+                return
+        try:
+            self.run_sync_cycles()
+        finally:
+            self.release_instance_lock()
+
+    def run_sync_cycles(self):
+        """Vòng các chu kỳ sync tới khi bị dừng, gọi khi đã giữ lock của worker"""
+        watcher = None
+        ready_raw_names = None  # None = quét toàn bộ car folder
+        rescan = False  # chu kỳ lỗi giữa chừng: chu kỳ sau quét lại toàn bộ
+        retry_raw_names = []  # folder chưa sync xong ở chu kỳ trước
+        last_full_scan = 0
+        while not self.stop_event.is_set():
+            self.pause_event.wait() # Chờ nếu luồng bị tạm dừng
+
+            self.add_log("Starting sync cycle...")
+            logging.info('start sync data cycle')
+            rescan = False
+            retry_raw_names = []
+
+            try:
+
+                car_data_folder = self.get_car_data_folder()
+                if car_data_folder is None:
+                    self.add_log("ERROR: No car data folder found in SSD mount path. Check SSD_MOUNT_PATH or VEHICLE_ID.")
+                    logging.error("No car data folder found in SSD mount path.")
+                    self.stop_event.wait(60) # Chờ lâu hơn nếu không tìm thấy folder
+                    continue
+
+                source_folder = os.path.join(SSD_MOUNT_PATH, car_data_folder)
+                self.add_log(f"Source data folder: {source_folder}")
+                logging.info("source data folder: %s", source_folder)
+
+                if SYNC_WATCH_MODE == 'inotify' and (watcher is None or watcher.needs_rescan
+                                                     or watcher.car_folder != source_folder):
+                    if watcher is not None:
+                        watcher.close()
+                    watcher = self.start_folder_watcher(source_folder)
+                    ready_raw_names = None
+
+                critical_folder_on_ssd_autera = os.path.join(source_folder, 'criticalData')
+                self.add_log(f"Critical data folder: {critical_folder_on_ssd_autera}")
+                logging.info("critical_folder_on_ssd_autera: %s", critical_folder_on_ssd_autera)
+
+                # Đảm bảo DEFAULT_SSD_MOUNT_POINT tồn tại và có nội dung
+                if not os.path.exists(DEFAULT_SSD_MOUNT_POINT) or not os.listdir(DEFAULT_SSD_MOUNT_POINT):
+                    self.add_log(f"ERROR: External SSD mount point '{DEFAULT_SSD_MOUNT_POINT}' not found or empty.")
+                    logging.error(f"External SSD mount point '{DEFAULT_SSD_MOUNT_POINT}' not found or empty.")
+                    self.stop_event.wait(60)
+                    continue
+
+                dst_roots = []
+                for dst_external_ssd_folder_name in self.get_external_ssd_roots():
+                    Path(dst_external_ssd_folder_name).mkdir(exist_ok=True, parents=True)
+                    self.add_log(f"Destination SSD folder: {dst_external_ssd_folder_name}")
+                    if self.check_external_SSD_space(dst_external_ssd_folder_name, SSD_RESERVE_GB):
+                        self.add_log(f"ERROR: No more space remaining on '{dst_external_ssd_folder_name}' "
+                                f"(less than {SSD_RESERVE_GB} GiB). Skipping this SSD.")
+                        logging.info('no more space remaining on %s', dst_external_ssd_folder_name)
+                        continue
+                    dst_roots.append(dst_external_ssd_folder_name)
+
+                if not dst_roots:
+                    self.add_log(f'ERROR: No more space remaining on external SSD (less than {SSD_RESERVE_GB} GiB). Halting sync.')
+                    logging.info('no more space remaining....')
+                    # Thay vì sys.exit(), chỉ thoát chu kỳ hiện tại và chờ
+                    self.stop_event.wait(60) # Chờ 5 phút trước khi kiểm tra lại
+                    continue
+                dst_external_ssd_folder_name = dst_roots[0]
+                self.current_dst_roots[:] = dst_roots
+
+                # Chọn hàm sync bạn muốn chạy:
+                # uncomment dòng này để chạy hàm move_parent_folder_of_txt_to_critical
+                # self.add_log("Running critical data processing and rsync...")
+                # self.move_parent_folder_of_txt_to_critical(source_folder, critical_folder_on_ssd_autera, dst_external_ssd_folder_name)
+
+                self.add_log("Running real-time folder synchronization...")
+                if ready_raw_names is None:
+                    last_full_scan = time.time()
+                retry_raw_names = self.real_time_synchronize_folder(
+                    source_folder, dst_roots, ready_raw_names,
+                    poll_new_raw_names=(lambda: watcher.wait_ready(0)) if watcher is not None else None)
+
+            except Exception as ex:
+                self.add_log(f"ERROR: Sync process failed: {ex}")
+                logging.error("error sync data", exc_info=True)
+                rescan = True  # quét lại toàn bộ ở chu kỳ sau
+
+            finally:
+                self.add_log("Sync cycle finished.")
+                self.metrics.inc('cycles_total')
+                self.write_metrics()
+
+            # Kiểm tra sự kiện dừng hoặc tạm dừng trước khi ngủ
+            if self.stop_event.is_set():
+                break
+            if not self.pause_event.is_set():
+                self.add_log("Sync paused. Waiting for resume.")
+                self.pause_event.wait() # Chờ cho đến khi được resume
+
+            if watcher is not None:
+                # Chờ inotify báo folder mới completed thay vì quét lại mỗi phút
+                ready_raw_names = self.wait_for_ready_raw_folders(watcher, last_full_scan, rescan, retry_raw_names)
+            else:
+                # Ngủ 1 phút trước chu kỳ tiếp theo
+                self.add_log("Waiting 1 minutes for next sync cycle...")
+                self.stop_event.wait(60)
+
+        if watcher is not None:
+            watcher.close()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Chạy sync không cần màn hình (vd service systemd) và điều khiển qua Unix socket
+
+    python3 sync_daemon.py run [--autostart] [--vehicle-id VF8...] [--date YYYYMMDD]
+    python3 sync_daemon.py --socket sync.critical.sock run --worker-name critical --priorities Critical
+    python3 sync_daemon.py status | start | pause | resume | stop
+    python3 sync_daemon.py set rate_limit_mb 50
+    python3 sync_daemon.py events
+    python3 sync_daemon.py metrics
+
+Giao thức: mỗi request là 1 dòng JSON {"cmd": ..., ...}, daemon trả về 1 dòng JSON có khóa "ok".
+"""
+import os
+import sys
+import json
+import signal
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+
+from sync_core import SyncService, setup_logging, start_pack_workers, LOG_DIR
+
+CONTROL_SOCKET = '/home/autera-admin/python/sync.sock'
+CLIENT_TIMEOUT = 15  # giây, stop có thể chờ thread sync tới 10 giây
+SETTINGS = ('date', 'vehicle_id', 'rate_limit_mb', 'adaptive_throttle')
+
+
+class ControlError(Exception):
+    """Daemon không chạy hoặc trả lời lỗi"""
+
+
+# ======================================================================================================
+# SERVER
+# ======================================================================================================
+def handle_command(service, request):
+    """Thực hiện 1 lệnh điều khiển, trả về dict kết quả"""
+    cmd = request.get('cmd')
+    if cmd == 'status':
+        return {'ok': True, **service.status()}
+    if cmd in ('start', 'pause', 'resume', 'stop'):
+        done = getattr(service, cmd)()
+        return {'ok': True, 'changed': done, 'state': service.status()['state']}
+    if cmd == 'metrics':
+        return {'ok': True, 'text': service.metrics.render_prometheus()}
+    if cmd == 'events':
+        seq, lines = service.events_since(int(request.get('since', 0)))
+        return {'ok': True, 'seq': seq, 'lines': lines}
+    if cmd == 'set':
+        key, value = request.get('key'), request.get('value')
+        if key == 'date':
+            return {'ok': service.set_date(str(value))}
+        if key == 'vehicle_id':
+            return {'ok': service.set_vehicle_id(str(value))}
+        if key == 'rate_limit_mb':
+            rate_mb = float(value)
+            if rate_mb < 0:
+                raise ValueError(f"invalid rate limit {value}")
+            service.set_rate_limit(rate_mb)
+            return {'ok': True}
+        if key == 'adaptive_throttle':
+            enabled = value if isinstance(value, bool) else str(value).lower() in ('1', 'true', 'on', 'yes')
+            return {'ok': True, 'enabled': service.set_adaptive_throttle(enabled)}
+        return {'ok': False, 'error': f"unknown setting '{key}', expected one of {SETTINGS}"}
+    return {'ok': False, 'error': f"unknown command '{cmd}'"}
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw_line in self.rfile:
+            try:
+                response = handle_command(self.server.service, json.loads(raw_line))
+            except (ValueError, TypeError) as e:
+                response = {'ok': False, 'error': str(e)}
+            except Exception as e:
+                logging.error("Control command failed: %s", e, exc_info=True)
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, service):
+        self.service = service
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, ControlHandler)
+        os.chmod(socket_path, 0o660)
+
+
+def _remove_stale_socket(socket_path):
+    """Xóa socket của daemon cũ đã chết, báo lỗi nếu có daemon khác đang chạy"""
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise ControlError(f"another sync daemon is already listening on {socket_path}")
+
+
+def run_daemon(socket_path=CONTROL_SOCKET, autostart=False, vehicle_id=None, date=None, log_dir=LOG_DIR,
+               worker_name=None, priorities=None):
+    """Chạy SyncService + control server tới khi nhận SIGTERM/SIGINT
+
+    worker_name/priorities: chạy thêm worker riêng (vd chỉ offload Critical) song song với worker bulk,
+    mỗi worker cần control socket riêng.
+    """
+    start_pack_workers()  # fork trước khi có thread nào
+    setup_logging(log_dir)
+    service = SyncService(worker_name=worker_name, priorities=priorities)
+    if vehicle_id:
+        service.set_vehicle_id(vehicle_id)
+    if date:
+        service.set_date(date)
+    # Không có GUI: thông báo cho người dùng đi vào log
+    events_logger = logging.getLogger('sync.events')
+    service.add_listener(events_logger.info)
+
+    server = ControlServer(socket_path, service)
+    shutdown = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: shutdown.set())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info("Sync daemon listening on %s", socket_path)
+    if autostart:
+        service.start()
+    try:
+        shutdown.wait()
+    finally:
+        logging.info("Sync daemon shutting down")
+        server.shutdown()
+        server.server_close()
+        service.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# ======================================================================================================
+# CLIENT
+# ======================================================================================================
+class DaemonClient:
+    """Client của control socket, có cùng các hàm điều khiển như SyncService (dùng cho GUI/script)"""
+
+    def __init__(self, socket_path=CONTROL_SOCKET, timeout=CLIENT_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def request(self, cmd, **params):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(json.dumps({'cmd': cmd, **params}).encode() + b'\n')
+                with sock.makefile('rb') as reader:
+                    line = reader.readline()
+        except OSError as e:
+            raise ControlError(f"sync daemon not reachable on {self.socket_path}: {e}") from e
+        if not line:
+            raise ControlError("sync daemon closed the connection")
+        return json.loads(line)
+
+    def is_available(self):
+        try:
+            return self.request('status')['ok']
+        except ControlError:
+            return False
+
+    def status(self):
+        return self.request('status')
+
+    def start(self):
+        return self.request('start')['changed']
+
+    def pause(self):
+        return self.request('pause')['changed']
+
+    def resume(self):
+        return self.request('resume')['changed']
+
+    def stop(self):
+        return self.request('stop')['changed']
+
+    def events_since(self, seq=0):
+        response = self.request('events', since=seq)
+        return response['seq'], response['lines']
+
+    def set_date(self, value):
+        return self.request('set', key='date', value=value)['ok']
+
+    def set_vehicle_id(self, value):
+        return self.request('set', key='vehicle_id', value=value)['ok']
+
+    def set_rate_limit(self, rate_mb):
+        return self.request('set', key='rate_limit_mb', value=rate_mb)['ok']
+
+    def set_adaptive_throttle(self, enabled):
+        return self.request('set', key='adaptive_throttle', value=bool(enabled)).get('enabled', False)
+
+    def capacity_lines(self):
+        return self.status().get('capacity', [])
+
+
+# ======================================================================================================
+# CLI
+# ======================================================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Autera -> external SSD sync daemon")
+    parser.add_argument('--socket', default=CONTROL_SOCKET, help="control socket path")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="run the sync daemon in the foreground")
+    run_parser.add_argument('--autostart', action='store_true', help="start syncing immediately")
+    run_parser.add_argument('--vehicle-id')
+    run_parser.add_argument('--date', help="YYYYMMDD")
+    run_parser.add_argument('--log-dir', default=LOG_DIR)
+    run_parser.add_argument('--worker-name', help="name of this worker when running several sync daemons")
+    run_parser.add_argument('--priorities', help="comma separated priority classes to sync, e.g. Critical")
+    for command in ('status', 'start', 'pause', 'resume', 'stop', 'events', 'metrics'):
+        commands.add_parser(command)
+    set_parser = commands.add_parser('set', help="change a setting of the running daemon")
+    set_parser.add_argument('key', choices=SETTINGS)
+    set_parser.add_argument('value')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        priorities = [name.strip() for name in args.priorities.split(',') if name.strip()] \
+            if args.priorities else None
+        run_daemon(args.socket, args.autostart, args.vehicle_id, args.date, args.log_dir, args.worker_name,
+                   priorities)
+        return 0
+
+    client = DaemonClient(args.socket)
+    try:
+        if args.command == 'set':
+            response = client.request('set', key=args.key, value=args.value)
+        else:
+            response = client.request(args.command)
+    except ControlError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.command == 'events':
+        print('\n'.join(response.get('lines', [])))
+    elif args.command == 'metrics':
+        print(response.get('text', ''), end='')
+    else:
+        print(json.dumps(response, indent=1, ensure_ascii=False))
+    return 0 if response.get('ok') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
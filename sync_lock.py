@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Lock giữa các process sync bằng fcntl.flock: 1 instance mỗi worker, lease theo raw folder và theo SSD đích
+
+flock được kernel nhả ngay khi process chết (crash, kill -9), nên không còn lock "treo" tới khi hết hạn.
+File lock chứa PID/worker của holder để báo ai đang giữ và holder đó còn sống hay không.
+"""
+import os
+import re
+import json
+import time
+import fcntl
+import socket
+import hashlib
+import logging
+from contextlib import ExitStack, contextmanager
+
+DEFAULT_DESTINATION_SLOTS = 2  # số process sync được ghi cùng lúc vào 1 SSD đích
+ACQUIRE_RETRIES = 5  # số lần thử lại khi file lock bị holder trước xóa ngay lúc đang mở
+
+
+def pid_alive(pid):
+    """Process pid còn chạy trên máy này hay không"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # process của user khác
+    return True
+
+
+def _lock_name(key):
+    """Tên file an toàn cho key (tên raw folder, đường dẫn SSD...)"""
+    digest = hashlib.sha1(key.encode()).hexdigest()[:8]
+    return f"{re.sub(r'[^A-Za-z0-9@._-]', '_', key.strip(os.sep))[-80:]}-{digest}"
+
+
+class FileLease:
+    """Lock độc quyền (flock, không chờ) trên 1 file
+
+    remove=True: xóa file lock khi nhả (dùng cho lease theo folder để lease_dir không đầy dần), an toàn
+    vì acquire() kiểm tra inode của fd vẫn là file đang mang tên path.
+    """
+
+    def __init__(self, path, owner=None, remove=False):
+        self.path = path
+        self.owner = owner or {}
+        self.remove = remove
+        self._fd = None
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+    def acquire(self):
+        """True nếu lấy được lock (hoặc đã giữ), False nếu process khác đang giữ"""
+        if self._fd is not None:
+            return True
+        for _ in range(ACQUIRE_RETRIES):
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o664)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            try:
+                same_file = os.stat(self.path).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                same_file = False
+            if not same_file:
+                os.close(fd)  # holder trước vừa xóa file, thử lại với file mới
+                continue
+            info = dict(self.owner, pid=os.getpid(), host=socket.gethostname(), since=time.time())
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, json.dumps(info).encode(), 0)
+            self._fd = fd
+            return True
+        return False
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if self.remove:
+                try:
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+            else:
+                os.ftruncate(fd, 0)
+        finally:
+            os.close(fd)  # đóng fd là nhả flock
+
+    def holder(self):
+        """Thông tin holder (pid, worker, since, alive), None nếu không có ai giữ"""
+        try:
+            with open(self.path) as file:
+                info = json.loads(file.read() or 'null')
+        except (OSError, ValueError):
+            return None
+        if not isinstance(info, dict) or 'pid' not in info:
+            return None
+        info['alive'] = info.get('host') != socket.gethostname() or pid_alive(info['pid'])
+        return info
+
+    def describe_holder(self):
+        info = self.holder()
+        if info is None:
+            return "unknown process"
+        text = f"PID {info['pid']}" + (f" ({info['worker']})" if info.get('worker') else "")
+        if not info['alive']:
+            # Lock vẫn bị giữ dù holder đã chết: fd lock đã bị process con kế thừa
+            text += ", not alive anymore (lock inherited by a child process?)"
+        return text
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class SlotLease:
+    """Cho tối đa `slots` holder cùng lúc (vd số process ghi vào 1 SSD), mỗi slot là 1 FileLease"""
+
+    def __init__(self, path_prefix, slots, owner=None):
+        self.slots = [FileLease(f"{path_prefix}.{index}.lock", owner) for index in range(max(1, slots))]
+        self._held = None
+
+    def acquire(self):
+        if self._held is not None:
+            return True
+        for lease in self.slots:
+            if lease.acquire():
+                self._held = lease
+                return True
+        return False
+
+    def release(self):
+        lease, self._held = self._held, None
+        if lease is not None:
+            lease.release()
+
+    def describe_holder(self):
+        return ", ".join(lease.describe_holder() for lease in self.slots)
+
+
+class LeaseManager:
+    """Lease của 1 worker sync: theo raw folder (độc quyền) và theo SSD đích (tối đa destination_slots worker)
+
+    Các process sync (vd 1 process chỉ offload Critical và 1 process bulk) dùng chung lease_dir.
+    """
+
+    def __init__(self, lease_dir, owner=None, destination_slots=DEFAULT_DESTINATION_SLOTS):
+        os.makedirs(lease_dir, exist_ok=True)
+        self.lease_dir = lease_dir
+        self.owner = owner or {}
+        self.destination_slots = destination_slots
+
+    def folder(self, raw_name):
+        return FileLease(os.path.join(self.lease_dir, f"folder-{_lock_name(raw_name)}.lock"), self.owner,
+                         remove=True)
+
+    def destination(self, dst_root):
+        return SlotLease(os.path.join(self.lease_dir, f"dst-{_lock_name(dst_root)}"), self.destination_slots,
+                         self.owner)
+
+    @contextmanager
+    def folder_sync(self, raw_name, dst_roots):
+        """Giữ lease của raw folder và 1 slot trên mỗi SSD đích trong lúc sync
+
+        yield None nếu lấy được hết, không thì yield mô tả lease đang bận (và không giữ lease nào).
+        """
+        with ExitStack() as stack:
+            leases = [self.folder(raw_name)] + [self.destination(dst_root) for dst_root in dst_roots]
+            for lease in leases:
+                if not lease.acquire():
+                    busy = f"{'folder' if lease is leases[0] else 'destination'} lease held by " \
+                           f"{lease.describe_holder()}"
+                    logging.debug("Lease for '%s' busy: %s", raw_name, busy)
+                    yield busy
+                    return
+                stack.callback(lease.release)
+            yield None
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Manifest SQLite lưu các folder/file đã sync, giữ được qua các lần restart"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+FLUSH_EVERY = 64  # số bản ghi file gom lại trước khi commit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    raw_name    TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    synced_at   REAL NOT NULL,
+    PRIMARY KEY (raw_name, destination)
+);
+CREATE TABLE IF NOT EXISTS files (
+    raw_name    TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    rel_path    TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime       REAL NOT NULL,
+    checksum    TEXT,
+    PRIMARY KEY (raw_name, destination, rel_path)
+);
+CREATE TABLE IF NOT EXISTS partial_files (
+    raw_name    TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    rel_path    TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime       REAL NOT NULL,
+    offset      INTEGER NOT NULL,
+    crc         INTEGER,  -- state CRC32 tại offset (chỉ có khi hash bằng crc32)
+    PRIMARY KEY (raw_name, destination, rel_path)
+);
+"""
+
+
+class SyncManifest:
+    """Manifest các raw folder đã sync, khóa theo (raw_name, destination)"""
+
+    def __init__(self, db_path):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._pending_files = []
+        self._files_cache = {}
+        self._partial_keys = set(self._conn.execute(
+            "SELECT raw_name, destination, rel_path FROM partial_files"))
+        # Cache trong RAM để kiểm tra membership O(1)
+        self._synced = set(self._conn.execute("SELECT raw_name, destination FROM folders"))
+        logging.info("Loaded sync manifest %s: %d synced folder(s)", db_path, len(self._synced))
+
+    # --------------------------------------------------------------------------------------------------
+    # Folder
+    # --------------------------------------------------------------------------------------------------
+    def is_synced(self, raw_name, destination):
+        return (raw_name, destination) in self._synced
+
+    def mark_synced(self, raw_name, destination):
+        with self._lock:
+            self._flush_locked()
+            self._conn.execute("INSERT OR REPLACE INTO folders VALUES (?, ?, ?)",
+                               (raw_name, destination, time.time()))
+            self._conn.commit()
+            self._synced.add((raw_name, destination))
+
+    # --------------------------------------------------------------------------------------------------
+    # File
+    # --------------------------------------------------------------------------------------------------
+    def file_unchanged(self, raw_name, destination, rel_path, size, mtime, data_path=None):
+        """File đã được copy với cùng size/mtime và file đích (trong data_path nếu có, vd staging) vẫn còn nguyên"""
+        row = self.known_files(raw_name, destination).get(rel_path)
+        if row is None or row[0] != size or row[1] != mtime:
+            return False
+        try:
+            return os.path.getsize(os.path.join(data_path or destination, rel_path)) == size
+        except OSError:
+            return False
+
+    def known_files(self, raw_name, destination):
+        """dict rel_path -> (size, mtime, checksum) của các file đã copy, nạp 1 lần mỗi folder"""
+        key = (raw_name, destination)
+        with self._lock:
+            if key not in self._files_cache:
+                self._flush_locked()
+                self._files_cache[key] = {
+                    rel_path: (size, mtime, checksum)
+                    for rel_path, size, mtime, checksum in self._conn.execute(
+                        "SELECT rel_path, size, mtime, checksum FROM files "
+                        "WHERE raw_name=? AND destination=?", key)
+                }
+            return self._files_cache[key]
+
+    def record_file(self, raw_name, destination, rel_path, size, mtime, checksum=None):
+        with self._lock:
+            if (raw_name, destination, rel_path) in self._partial_keys:
+                self._conn.execute("DELETE FROM partial_files WHERE raw_name=? AND destination=? AND rel_path=?",
+                                   (raw_name, destination, rel_path))
+                self._partial_keys.discard((raw_name, destination, rel_path))
+            cached = self._files_cache.get((raw_name, destination))
+            if cached is not None:
+                cached[rel_path] = (size, mtime, checksum)
+            self._pending_files.append((raw_name, destination, rel_path, size, mtime, checksum))
+            if len(self._pending_files) >= FLUSH_EVERY:
+                self._flush_locked()
+
+    # --------------------------------------------------------------------------------------------------
+    # File copy dở (resume)
+    # --------------------------------------------------------------------------------------------------
+    def resume_point(self, raw_name, destination, rel_path, size, mtime):
+        """(offset, crc state) đã verify của file copy dở, None nếu không có hoặc file nguồn đã đổi"""
+        if (raw_name, destination, rel_path) not in self._partial_keys:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, offset, crc FROM partial_files "
+                "WHERE raw_name=? AND destination=? AND rel_path=?",
+                (raw_name, destination, rel_path)).fetchone()
+        if row is None or row[0] != size or row[1] != mtime:
+            return None
+        return row[2], row[3]
+
+    def checkpoint(self, raw_name, destination, rel_path, size, mtime, offset, crc=None):
+        """Ghi lại offset đã fdatasync, commit ngay để sống sót qua mất điện"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO partial_files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (raw_name, destination, rel_path, size, mtime, offset, crc))
+            self._conn.commit()
+            self._partial_keys.add((raw_name, destination, rel_path))
+
+    def journal(self, raw_name, destination, data_path=None):
+        """Journal cho CopyEngine.copy_tree của 1 raw folder
+
+        data_path: folder thực sự được ghi (vd staging trước khi commit), manifest vẫn khóa theo destination.
+        """
+        return FolderJournal(self, raw_name, destination, data_path)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending_files:
+            return
+        self._conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                               self._pending_files)
+        self._conn.commit()
+        self._pending_files = []
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+class FolderJournal:
+    """Nối CopyEngine với manifest cho 1 cặp (raw folder, destination)"""
+
+    def __init__(self, manifest, raw_name, destination, data_path=None):
+        self.manifest = manifest
+        self.raw_name = raw_name
+        self.destination = destination
+        self.data_path = data_path
+
+    def skip_file(self, rel_path, st):
+        return self.manifest.file_unchanged(self.raw_name, self.destination, rel_path,
+                                            st.st_size, st.st_mtime, self.data_path)
+
+    def resume_point(self, rel_path, st):
+        return self.manifest.resume_point(self.raw_name, self.destination, rel_path,
+                                          st.st_size, st.st_mtime)
+
+    def checkpoint(self, rel_path, st, offset, crc):
+        self.manifest.checkpoint(self.raw_name, self.destination, rel_path,
+                                 st.st_size, st.st_mtime, offset, crc)
+
+    def file_copied(self, rel_path, st, checksum):
+        self.manifest.record_file(self.raw_name, self.destination, rel_path,
+                                  st.st_size, st.st_mtime, checksum)
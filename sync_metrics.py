@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Counter/gauge/timer theo stage cho vòng sync, xuất dạng Prometheus text và trace span JSON-lines"""
+import os
+import json
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+METRIC_PREFIX = 'autera_sync_'
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(label_key):
+    if not label_key:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in label_key)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(label_key, escaped)) + '}'
+
+
+def _format_value(value):
+    """Số nguyên ghi chính xác (counter byte lên tới TB), số thực ghi đủ độ chính xác bằng repr"""
+    if isinstance(value, int):
+        return str(int(value))  # bool -> 0/1
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+class SyncMetrics:
+    """Metrics dùng chung cho mọi thread sync/copy
+
+    inc() cho counter, set() cho gauge, stage() đo thời gian 1 bước (scan, copy, verify...).
+    Nếu có trace_path, span() ghi mỗi span thành 1 dòng JSON khi kết thúc.
+    """
+
+    def __init__(self, trace_path=None):
+        self._lock = threading.Lock()
+        self._counters = {}  # name -> {label_key: value}
+        self._gauges = {}
+        self._help = {}
+        self.trace_path = trace_path
+        self._trace_lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def get(self, name, **labels):
+        with self._lock:
+            series = self._counters.get(name) or self._gauges.get(name) or {}
+            return series.get(_label_key(labels), 0)
+
+    @contextmanager
+    def stage(self, stage, **labels):
+        """Cộng thời gian chạy vào stage_seconds_total và số lần vào stage_runs_total"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inc('stage_seconds_total', time.perf_counter() - start, stage=stage, **labels)
+            self.inc('stage_runs_total', 1, stage=stage, **labels)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Trace span: yield dict attrs (thêm được thuộc tính trong lúc chạy), ghi ra trace khi kết thúc"""
+        start_wall = time.time()
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            yield attrs
+        except BaseException as e:
+            status = f'error: {e}'
+            raise
+        finally:
+            if self.trace_path:
+                self._write_span({'name': name, 'start': start_wall, 'duration': time.perf_counter() - start,
+                                  'status': status, 'thread': threading.current_thread().name, **attrs})
+
+    def _write_span(self, record):
+        try:
+            line = json.dumps(record, default=str) + '\n'
+            with self._trace_lock, open(self.trace_path, 'a') as file:
+                file.write(line)
+        except OSError as e:
+            logging.warning(f"Cannot write trace span to '{self.trace_path}': {e}")
+
+    # ----------------------------------------------------------------------------------------------
+    # Prometheus
+    # ----------------------------------------------------------------------------------------------
+    def render_prometheus(self):
+        """Text exposition format của Prometheus"""
+        lines = []
+        with self._lock:
+            groups = [('counter', self._counters), ('gauge', self._gauges)]
+            for metric_type, metrics in groups:
+                for name in sorted(metrics):
+                    full_name = METRIC_PREFIX + name
+                    if name in self._help:
+                        lines.append(f"# HELP {full_name} {self._help[name]}")
+                    lines.append(f"# TYPE {full_name} {metric_type}")
+                    for label_key, value in sorted(metrics[name].items()):
+                        lines.append(f"{full_name}{_format_labels(label_key)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """Ghi metrics (atomic) cho textfile collector của node_exporter"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as file:
+                file.write(self.render_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Cannot write metrics file '{path}': {e}")
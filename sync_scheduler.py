@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Hàng đợi ưu tiên cho vòng sync: folder Critical được copy trước, dữ liệu bulk chạy sau"""
+import heapq
+import itertools
+
+from tag_scanner import PRIORITY_CLASSES, PRIORITY_NORMAL
+
+PRIORITY_RANK = {priority: rank for rank, priority in enumerate(PRIORITY_CLASSES)}
+
+
+class SyncScheduler:
+    """Priority queue các raw folder chờ sync
+
+    Thứ tự: priority class (Critical > Review > Normal). Trong cùng class,
+    folder ưu tiên (Critical/Review) mới nhất đi trước, bulk (Normal) cũ nhất đi trước.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()  # giữ thứ tự ổn định khi trùng khóa
+        self._queued = set()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, raw_name):
+        return raw_name in self._queued
+
+    def push(self, raw_name, priority, raw_timestamp, item=None):
+        """Thêm folder vào hàng đợi (bỏ qua nếu đã có), item là dữ liệu kèm theo trả về khi pop"""
+        if raw_name in self._queued:
+            return False
+        age_key = raw_timestamp if priority == PRIORITY_NORMAL else -raw_timestamp
+        heapq.heappush(self._heap, (PRIORITY_RANK[priority], age_key, next(self._counter),
+                                    raw_name, priority, item))
+        self._queued.add(raw_name)
+        return True
+
+    def pop(self):
+        """Lấy folder ưu tiên cao nhất: (raw_name, priority, item)"""
+        _, _, _, raw_name, priority, item = heapq.heappop(self._heap)
+        self._queued.discard(raw_name)
+        return raw_name, priority, item
+
+    def ordered(self):
+        """Các folder đang chờ theo đúng thứ tự pop: list (raw_name, priority, item), không lấy ra khỏi hàng đợi"""
+        return [(raw_name, priority, item) for _, _, _, raw_name, priority, item in sorted(self._heap)]
+
+    def counts(self):
+        """Số folder đang chờ theo từng priority class"""
+        counts = dict.fromkeys(PRIORITY_CLASSES, 0)
+        for entry in self._heap:
+            counts[entry[4]] += 1
+        return counts
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Quét file tag .txt theo từng chunk (bộ nhớ cố định) để phân loại độ ưu tiên của raw folder"""
+import os
+import re
+import logging
+
+# ======================================================================================================
+# CONFIG
+# ======================================================================================================
+PRIORITY_CRITICAL = 'Critical'
+PRIORITY_REVIEW = 'Review'
+PRIORITY_NORMAL = 'Normal'
+PRIORITY_CLASSES = (PRIORITY_CRITICAL, PRIORITY_REVIEW, PRIORITY_NORMAL)  # cao -> thấp
+
+CRITICAL_TAG = "[TAG],manual_annotation.Start.Stop,0,true"
+DEFAULT_TAG_PATTERNS = {
+    CRITICAL_TAG: PRIORITY_CRITICAL,
+}
+DEFAULT_SCAN_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+def get_tag_file_names(raw_folder: str, scanner=None):
+    """Tìm tất cả file .txt trong folder (dùng snapshot của scanner nếu có)"""
+    if scanner is not None:
+        return sorted(name for name in scanner.scan_dir(raw_folder).files if name.endswith('.txt'))
+    with os.scandir(raw_folder) as entries:
+        return sorted(entry.name for entry in entries
+                      if entry.name.endswith('.txt') and entry.is_file())
+
+
+class TagScanner:
+    """Tìm các pattern tag trong file .txt mà không đọc cả file vào RAM
+
+    patterns: dict pattern -> priority class (một trong PRIORITY_CLASSES).
+    """
+
+    def __init__(self, patterns=None, chunk_size=DEFAULT_SCAN_CHUNK_SIZE, scanner=None):
+        self.patterns = dict(DEFAULT_TAG_PATTERNS if patterns is None else patterns)
+        for pattern, priority in self.patterns.items():
+            if priority not in PRIORITY_CLASSES:
+                raise ValueError(f"Unknown priority class '{priority}' for tag pattern '{pattern}'")
+        self.chunk_size = chunk_size
+        self.scanner = scanner
+        encoded = {pattern.encode('utf-8'): priority for pattern, priority in self.patterns.items()}
+        self._priority_of = encoded
+        # Sắp pattern dài trước để alternation không bỏ sót pattern dài hơn có cùng tiền tố
+        self._regex = re.compile(b'|'.join(re.escape(p) for p in sorted(encoded, key=len, reverse=True)))
+        # Giữ lại đuôi chunk trước để bắt được pattern nằm vắt qua ranh giới 2 chunk
+        self._overlap = max((len(p) for p in encoded), default=1) - 1
+
+    def scan_file(self, tag_file_path):
+        """Trả về set các priority class khớp trong file"""
+        found = set()
+        if not self.patterns:
+            return found
+        tail = b''
+        with open(tag_file_path, 'rb') as file:
+            while True:
+                chunk = file.read(self.chunk_size)
+                if not chunk:
+                    break
+                window = tail + chunk
+                for match in self._regex.finditer(window):
+                    found.add(self._priority_of[match.group()])
+                if PRIORITY_CRITICAL in found:
+                    break  # không thể cao hơn nữa
+                tail = window[-self._overlap:] if self._overlap else b''
+        return found
+
+    def classify_folder(self, raw_folder_path, tag_file_names=None):
+        """Trả về (priority class cao nhất, list file tag) của raw folder"""
+        if tag_file_names is None:
+            tag_file_names = get_tag_file_names(raw_folder_path, self.scanner)
+        found = set()
+        for tag_file_name in tag_file_names:
+            tag_file_path = os.path.join(raw_folder_path, tag_file_name)
+            try:
+                found |= self.scan_file(tag_file_path)
+            except OSError as e:
+                logging.error(f"Error reading tag file '{tag_file_path}': {e}", exc_info=True)
+            if PRIORITY_CRITICAL in found:
+                break
+        for priority in PRIORITY_CLASSES:
+            if priority in found:
+                return priority, tag_file_names
+        return PRIORITY_NORMAL, tag_file_names
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""So extract_date/file_date (1 regex) với get_file_date cũ (thử strptime từng định dạng trên từng token)
+
+    python3 -m unittest test_video_dates
+"""
+import os
+import time
+import tempfile
+import unittest
+from datetime import date, datetime
+
+from video_dates import extract_date, file_date
+
+OLD_FORMATS = ["%d/%m/%Y", "%d-%m-%Y", "%d_%m_%Y", "%d%m%Y"]
+
+
+def old_extract_date(file_name):
+    """Phần đọc tên của get_file_date cũ, None thay vì ngày của mtime"""
+    for fmt in OLD_FORMATS:
+        for part in file_name.split():
+            try:
+                return datetime.strptime(part, fmt).date()
+            except ValueError:
+                continue
+    return None
+
+
+# (tên file, ngày mong đợi); ngày None = không có ngày trong tên
+CASES = [
+    # 4 định dạng cũ
+    ("cam 01/12/2025 front.mp4", date(2025, 12, 1)),
+    ("cam 01-12-2025 front.mp4", date(2025, 12, 1)),
+    ("cam 01_12_2025 front.mp4", date(2025, 12, 1)),
+    ("cam 01122025 front.mp4", date(2025, 12, 1)),
+    # ngày/tháng 1 chữ số
+    ("cam 1/2/2025 x.mp4", date(2025, 2, 1)),
+    ("cam 1-12-2025 x.mp4", date(2025, 12, 1)),
+    ("cam 9_9_2025 x.mp4", date(2025, 9, 9)),
+    ("cam 1122025 x.mp4", date(2025, 2, 11)),  # strptime: ngày tham lam '11', tháng '2'
+    ("cam 112025 x.mp4", date(2025, 1, 1)),
+    ("cam 3112025 x.mp4", date(2025, 1, 31)),
+    # ưu tiên dấu phân cách: '/' > '-' > '_' > không có, bất kể vị trí token
+    ("02-02-2025 01/01/2025 x.mp4", date(2025, 1, 1)),
+    ("03032025 02_02_2025 x.mp4", date(2025, 2, 2)),
+    ("03_03_2025 02-02-2025 01/01/2025", date(2025, 1, 1)),
+    # cùng dấu phân cách: token đầu tiên
+    ("01/01/2025 02/02/2025", date(2025, 1, 1)),
+    # ngày không hợp lệ bị bỏ qua, lấy token kế tiếp
+    ("31/02/2025 15/03/2025 x.mp4", date(2025, 3, 15)),
+    ("31/02/2025 15-03-2025 x.mp4", date(2025, 3, 15)),
+    ("29/02/2024 x.mp4", date(2024, 2, 29)),
+    ("29/02/2025 x.mp4", None),
+    ("00/01/2025 x.mp4", None),
+    ("01/13/2025 x.mp4", None),
+    ("32/01/2025 x.mp4", None),
+    # phải là cả token (cách nhau bởi khoảng trắng)
+    ("cam_01-12-2025.mp4", None),
+    ("01-12-2025.mp4", None),
+    ("x01/12/2025 y.mp4", None),
+    ("01/12/20251 y.mp4", None),
+    ("01/12-2025 y.mp4", None),
+    ("01/12/25 y.mp4", None),
+    ("cam\t01/12/2025\tfront.mp4", date(2025, 12, 1)),
+    ("cam  01/12/2025  front.mp4", date(2025, 12, 1)),
+    ("01/12/2025", date(2025, 12, 1)),
+    ("", None),
+    ("video.mp4", None),
+]
+
+# YYYYMMDD_HHMMSS (raw folder Autera, dashcam): không có trong bản cũ, ưu tiên thấp nhất
+RAW_CASES = [
+    ("rec@20250101_081000.mp4", date(2025, 1, 1)),
+    ("20251231_235959_front.mp4", date(2025, 12, 31)),
+    ("cam_20250230_120000.mp4", None),  # 30/02 không hợp lệ
+    ("x120250101_081000.mp4", None),  # năm phải bắt đầu sau 1 ký tự không phải số
+    ("20250101_0810.mp4", None),
+    ("20250101_081000 05/06/2024.mp4", date(2025, 1, 1)),  # '05/06/2024.mp4' không phải cả token
+    # định dạng cũ thắng dạng raw
+    ("20250101_081000 05/06/2024 x.mp4", date(2024, 6, 5)),
+    ("20250101_081000 05062024 x.mp4", date(2024, 6, 5)),
+]
+
+
+class ExtractDateTest(unittest.TestCase):
+
+    def test_cases(self):
+        for name, expected in CASES:
+            with self.subTest(name=name):
+                self.assertEqual(extract_date(name), expected)
+                self.assertEqual(old_extract_date(name), expected)
+
+    def test_raw_cases(self):
+        for name, expected in RAW_CASES:
+            with self.subTest(name=name):
+                self.assertEqual(extract_date(name), expected)
+
+    def test_all_day_month_tokens(self):
+        """Mọi token ngày/tháng 1-2 chữ số (kể cả không hợp lệ), mọi dấu phân cách, như strptime"""
+        for day in ['0', '00'] + [str(d) for d in range(1, 33)] + [f'{d:02d}' for d in range(1, 10)]:
+            for month in ['0', '00', '13'] + [str(m) for m in range(1, 13)] + [f'{m:02d}' for m in range(1, 10)]:
+                for sep in ('/', '-', '_', ''):
+                    name = f"cam {day}{sep}{month}{sep}2024 x.mp4"
+                    with self.subTest(name=name):
+                        self.assertEqual(extract_date(name), old_extract_date(name))
+
+
+class FileDateTest(unittest.TestCase):
+
+    def test_mtime_fallback(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "video.mp4")
+            open(path, 'wb').close()
+            mtime = time.mktime((2023, 5, 17, 12, 0, 0, 0, 0, -1))
+            os.utime(path, (mtime, mtime))
+            self.assertEqual(file_date("video.mp4", path), date(2023, 5, 17))
+            self.assertEqual(file_date("video.mp4", path, mtime=time.mktime((2022, 1, 2, 12, 0, 0, 0, 0, -1))),
+                             date(2022, 1, 2))
+            self.assertEqual(file_date("video 01/12/2025 x.mp4", path), date(2025, 12, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
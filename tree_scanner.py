@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Snapshot cây thư mục bằng os.scandir, cache theo mtime của từng folder để các bước sync dùng chung"""
+import os
+import time
+import shutil
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+# ======================================================================================================
+# CONFIG
+# ======================================================================================================
+DEFAULT_MAX_DIRS = 8192  # số folder giữ trong cache (LRU)
+# Folder vừa đổi trong khoảng này thì không cache: mtime có thể chưa tăng dù nội dung đã đổi thêm
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+# Có st_size/st_mtime giống os.stat_result nên dùng thay được cho stat ở manifest/journal
+FileStat = namedtuple('FileStat', ['st_size', 'st_mtime', 'st_mtime_ns'])
+DirSnapshot = namedtuple('DirSnapshot', ['mtime_ns', 'dirs', 'files'])  # dirs: tuple tên, files: dict tên -> FileStat
+
+
+class TreeScanner:
+    """Cache nội dung folder (folder con, file + size/mtime), tự quét lại folder có mtime thay đổi
+
+    Mỗi lần dùng lại snapshot chỉ tốn 1 stat cho mỗi folder thay vì 1 stat cho mỗi file.
+    Lưu ý: mtime của folder chỉ đổi khi tạo/xóa/đổi tên entry, không đổi khi file được ghi thêm,
+    vì vậy chỉ nên dùng cho raw folder đã completed. max_dirs=0 là không cache.
+    """
+
+    def __init__(self, max_dirs=DEFAULT_MAX_DIRS):
+        self.max_dirs = max_dirs
+        self._lock = threading.Lock()
+        self._dirs = OrderedDict()  # path -> DirSnapshot
+        self.hits = 0
+        self.misses = 0
+
+    def scan_dir(self, path):
+        """DirSnapshot của 1 folder (không đệ quy), raise OSError nếu folder không đọc được"""
+        mtime_ns = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._dirs.get(path)
+            if cached is not None and cached.mtime_ns == mtime_ns:
+                self._dirs.move_to_end(path)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        dirs, files = [], {}
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        files[entry.name] = FileStat(st.st_size, st.st_mtime, st.st_mtime_ns)
+                except FileNotFoundError:
+                    continue  # bị xóa trong lúc quét
+        snapshot = DirSnapshot(mtime_ns, tuple(sorted(dirs)), files)
+
+        if self.max_dirs and time.time_ns() - mtime_ns > RACY_WINDOW_NS:
+            with self._lock:
+                self._dirs[path] = snapshot
+                self._dirs.move_to_end(path)
+                while len(self._dirs) > self.max_dirs:
+                    self._dirs.popitem(last=False)
+        return snapshot
+
+    def names(self, path):
+        """Tên các entry trong folder (folder con trước, sau đó file), như os.listdir"""
+        snapshot = self.scan_dir(path)
+        return [*snapshot.dirs, *snapshot.files]
+
+    def walk(self, top):
+        """Như os.walk nhưng trả về (dir_path, dir_names, dict file_name -> FileStat)"""
+        stack = [top]
+        while stack:
+            dir_path = stack.pop()
+            try:
+                snapshot = self.scan_dir(dir_path)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            yield dir_path, list(snapshot.dirs), snapshot.files
+            stack.extend(os.path.join(dir_path, name) for name in reversed(snapshot.dirs))
+
+    def files(self, top):
+        """dict rel_path -> FileStat của mọi file trong cây top"""
+        result = {}
+        for dir_path, _, files in self.walk(top):
+            rel_dir = os.path.relpath(dir_path, top)
+            for file_name, st in files.items():
+                result[os.path.normpath(os.path.join(rel_dir, file_name))] = st
+        return result
+
+    def tree_size(self, top):
+        """Tổng kích thước file trong cây top (byte)"""
+        return sum(st.st_size for _, _, files in self.walk(top) for st in files.values())
+
+    def invalidate(self, top):
+        """Bỏ cache của top và mọi folder con"""
+        prefix = top.rstrip(os.sep) + os.sep
+        with self._lock:
+            for path in [path for path in self._dirs if path == top or path.startswith(prefix)]:
+                del self._dirs[path]
+
+    def remove_tree(self, top):
+        """Xóa cây top dựa trên snapshot (không phải listdir/stat lại), lỗi thì lùi về shutil.rmtree"""
+        try:
+            for dir_path, _, files in reversed(list(self.walk(top))):
+                for file_name in files:
+                    os.unlink(os.path.join(dir_path, file_name))
+                os.rmdir(dir_path)
+        except OSError as e:
+            logging.debug("Snapshot removal of '%s' incomplete (%s), falling back to shutil.rmtree", top, e)
+            if os.path.lexists(top):
+                shutil.rmtree(top)
+        finally:
+            self.invalidate(top)
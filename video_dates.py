@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Lấy ngày của video từ tên file (1 regex biên dịch sẵn) và index ngày theo folder lưu trong SQLite
+
+Ngày trong tên: token (cách nhau bởi khoảng trắng) dạng dd/mm/yyyy, dd-mm-yyyy, dd_mm_yyyy, ddmmyyyy,
+hoặc YYYYMMDD_HHMMSS ở bất kỳ đâu trong tên (tên raw folder Autera, dashcam). Không có thì lấy ngày của mtime.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import date
+
+from video_scan import VIDEO_EXTENSIONS, scan_videos
+
+# Cache theo user (tool GUI chạy trên nhiều máy/tài khoản), đặt VIDEO_DATE_DB trong môi trường để đổi
+VIDEO_DATE_DB = os.environ.get('VIDEO_DATE_DB') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'autera', 'video_dates.db')
+# Folder vừa đổi trong khoảng này thì chưa tin index của nó: mtime có thể chưa tăng dù nội dung đã đổi thêm
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+# Thứ tự ưu tiên như bản cũ (thử lần lượt từng định dạng trên mọi token): '/', '-', '_', không có dấu phân cách.
+# Ngày/tháng cho phép 1 chữ số như datetime.strptime.
+SEPARATOR_PRIORITY = ('/', '-', '_', '')
+DATE_PATTERN = re.compile(
+    r'(?<!\S)(?P<d>3[01]|[12]\d|0[1-9]|[1-9])(?P<sep>[/_-]?)(?P<m>1[0-2]|0[1-9]|[1-9])(?P=sep)(?P<y>\d{4})(?!\S)'
+    r'|(?<!\d)(?P<ry>\d{4})(?P<rm>\d{2})(?P<rd>\d{2})_\d{6}')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    folder      TEXT PRIMARY KEY,
+    mtime_ns    INTEGER NOT NULL,  -- mtime của folder lúc index, 0 = phải quét lại
+    dirs        TEXT NOT NULL      -- JSON list tên folder con
+);
+CREATE TABLE IF NOT EXISTS videos (
+    folder      TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    date        TEXT NOT NULL,     -- YYYY-MM-DD
+    PRIMARY KEY (folder, name)
+);
+CREATE INDEX IF NOT EXISTS videos_by_date ON videos (folder, date);
+"""
+
+
+def extract_date(file_name):
+    """Ngày ghi trong tên file, None nếu không có"""
+    best = None
+    for match in DATE_PATTERN.finditer(file_name):
+        try:
+            if match.group('y') is not None:
+                found = date(int(match.group('y')), int(match.group('m')), int(match.group('d')))
+                rank = SEPARATOR_PRIORITY.index(match.group('sep'))
+            else:
+                found = date(int(match.group('ry')), int(match.group('rm')), int(match.group('rd')))
+                rank = len(SEPARATOR_PRIORITY)
+        except ValueError:
+            continue  # vd 31/02/2025
+        if best is None or rank < best[0]:
+            best = (rank, found)
+            if rank == 0:
+                break
+    return best[1] if best is not None else None
+
+
+def file_date(file_name, file_path, mtime=None):
+    """Ngày của video: từ tên file, không có thì từ mtime"""
+    found = extract_date(file_name)
+    if found is not None:
+        return found
+    return date.fromtimestamp(os.path.getmtime(file_path) if mtime is None else mtime)
+
+
+def open_date_index(db_path=None):
+    """VideoDateIndex, hoặc UncachedDateIndex (quét như bản cũ) nếu không mở được file index"""
+    try:
+        return VideoDateIndex(db_path)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning("Cannot open video date index '%s' (%s), scanning without cache",
+                        db_path or VIDEO_DATE_DB, e)
+        return UncachedDateIndex()
+
+
+class VideoDateIndex:
+    """Index ngày của video theo folder, giữ được qua các lần mở tool
+
+    Folder có mtime không đổi dùng lại index mà không stat từng file; folder đã đổi được quét lại và chỉ
+    tính lại ngày cho file có (tên, size, mtime) khác lần trước. Như TreeScanner: mtime folder không đổi
+    khi file được ghi thêm, nên chỉ dùng cho video đã ghi xong. Video bị ghi đè tại chỗ (mtime folder không đổi)
+    giữ ngày cũ trong index tới khi folder đổi: thao tác xóa tự tính lại ngày của từng file.
+    """
+
+    def __init__(self, db_path=None):
+        db_path = db_path or VIDEO_DATE_DB
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._dates = {}  # path -> ngày (YYYY-MM-DD) của các video trong lần walk gần nhất
+
+    def walk(self, top, skip_dirs=()):
+        """Lần lượt trả về đường dẫn các video trong cây top (cập nhật index của folder đã đổi trên đường đi)
+
+        Ngày của các video đã trả về lấy bằng date_of(path).
+        """
+        return self.between(top, skip_dirs=skip_dirs)
+
+    def between(self, top, start=None, end=None, skip_dirs=()):
+        """Như walk nhưng chỉ trả về video có ngày trong [start, end] (None = không giới hạn)
+
+        Lọc theo ngày chạy trong SQLite (so chuỗi YYYY-MM-DD), chỉ tạo đường dẫn cho video thỏa điều kiện.
+        """
+        low = start.isoformat() if start is not None else ''
+        high = end.isoformat() if end is not None else '9999-12-31'
+        skip = {os.path.realpath(path) for path in skip_dirs}
+        self._dates = {}
+        pending = [top]
+        while pending:
+            folder = pending.pop()
+            try:
+                sub_dirs = self._refresh(folder)
+            except OSError as e:
+                logging.warning("Cannot index '%s': %s", folder, e)
+                continue
+            with self._lock:
+                rows = self._conn.execute("SELECT name, date FROM videos WHERE folder = ? AND date BETWEEN ? AND ? "
+                                          "ORDER BY name", (folder, low, high)).fetchall()
+            prefix = os.path.join(folder, '')
+            for name, day in rows:
+                path = prefix + name
+                self._dates[path] = day
+                yield path
+            sub_paths = (prefix + name for name in reversed(sub_dirs))
+            pending.extend(path for path in sub_paths if os.path.realpath(path) not in skip)
+
+    def date_of(self, path):
+        day = self._dates.get(path)
+        if day is None:
+            return file_date(os.path.basename(path), path)
+        return date.fromisoformat(day)
+
+    def _refresh(self, folder):
+        """Cập nhật index của 1 folder nếu folder đã đổi, trả về list tên folder con"""
+        mtime_ns = os.stat(folder).st_mtime_ns
+        with self._lock:
+            row = self._conn.execute("SELECT mtime_ns, dirs FROM folders WHERE folder = ?", (folder,)).fetchone()
+        if row is not None and row[0] == mtime_ns:
+            return json.loads(row[1])
+
+        with self._lock:
+            known = {name: (size, file_mtime_ns, day) for name, size, file_mtime_ns, day
+                     in self._conn.execute("SELECT name, size, mtime_ns, date FROM videos WHERE folder = ?",
+                                           (folder,))}
+        sub_dirs, rows = [], []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        sub_dirs.append(entry.name)
+                    elif entry.name.lower().endswith(VIDEO_EXTENSIONS) and entry.is_file():
+                        st = entry.stat()
+                        cached = known.get(entry.name)
+                        if cached is not None and cached[:2] == (st.st_size, st.st_mtime_ns):
+                            day = cached[2]
+                        else:
+                            day = file_date(entry.name, entry.path, st.st_mtime).isoformat()
+                        rows.append((folder, entry.name, st.st_size, st.st_mtime_ns, day))
+                except FileNotFoundError:
+                    continue  # bị xóa trong lúc quét
+        sub_dirs.sort()
+        # Folder vừa đổi: lần sau quét lại cho chắc
+        trusted_mtime = mtime_ns if time.time_ns() - mtime_ns > RACY_WINDOW_NS else 0
+        with self._lock:
+            self._conn.execute("DELETE FROM videos WHERE folder = ?", (folder,))
+            self._conn.executemany("INSERT INTO videos VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO folders VALUES (?, ?, ?)",
+                               (folder, trusted_mtime, json.dumps(sub_dirs)))
+            self._conn.commit()
+        return sub_dirs
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class UncachedDateIndex:
+    """Cùng API với VideoDateIndex nhưng không lưu gì: quét lại và tính ngày từng file mỗi lần"""
+
+    def walk(self, top, skip_dirs=()):
+        return scan_videos(top, skip_dirs=skip_dirs)
+
+    def between(self, top, start=None, end=None, skip_dirs=()):
+        for path in scan_videos(top, skip_dirs=skip_dirs):
+            try:
+                day = self.date_of(path)
+            except FileNotFoundError:
+                continue
+            if (start is None or day >= start) and (end is None or day <= end):
+                yield path
+
+    def date_of(self, path):
+        return file_date(os.path.basename(path), path)
+
+    def close(self):
+        pass
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Kiểm tra trùng video theo nội dung trước khi copy (dùng cho CopyDataSsd04/06)
+
+So size trước, sau đó sample hash (size + block đầu/giữa/cuối), full hash chỉ tính khi cần xác nhận
+1 file trùng nội dung với file khác tên. Hash của file đích được cache trong sidecar ở folder đích
+(.video_dedup.json), khóa theo (đường dẫn tương đối, size, mtime).
+"""
+import os
+import json
+import logging
+import threading
+
+from integrity import DEFAULT_HASH_ALGORITHM, new_hasher, hash_file
+from copy_engine import pread
+from video_scan import scan_videos
+
+DEDUP_INDEX_NAME = '.video_dedup.json'
+SAMPLE_BLOCK_SIZE = 1024 * 1024  # mỗi block đầu/giữa/cuối
+
+# Kết quả check()
+COPY = 'copy'  # chưa có ở đích
+SKIP = 'skip'  # đã có bản giống hệt (cùng tên hoặc khác tên)
+REPAIR = 'repair'  # bản cùng tên ở đích bị cụt/hỏng, copy lại
+CONFLICT = 'conflict'  # file khác nội dung nhưng trùng tên ở đích, không ghi đè
+
+
+def sample_hash(path, algorithm=DEFAULT_HASH_ALGORITHM, block_size=SAMPLE_BLOCK_SIZE):
+    """Hash của size + block đầu/giữa/cuối (file nhỏ hơn 3 block thì hash cả file)"""
+    with open(path, 'rb') as file:
+        fd = file.fileno()
+        size = os.fstat(fd).st_size
+        hasher = new_hasher(algorithm)
+        hasher.update(str(size).encode())
+        if size <= 3 * block_size:
+            blocks = [(0, size)]
+        else:
+            blocks = [(0, block_size), ((size - block_size) // 2, block_size), (size - block_size, block_size)]
+        for offset, count in blocks:
+            hasher.update(pread(fd, count, offset))
+    return hasher.hexdigest()
+
+
+def is_prefix(src, dst, dst_size, block_size=SAMPLE_BLOCK_SIZE):
+    """dst (dst_size byte) là phần đầu của src (vd copy bị ngắt giữa chừng): so block đầu và block cuối của dst"""
+    with open(src, 'rb') as fsrc, open(dst, 'rb') as fdst:
+        for offset in sorted({0, max(0, dst_size - block_size)}):
+            count = min(block_size, dst_size - offset)
+            if pread(fsrc.fileno(), count, offset) != pread(fdst.fileno(), count, offset):
+                return False
+    return True
+
+
+class DedupIndex:
+    """Hash nội dung các video trong folder đích, tính lười và lưu vào sidecar trên chính folder đích
+
+    check() được gọi từ 1 thread, add() có thể được gọi từ các thread copy.
+    """
+
+    def __init__(self, dest_folder, algorithm=DEFAULT_HASH_ALGORITHM, block_size=SAMPLE_BLOCK_SIZE):
+        self.dest_folder = dest_folder
+        self.algorithm = algorithm
+        self.block_size = block_size
+        self.path = os.path.join(dest_folder, DEDUP_INDEX_NAME)
+        self._lock = threading.Lock()
+        self._entries = {}  # rel_path -> [size, mtime_ns, sample hash, full hash]
+        self._by_size = None  # size -> set(rel_path) của các video ở đích, dựng lần đầu cần tới
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning("Ignoring unreadable dedup index '%s': %s", self.path, e)
+            return
+        if data.get('algorithm') != self.algorithm or data.get('block_size') != self.block_size:
+            logging.info("Dedup index '%s' uses other hash settings, rebuilding", self.path)
+            return
+        self._entries = data.get('files', {})
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'algorithm': self.algorithm, 'block_size': self.block_size, 'files': self._entries}
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w') as file:
+                    json.dump(data, file)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                # Chỉ mất cache hash, lần sau tính lại
+                logging.warning("Cannot save dedup index '%s': %s", self.path, e)
+                return
+            self._dirty = False
+
+    # --------------------------------------------------------------------------------------------------
+    # Entry của file đích
+    # --------------------------------------------------------------------------------------------------
+    def _entry(self, rel_path):
+        """Entry hiện hành của file đích (hash cũ bị bỏ nếu size/mtime đã đổi), None nếu file không tồn tại"""
+        try:
+            st = os.stat(os.path.join(self.dest_folder, rel_path))
+        except FileNotFoundError:
+            with self._lock:
+                if self._entries.pop(rel_path, None) is not None:
+                    self._dirty = True
+            return None
+        with self._lock:
+            entry = self._entries.get(rel_path)
+            if entry is None or entry[0] != st.st_size or entry[1] != st.st_mtime_ns:
+                entry = self._entries[rel_path] = [st.st_size, st.st_mtime_ns, None, None]
+                self._dirty = True
+            return entry
+
+    def _sample_of(self, rel_path, entry):
+        if entry[2] is None:
+            entry[2] = sample_hash(os.path.join(self.dest_folder, rel_path), self.algorithm, self.block_size)
+            self._dirty = True
+        return entry[2]
+
+    def _full_of(self, rel_path, entry):
+        if entry[3] is None:
+            entry[3] = hash_file(os.path.join(self.dest_folder, rel_path), self.algorithm)
+            self._dirty = True
+        return entry[3]
+
+    def _same_size(self, size):
+        """Các video ở đích có đúng size này"""
+        if self._by_size is None:
+            by_size = {}
+            for path in scan_videos(self.dest_folder):
+                try:
+                    by_size.setdefault(os.path.getsize(path), set()).add(os.path.relpath(path, self.dest_folder))
+                except FileNotFoundError:
+                    continue
+            with self._lock:
+                self._by_size = by_size
+        with self._lock:
+            return sorted(self._by_size.get(size, ()))
+
+    # --------------------------------------------------------------------------------------------------
+    # API
+    # --------------------------------------------------------------------------------------------------
+    def check(self, src, rel_path):
+        """(COPY/SKIP/REPAIR/CONFLICT, mô tả) cho việc copy src tới rel_path trong folder đích"""
+        src_size = os.path.getsize(src)
+        dst = os.path.join(self.dest_folder, rel_path)
+        entry = self._entry(rel_path)
+        if entry is not None:
+            if entry[0] == src_size:
+                if self._sample_of(rel_path, entry) == sample_hash(src, self.algorithm, self.block_size):
+                    return SKIP, "already copied"
+                return REPAIR, "same size but different content (incomplete copy?)"
+            if entry[0] < src_size and is_prefix(src, dst, entry[0], self.block_size):
+                return REPAIR, f"truncated copy ({entry[0]} of {src_size} bytes)"
+            return CONFLICT, "a different file with the same name exists"
+
+        # Không có file cùng tên: tìm bản cùng nội dung dưới tên khác
+        src_sample = src_full = None
+        for other in self._same_size(src_size):
+            other_entry = self._entry(other)
+            if other_entry is None or other_entry[0] != src_size:
+                continue
+            src_sample = src_sample or sample_hash(src, self.algorithm, self.block_size)
+            if self._sample_of(other, other_entry) != src_sample:
+                continue
+            src_full = src_full or hash_file(src, self.algorithm)
+            if self._full_of(other, other_entry) == src_full:
+                return SKIP, f"same content as '{other}'"
+        return COPY, None
+
+    def add(self, rel_path):
+        """Ghi nhận file vừa copy xong tới rel_path (hash cũ của bản bị thay thế không còn dùng)"""
+        try:
+            st = os.stat(os.path.join(self.dest_folder, rel_path))
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._entries[rel_path] = [st.st_size, st.st_mtime_ns, None, None]
+            if self._by_size is not None:
+                self._by_size.setdefault(st.st_size, set()).add(rel_path)
+            self._dirty = True
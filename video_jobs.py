@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""Job copy/xóa video chạy trên thread nền (dùng cho CopyDataSsd06): queue job, tiến độ, tạm dừng và hủy
+
+Không phụ thuộc Qt: GUI truyền callback on_progress/on_finished (được gọi từ thread nền, vd emit signal Qt).
+"""
+import os
+import time
+import queue
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from copy_engine import CopyEngine
+from io_throttle import copy_streams_for
+from capacity_planner import format_duration
+from video_dedup import DedupIndex, COPY, SKIP, REPAIR, CONFLICT
+PROGRESS_INTERVAL = 0.25  # giây giữa 2 lần báo tiến độ
+PARTIAL_SUFFIX = '.part'  # copy vào file tạm rồi rename: hủy giữa chừng không để lại file cụt mang tên thật
+
+
+class JobCancelled(Exception):
+    """Job bị người dùng hủy"""
+
+
+# ======================================================================================================
+# TRẠNG THÁI JOB
+# ======================================================================================================
+class JobProgress:
+    """Ảnh chụp tiến độ của 1 job, gửi sang GUI thread"""
+
+    def __init__(self, title, status, total_files, done_files, skipped_files, failed_files, total_bytes,
+                 done_bytes, elapsed, paused):
+        self.title = title
+        self.status = status  # queued/running/done/cancelled/failed
+        self.total_files = total_files
+        self.done_files = done_files
+        self.skipped_files = skipped_files
+        self.failed_files = failed_files
+        self.total_bytes = total_bytes
+        self.done_bytes = done_bytes
+        self.elapsed = elapsed  # giây đã chạy, không tính lúc tạm dừng
+        self.paused = paused
+
+    @property
+    def rate(self):
+        """Tốc độ trung bình (byte/s)"""
+        return self.done_bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Số giây còn lại ước tính, None nếu chưa đủ dữ liệu"""
+        if self.rate <= 0 or self.total_bytes <= self.done_bytes:
+            return None
+        return (self.total_bytes - self.done_bytes) / self.rate
+
+    def describe(self):
+        text = f"{self.title}: {self.done_files}/{self.total_files} file"
+        if self.total_bytes:
+            text += f", {self.done_bytes / 2**20:.0f}/{self.total_bytes / 2**20:.0f} MB, " \
+                    f"{self.rate / 2**20:.1f} MB/s"
+            if self.eta is not None:
+                text += f", còn {format_duration(self.eta)}"
+        if self.skipped_files:
+            text += f", skip {self.skipped_files}"
+        if self.failed_files:
+            text += f", lỗi {self.failed_files}"
+        if self.paused:
+            text += " (tạm dừng)"
+        return text
+
+
+class JobState:
+    """Bộ đếm tiến độ + điều khiển tạm dừng/hủy của 1 job
+
+    Truyền vào CopyEngine như throttle: consume() được gọi trước mỗi chunk, nên tạm dừng/hủy có tác dụng
+    ngay giữa 1 file lớn và tiến độ được cập nhật theo byte.
+    """
+
+    def __init__(self, title, on_progress=None):
+        self.title = title
+        self.on_progress = on_progress
+        self.status = 'queued'
+        self.total_files = self.done_files = self.skipped_files = self.failed_files = 0
+        self.total_bytes = self.done_bytes = 0
+        self._lock = threading.Lock()
+        self._running = threading.Event()  # clear = tạm dừng
+        self._running.set()
+        self._cancelled = threading.Event()
+        self._started = None
+        self._ended = None
+        self._paused_at = None
+        self._paused_total = 0.0
+        self._last_report = 0.0
+
+    # --------------------------------------------------------------------------------------------------
+    # Điều khiển (gọi từ GUI thread)
+    # --------------------------------------------------------------------------------------------------
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def pause(self):
+        with self._lock:
+            if self.paused or self.cancelled:
+                return False
+            self._paused_at = time.monotonic()
+            self._running.clear()
+        self.report(force=True)
+        return True
+
+    def resume(self):
+        with self._lock:
+            if not self.paused:
+                return False
+            self._paused_total += time.monotonic() - self._paused_at
+            self._paused_at = None
+            self._running.set()
+        self.report(force=True)
+        return True
+
+    def cancel(self):
+        self._cancelled.set()
+        self.resume()  # đánh thức worker đang chờ để nó thấy cờ hủy
+
+    # --------------------------------------------------------------------------------------------------
+    # Cập nhật (gọi từ thread nền)
+    # --------------------------------------------------------------------------------------------------
+    def check(self):
+        """Chờ nếu đang tạm dừng, raise JobCancelled nếu đã hủy"""
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise JobCancelled(self.title)
+
+    def consume(self, nbytes):
+        self.check()
+        with self._lock:
+            self.done_bytes += nbytes
+        self.report()
+
+    def start(self):
+        with self._lock:
+            self.status = 'running'
+            self._started = time.monotonic()
+        self.report(force=True)
+
+    def plan(self, files, nbytes):
+        with self._lock:
+            self.total_files += files
+            self.total_bytes += nbytes
+        self.report()
+
+    def file_done(self, skipped=False, failed=False):
+        with self._lock:
+            if skipped:
+                self.skipped_files += 1
+            elif failed:
+                self.failed_files += 1
+            else:
+                self.done_files += 1
+        self.report()
+
+    def finish(self, status):
+        with self._lock:
+            self.status = status
+            if self._started is not None:
+                self._ended = time.monotonic()
+        self.report(force=True)
+
+    def snapshot(self):
+        with self._lock:
+            if self._started is None:
+                elapsed = 0.0
+            else:
+                elapsed = (self._paused_at or self._ended or time.monotonic()) - self._started - self._paused_total
+            return JobProgress(self.title, self.status, self.total_files, self.done_files, self.skipped_files,
+                               self.failed_files, self.total_bytes, self.done_bytes, elapsed, self.paused)
+
+    def report(self, force=False):
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        self.on_progress(self.snapshot())
+
+
+# ======================================================================================================
+# JOB
+# ======================================================================================================
+class CopyVideosJob:
+    """Copy các video trong sources sang dest_folder, bỏ qua file đã có ở đích
+
+    dedup=True: so nội dung thay vì chỉ so tên (DedupIndex): bản cùng tên bị cụt/hỏng được copy lại,
+    video đã có ở đích dưới tên khác được bỏ qua.
+
+    sources (iterable đường dẫn, vd generator của scan_videos) và select(path) được duyệt trên thread nền:
+    mỗi file thỏa điều kiện được đưa vào pool copy ngay, nên copy bắt đầu trong lúc vẫn đang quét.
+    File giữ đường dẫn tương đối so với source_root (chỉ giữ tên file nếu không có source_root).
+    Số luồng copy song song (streams) mặc định theo loại disk đích (copy_streams_for).
+    """
+
+    def __init__(self, title, sources, dest_folder, select=None, streams=None, source_root=None, dedup=False):
+        self.title = title
+        self.sources = sources
+        self.dest_folder = dest_folder
+        self.select = select
+        self.streams = streams
+        self.source_root = source_root
+        self.dedup = dedup
+
+    def destination(self, src):
+        if self.source_root is None:
+            return os.path.join(self.dest_folder, os.path.basename(src))
+        return os.path.join(self.dest_folder, os.path.relpath(src, self.source_root))
+
+    def check_destination(self, dedup, src, dst):
+        """COPY/SKIP/REPAIR/CONFLICT cho src -> dst, không có dedup thì chỉ so tên"""
+        if dedup is None:
+            return SKIP if os.path.exists(dst) else COPY
+        action, detail = dedup.check(src, os.path.relpath(dst, self.dest_folder))
+        if action == REPAIR:
+            logging.warning("Re-copying '%s': %s", dst, detail)
+        elif action == CONFLICT:
+            logging.warning("Not overwriting '%s' with '%s': %s", dst, src, detail)
+        elif action == SKIP:
+            logging.debug("Skipping '%s': %s", src, detail)
+        return action
+
+    def run(self, state):
+        streams = self.streams
+        if not streams:
+            streams, kind = copy_streams_for(self.dest_folder)
+            logging.info("Copying videos to '%s' (%s) with %d stream(s)", self.dest_folder, kind, streams)
+        engine = CopyEngine(workers=streams, throttle=state)
+        dedup = DedupIndex(self.dest_folder) if self.dedup else None
+        pool = ThreadPoolExecutor(max_workers=streams)
+        futures = []
+        try:
+            for src in self.sources:
+                state.check()
+                if self.select is not None and not self.select(src):
+                    continue
+                dst = self.destination(src)
+                try:
+                    if self.check_destination(dedup, src, dst) in (SKIP, CONFLICT):
+                        state.file_done(skipped=True)
+                        continue
+                    size = os.path.getsize(src)
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                except OSError as e:
+                    logging.error("Cannot copy '%s' -> '%s': %s", src, dst, e)
+                    state.file_done(failed=True)
+                    continue
+                state.plan(1, size)
+                future = pool.submit(copy_video, engine, src, dst)
+                future.add_done_callback(functools.partial(_copy_done, state, dedup, src, dst))
+                futures.append(future)
+        except BaseException:
+            # Hủy: các copy đang chạy tự dừng ở chunk kế tiếp (và xóa file tạm), copy chưa bắt đầu bị bỏ
+            # (tự cancel từng future: shutdown(cancel_futures=True) cần Python 3.9)
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            pool.shutdown()
+            if dedup is not None:
+                dedup.save()
+        state.check()  # job bị hủy trong lúc chờ các copy cuối cùng
+
+
+def _copy_done(state, dedup, src, dst, future):
+    """Callback (trên thread copy) khi 1 video copy xong"""
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is None:
+        if dedup is not None:
+            dedup.add(os.path.relpath(dst, dedup.dest_folder))
+        state.file_done()
+    elif not isinstance(error, JobCancelled):
+        logging.error("Failed to copy '%s' -> '%s': %s", src, dst, error)
+        state.file_done(failed=True)
+
+
+class DeleteVideosJob:
+    """Xóa các video trong sources thỏa select(path), file không thỏa được tính là skip"""
+
+    def __init__(self, title, sources, select=None):
+        self.title = title
+        self.sources = sources
+        self.select = select
+
+    def run(self, state):
+        for path in self.sources:
+            state.check()
+            if self.select is not None and not self.select(path):
+                state.file_done(skipped=True)
+                continue
+            state.plan(1, 0)
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.error("Failed to delete '%s': %s", path, e)
+                state.file_done(failed=True)
+            else:
+                state.file_done()
+
+
+def copy_video(engine, src, dst):
+    """Copy src vào dst qua file tạm, file tạm bị xóa nếu copy lỗi hoặc job bị hủy giữa chừng"""
+    tmp_dst = dst + PARTIAL_SUFFIX
+    try:
+        engine.copy_file(src, tmp_dst)
+        os.replace(tmp_dst, dst)
+    except BaseException:
+        if os.path.exists(tmp_dst):
+            os.remove(tmp_dst)
+        raise
+
+
+# ======================================================================================================
+# RUNNER
+# ======================================================================================================
+class JobRunner:
+    """1 thread nền chạy lần lượt các job trong queue
+
+    on_progress(JobProgress) và on_finished(job, JobProgress, error) được gọi từ thread nền.
+    """
+
+    def __init__(self, on_progress=None, on_finished=None):
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.current = None  # JobState của job đang chạy
+        self._queue = queue.Queue()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, job):
+        """Đưa job vào queue, trả về JobState để theo dõi/điều khiển"""
+        state = JobState(job.title, self.on_progress)
+        with self._lock:
+            self._pending.append(state)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='video-jobs', daemon=True)
+                self._thread.start()
+        self._queue.put((job, state))
+        state.report(force=True)
+        return state
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def pause(self):
+        state = self.current
+        return state.pause() if state is not None else False
+
+    def resume(self):
+        state = self.current
+        return state.resume() if state is not None else False
+
+    def cancel_all(self):
+        """Hủy job đang chạy và mọi job còn trong queue"""
+        with self._lock:
+            states = list(self._pending)
+        for state in states:
+            state.cancel()
+        return len(states)
+
+    def wait(self):
+        """Chờ tới khi mọi job đã submit chạy xong"""
+        self._queue.join()
+
+    def close(self):
+        self.cancel_all()
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            job, state = item
+            self.current = state
+            error = None
+            try:
+                state.check()
+                state.start()
+                job.run(state)
+                state.finish('done')
+            except JobCancelled:
+                state.finish('cancelled')
+            except Exception as e:
+                logging.error("Job '%s' failed: %s", job.title, e, exc_info=True)
+                error = str(e)
+                state.finish('failed')
+            finally:
+                self.current = None
+                with self._lock:
+                    self._pending.remove(state)
+                if self.on_finished is not None:
+                    self.on_finished(job, state.snapshot(), error)
+                self._queue.task_done()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Quét video đệ quy (generator, trả dần từng file) và bộ lọc tên file biên dịch 1 lần thành 1 regex
+
+Cú pháp bộ lọc: các điều kiện cách nhau bằng dấu phẩy là HOẶC, trong 1 điều kiện các từ nối bằng '&' là VÀ,
+từ bắt đầu bằng '!' là KHÔNG chứa. Không phân biệt hoa thường, vd "VF8 & !test, VN".
+"""
+import os
+import re
+import logging
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.flv')
+
+
+def scan_videos(folder, recursive=True, skip_dirs=()):
+    """Lần lượt trả về đường dẫn các file video trong folder (và folder con nếu recursive)
+
+    Dùng os.scandir nên không stat lại từng file, symlink tới folder không được đi vào (tránh vòng lặp).
+    skip_dirs: các folder không quét (vd folder đích nằm trong folder nguồn).
+    """
+    skip = {os.path.realpath(path) for path in skip_dirs}
+    pending = [folder]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                sub_dirs = []
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and os.path.realpath(entry.path) not in skip:
+                                sub_dirs.append(entry.path)
+                        elif entry.name.lower().endswith(VIDEO_EXTENSIONS) and entry.is_file():
+                            yield entry.path
+                    except OSError as e:
+                        logging.warning("Cannot read '%s': %s", entry.path, e)
+        except OSError as e:
+            logging.warning("Cannot scan '%s': %s", current, e)
+            continue
+        # Đẩy ngược để folder con được quét theo thứ tự tên
+        pending.extend(sorted(sub_dirs, reverse=True))
+
+
+def compile_filter(text):
+    """Biên dịch chuỗi bộ lọc thành hàm match(name) -> bool, None nếu bộ lọc rỗng (lấy tất cả)"""
+    terms = []
+    for term in text.split(','):
+        words = [word.strip() for word in term.split('&')]
+        required = [word for word in words if word and not word.startswith('!')]
+        excluded = [word[1:].strip() for word in words if word.startswith('!') and word[1:].strip()]
+        if required or excluded:
+            terms.append((required, excluded))
+    if not terms:
+        return None
+
+    if all(len(required) == 1 and not excluded for required, excluded in terms):
+        # Trường hợp thường gặp (chỉ có HOẶC): 1 lần search trên alternation
+        pattern = '|'.join(re.escape(required[0]) for required, _ in terms)
+        return _matcher(re.compile(pattern, re.IGNORECASE).search)
+
+    # Mỗi điều kiện là chuỗi lookahead: (?=.*từ cần có)(?!.*từ loại trừ), các điều kiện nối bằng |
+    alternatives = []
+    for required, excluded in terms:
+        alternatives.append(''.join(f'(?=.*{re.escape(word)})' for word in required) +
+                            ''.join(f'(?!.*{re.escape(word)})' for word in excluded))
+    pattern = '(?:' + '|'.join(alternatives) + ')'
+    return _matcher(re.compile(pattern, re.IGNORECASE | re.DOTALL).match)
+
+
+def _matcher(match):
+    return lambda name: match(name) is not None